@@ -1,5 +1,15 @@
 from django.contrib import admin
 
-from .models import Plan, UserSubscription
+from .models import Plan, UserSubscription, SummaryJob, TranscriptionJob, CacheCounter, RateLimitState, SummaryNode, PassageIndex, EmbeddingIndex, ChatContextCache, QuizQuestion, QuizItem
 admin.site.register(Plan)
 admin.site.register(UserSubscription)
+admin.site.register(SummaryJob)
+admin.site.register(TranscriptionJob)
+admin.site.register(CacheCounter)
+admin.site.register(RateLimitState)
+admin.site.register(SummaryNode)
+admin.site.register(PassageIndex)
+admin.site.register(EmbeddingIndex)
+admin.site.register(ChatContextCache)
+admin.site.register(QuizQuestion)
+admin.site.register(QuizItem)
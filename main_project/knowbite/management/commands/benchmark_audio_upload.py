@@ -0,0 +1,143 @@
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+
+from result.transcription import upload_audio
+
+
+class RemoteStorage(FileSystemStorage):
+    """Serves files over HTTP like Cloudinary: no local path, and ``open()`` downloads everything"""
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def path(self, name):
+        raise NotImplementedError("This backend doesn't support absolute paths.")
+
+    def url(self, name):
+        return f"{self.base_url}/{name}"
+
+    def _open(self, name, mode='rb'):
+        response = requests.get(self.url(name))
+        response.raise_for_status()
+        return ContentFile(response.content, name=name)
+
+
+def write_wav(path, size_mb):
+    """Write a silent 16-bit mono WAV of roughly ``size_mb`` MB without building it in memory"""
+    data_size = size_mb * 1024 * 1024
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', 36 + data_size) + b'WAVE')
+        f.write(b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, 16000, 32000, 2, 16))
+        f.write(b'data' + struct.pack('<I', data_size))
+        block = b'\0' * (1024 * 1024)
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    raise CommandError(f"{url} did not come up")
+
+
+def buffered_upload(file_field):
+    """The old path for remote storage: fetch the whole file, then upload it in one body"""
+    with file_field.storage.open(file_field.name) as f:
+        data = f.read()
+    response = requests.post(
+        f"{settings.ASSEMBLYAI_BASE_URL}/v2/upload",
+        headers={"authorization": settings.ASSEMBLYAI_API_KEY or "benchmark"},
+        data=data,
+        timeout=300
+    )
+    response.raise_for_status()
+    return response.json()["upload_url"]
+
+
+class Command(BaseCommand):
+    help = 'Measures peak memory and transfer time of audio uploads to a local fake AssemblyAI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=100, help='Size of the generated audio file')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Streaming chunk size in bytes')
+
+    def handle(self, *args, **options):
+        tmpdir = tempfile.mkdtemp(prefix='audio-bench-')
+        servers = []
+        try:
+            name = 'lecture.wav'
+            write_wav(os.path.join(tmpdir, name), options['size_mb'])
+
+            # The fake API and the "remote storage" run in their own processes
+            # so their buffers do not count towards this process's peak.
+            api_port, files_port = free_port(), free_port()
+            manage_py = os.path.join(settings.BASE_DIR, 'manage.py')
+            servers.append(subprocess.Popen(
+                [sys.executable, manage_py, 'fake_assemblyai', '--port', str(api_port)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ))
+            servers.append(subprocess.Popen(
+                [sys.executable, '-m', 'http.server', str(files_port), '--bind', '127.0.0.1', '--directory', tmpdir],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ))
+            settings.ASSEMBLYAI_BASE_URL = f"http://127.0.0.1:{api_port}"
+            settings.ASSEMBLYAI_API_KEY = settings.ASSEMBLYAI_API_KEY or 'benchmark'
+            wait_for(f"http://127.0.0.1:{api_port}/")
+            wait_for(f"http://127.0.0.1:{files_port}/")
+
+            local = SimpleNamespace(storage=FileSystemStorage(location=tmpdir), name=name)
+            remote = SimpleNamespace(
+                storage=RemoteStorage(f"http://127.0.0.1:{files_port}", location=tmpdir),
+                name=name
+            )
+            runs = [
+                ('remote', 'download+upload', lambda: buffered_upload(remote)),
+                ('remote', 'streamed', lambda: upload_audio(remote, options['chunk_size'])),
+                ('local', 'streamed', lambda: upload_audio(local, options['chunk_size'])),
+            ]
+
+            self.stdout.write(f"Uploading {options['size_mb']} MB of audio")
+            self.stdout.write(f"{'storage':<8} {'strategy':<16} {'seconds':>8} {'MB/s':>8} {'peak MB':>8}")
+            tracemalloc.start()
+            for storage, label, upload in runs:
+                tracemalloc.reset_peak()
+                start = time.perf_counter()
+                upload()
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                self.stdout.write(
+                    f"{storage:<8} {label:<16} {elapsed:>8.2f} {options['size_mb'] / elapsed:>8.1f} "
+                    f"{peak / (1024 * 1024):>8.1f}"
+                )
+            tracemalloc.stop()
+        finally:
+            for server in servers:
+                server.terminate()
+                server.wait()
+            shutil.rmtree(tmpdir, ignore_errors=True)
@@ -0,0 +1,127 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from google.genai import types as genai_types
+
+from result.chunking import count_tokens
+from result.llm import INTERACTIVE, get_gateway
+from result.views import SYSTEM_BASE
+
+SENTENCE = "The lecture derives the energy balance of a closed system step by step. "
+
+
+def make_text(tokens):
+    return SENTENCE * max(1, tokens // count_tokens(SENTENCE))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares input tokens, latency and cost of chat turns with the prompt prefix sent inline or cached. '
+        'By default the figures are estimates from a model built on the latency and price options below; '
+        'with --live they are measured from real Gemini calls (this spends API quota).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--live', action='store_true',
+                            help='Measure real chat turns through the Gemini gateway instead of estimating them')
+        parser.add_argument('--turns', type=int, default=20, help='Chat turns on one document')
+        parser.add_argument('--summary-tokens', default='1000,4000,16000', help='Comma-separated summary sizes in tokens')
+        parser.add_argument('--passage-tokens', type=int,
+                            default=settings.CHAT_CONTEXT_PASSAGES * settings.RETRIEVAL_PASSAGE_TOKENS,
+                            help='Retrieved passages sent each turn')
+        parser.add_argument('--message-tokens', type=int, default=60, help='Tokens of each user message')
+        parser.add_argument('--reply-tokens', type=int, default=250, help='Tokens of each reply')
+        parser.add_argument('--turn-interval', type=float, default=30, help='Seconds between turns, for cache storage cost')
+        parser.add_argument('--first-token', type=float, default=0.4, help='Model: seconds before the first output token')
+        parser.add_argument('--prefill-tps', type=float, default=25000, help='Model: uncached input tokens processed per second')
+        parser.add_argument('--output-tps', type=float, default=200, help='Model: output tokens generated per second')
+        parser.add_argument('--input-price', type=float, default=0.30, help='USD per million input tokens')
+        parser.add_argument('--cached-price', type=float, default=0.075, help='USD per million cached input tokens')
+        parser.add_argument('--storage-price', type=float, default=1.00, help='USD per million cached tokens per hour')
+        parser.add_argument('--output-price', type=float, default=2.50, help='USD per million output tokens')
+
+    def cost(self, fresh, cached_tokens, output, prefix_tokens, cached, options):
+        cost = fresh * options['input_price'] + cached_tokens * options['cached_price'] + output * options['output_price']
+        if cached:
+            hours = options['turns'] * options['turn_interval'] / 3600
+            cost += prefix_tokens * hours * options['storage_price']
+        return cost / 1e6
+
+    def simulate(self, prefix_tokens, cached, options):
+        """Estimated totals for one conversation; the first turn creates the cache and pays full price"""
+        fresh = cached_tokens = 0
+        latency = 0.0
+        history = []
+        for turn in range(options['turns']):
+            turn_tokens = options['passage_tokens'] + sum(history[-6:]) + options['message_tokens']
+            from_cache = prefix_tokens if cached and turn > 0 else 0
+            fresh += turn_tokens + prefix_tokens - from_cache
+            cached_tokens += from_cache
+            latency += (
+                options['first_token']
+                + (turn_tokens + prefix_tokens - from_cache) / options['prefill_tps']
+                + options['reply_tokens'] / options['output_tps']
+            )
+            history += [options['message_tokens'], options['reply_tokens']]
+
+        output = options['turns'] * options['reply_tokens']
+        cost = self.cost(fresh, cached_tokens, output, prefix_tokens, cached, options)
+        return fresh, cached_tokens, latency / options['turns'], cost
+
+    def measure(self, instruction, prefix_tokens, cached, options):
+        """Measured totals for one conversation, from the usage Gemini reports for each turn.
+
+        In cached mode the cache is created first, as the chat view does on
+        the first turn, and its creation time counts towards the first turn.
+        """
+        gateway = get_gateway()
+        cache_name = None
+        start = time.monotonic()
+        if cached:
+            cache_name = gateway.create_cache(instruction, feature='benchmark_chat_cache', ttl=600).name
+            config = genai_types.GenerateContentConfig(
+                cached_content=cache_name, max_output_tokens=options['reply_tokens']
+            )
+        else:
+            config = genai_types.GenerateContentConfig(
+                system_instruction=instruction, max_output_tokens=options['reply_tokens']
+            )
+        fresh = cached_tokens = output = 0
+        passages = make_text(options['passage_tokens'])
+        try:
+            for turn in range(options['turns']):
+                prompt = f"Relevant passages:\n{passages}\n\nQuestion {turn + 1}: summarize one idea from these passages."
+                response = gateway.generate(prompt, feature='benchmark_chat_cache', priority=INTERACTIVE, config=config)
+                usage = response.usage_metadata
+                from_cache = getattr(usage, 'cached_content_token_count', None) or 0
+                fresh += (usage.prompt_token_count or 0) - from_cache
+                cached_tokens += from_cache
+                output += usage.candidates_token_count or 0
+        finally:
+            if cache_name:
+                gateway.delete_cache(cache_name)
+        latency = (time.monotonic() - start) / options['turns']
+        return fresh, cached_tokens, latency, self.cost(fresh, cached_tokens, output, prefix_tokens, cached, options)
+
+    def handle(self, *args, **options):
+        self.stdout.write('Measured with real Gemini calls' if options['live'] else 'Estimated from the latency and cost model')
+        self.stdout.write(
+            f"{'prefix tok':>10} {'mode':<7} {'fresh input':>11} {'cached':>9} {'fresh/turn':>10} "
+            f"{'latency/turn (s)':>16} {'cost ($)':>9}"
+        )
+        for size in [int(n) for n in options['summary_tokens'].split(',') if n.strip()]:
+            prefix_tokens = count_tokens(SYSTEM_BASE.format(summary=make_text(size)))
+            modes = [('inline', False)]
+            if prefix_tokens >= settings.CHAT_CACHE_MIN_TOKENS:
+                modes.append(('cached', True))
+            for mode, cached in modes:
+                if options['live']:
+                    instruction = SYSTEM_BASE.format(summary=make_text(size))
+                    fresh, cached_tokens, latency, cost = self.measure(instruction, prefix_tokens, cached, options)
+                else:
+                    fresh, cached_tokens, latency, cost = self.simulate(prefix_tokens, cached, options)
+                self.stdout.write(
+                    f"{prefix_tokens:>10} {mode:<7} {fresh:>11} {cached_tokens:>9} {fresh // options['turns']:>10} "
+                    f"{latency:>16.2f} {cost:>9.4f}"
+                )
@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+import time
+
+import pdfplumber
+import pymupdf  # PyMuPDF
+from django.core.management.base import BaseCommand
+
+from result.extraction import extract_pdf, iter_page_images, ocr_image
+
+SAMPLE_TEXT = (
+    "Photosynthesis converts light energy into chemical energy stored in glucose. "
+    "The light-dependent reactions take place in the thylakoid membranes, while the "
+    "Calvin cycle fixes carbon dioxide in the stroma. "
+)
+
+
+def _text_page(doc, number):
+    page = doc.new_page()
+    page.insert_textbox(pymupdf.Rect(72, 72, 540, 760), f"Page {number}\n" + SAMPLE_TEXT * 12, fontsize=10)
+    return page
+
+
+def _table_page(doc, number):
+    page = _text_page(doc, number)
+    top = 500
+    for row in range(6):
+        for col in range(4):
+            rect = pymupdf.Rect(72 + col * 110, top + row * 20, 182 + col * 110, top + (row + 1) * 20)
+            page.draw_rect(rect, color=(0, 0, 0), width=0.5)
+            page.insert_text((rect.x0 + 4, rect.y1 - 6), f"r{row}c{col}", fontsize=8)
+    return page
+
+
+def _scanned_page(doc, number):
+    """An image-only page: a text page rendered to pixels and pasted back in"""
+    source = pymupdf.open()
+    _text_page(source, number)
+    pixmap = source[0].get_pixmap(dpi=150)
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=pixmap)
+    source.close()
+    return page
+
+
+def build_corpus(directory, pages):
+    """Write text-only, scanned, mixed and table PDFs and return their paths"""
+    layouts = {
+        'text': [_text_page] * pages,
+        'scanned': [_scanned_page] * pages,
+        'mixed': [_text_page if i % 2 == 0 else _scanned_page for i in range(pages)],
+        'tables': [_table_page if i % 2 == 0 else _text_page for i in range(pages)],
+    }
+    paths = {}
+    for name, builders in layouts.items():
+        doc = pymupdf.open()
+        for number, builder in enumerate(builders, 1):
+            builder(doc, number)
+        path = os.path.join(directory, f"{name}.pdf")
+        doc.save(path)
+        doc.close()
+        paths[name] = path
+    return paths
+
+
+def pdfplumber_only(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf:
+        return "\n".join(page.extract_text() or "" for page in pdf.pages)
+
+
+def pymupdf_only(pdf_path):
+    with pymupdf.open(pdf_path) as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+
+def ocr_only(pdf_path):
+    with pymupdf.open(pdf_path) as doc:
+        return "\n".join(ocr_image(image, 60) for _, image in iter_page_images(doc, range(doc.page_count)))
+
+
+class Command(BaseCommand):
+    help = 'Times whole-document extraction strategies against per-page selection on a mixed PDF corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=20, help='Pages per generated PDF')
+        parser.add_argument('--corpus-dir', help='Benchmark the PDFs in this directory instead of generating a corpus')
+        parser.add_argument('--workers', type=int, default=None, help='Process pool size for per-page extraction')
+
+    def handle(self, *args, **options):
+        tmpdir = None
+        if options['corpus_dir']:
+            directory = options['corpus_dir']
+            paths = {
+                os.path.splitext(name)[0]: os.path.join(directory, name)
+                for name in sorted(os.listdir(directory)) if name.lower().endswith('.pdf')
+            }
+        else:
+            tmpdir = tempfile.mkdtemp(prefix='pdf-bench-')
+            paths = build_corpus(tmpdir, options['pages'])
+
+        ocr_available = shutil.which('tesseract') is not None
+        if not ocr_available:
+            self.stdout.write(self.style.WARNING('tesseract is not installed; OCR timings are skipped'))
+
+        strategies = [
+            ('pdfplumber', pdfplumber_only),
+            ('pymupdf', pymupdf_only),
+            ('ocr', ocr_only),
+            ('per-page', lambda path: extract_pdf(path, max_workers=options['workers'])[0]),
+        ]
+
+        self.stdout.write(f"{'document':<12} {'strategy':<11} {'seconds':>8} {'chars':>8}")
+        try:
+            for name, path in paths.items():
+                for label, extract in strategies:
+                    if label == 'ocr' and not ocr_available:
+                        self.stdout.write(f"{name:<12} {label:<11} {'skipped':>8}")
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        text = extract(path)
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f"{name:<12} {label:<11} failed: {e}"))
+                        continue
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(f"{name:<12} {label:<11} {elapsed:>8.3f} {len(text.strip()):>8}")
+        finally:
+            if tmpdir:
+                shutil.rmtree(tmpdir, ignore_errors=True)
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from result.summarizer import summarize_chunks
+
+
+class TokenBucket:
+    """In-process token bucket pacing the fake model calls of this benchmark.
+
+    ``rate`` tokens are added per second up to ``capacity``, and ``acquire``
+    blocks until one is available. Real Gemini calls are paced by the
+    gateway's shared limiter instead.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class FakeModelClient:
+    """Stands in for Gemini: sleeps for a fixed latency and echoes a short summary"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def summarize(self, text):
+        self.calls += 1
+        time.sleep(self.latency)
+        return f"<p>Summary of {len(text)} chars</p>"
+
+
+class Command(BaseCommand):
+    help = 'Compares sequential and parallel chunk summarization wall-clock time with a local fake model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunks', default='1,2,4,8,16', help='Comma-separated chunk counts to benchmark')
+        parser.add_argument('--latency', type=float, default=0.5, help='Simulated model latency per call in seconds')
+        parser.add_argument('--delay', type=float, default=1.0, help='Fixed sleep between calls in the sequential loop')
+        parser.add_argument('--concurrency', type=int, default=4, help='Thread pool size for the parallel map')
+        parser.add_argument('--rate', type=float, default=10.0, help='Token bucket refill rate in requests per second')
+        parser.add_argument('--burst', type=int, default=4, help='Token bucket capacity')
+
+    def handle(self, *args, **options):
+        chunk_counts = [int(n) for n in options['chunks'].split(',') if n.strip()]
+        self.stdout.write(
+            f"latency={options['latency']}s delay={options['delay']}s "
+            f"concurrency={options['concurrency']} rate={options['rate']}/s burst={options['burst']}"
+        )
+        self.stdout.write(f"{'chunks':>6} {'sequential (s)':>15} {'parallel (s)':>13} {'speedup':>8}")
+
+        for count in chunk_counts:
+            chunks = ['x' * 10000] * count
+
+            client = FakeModelClient(options['latency'])
+            start = time.perf_counter()
+            for chunk in chunks:
+                client.summarize(chunk)
+                time.sleep(options['delay'])
+            sequential = time.perf_counter() - start
+
+            client = FakeModelClient(options['latency'])
+            limiter = TokenBucket(rate=options['rate'], capacity=options['burst'])
+            start = time.perf_counter()
+            results = summarize_chunks(chunks, client.summarize, max_workers=options['concurrency'], rate_limiter=limiter)
+            parallel = time.perf_counter() - start
+
+            if len(results) != count:
+                self.stdout.write(self.style.ERROR(f"Expected {count} results, got {len(results)}"))
+                return
+
+            self.stdout.write(f"{count:>6} {sequential:>15.2f} {parallel:>13.2f} {sequential / parallel:>7.1f}x")
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from result.chunking import count_tokens
+from result.summarizer import reduce_to_budget
+
+SENTENCE = "The lecture derives the energy balance of a closed system step by step. "
+
+
+class SimulatedGemini:
+    """Stands in for Gemini with a latency and price model instead of a network call.
+
+    A call takes ``first_token`` seconds plus prefill and decode time for
+    its input and output tokens, slept at ``time_scale`` so benchmarks run
+    quickly while concurrency still behaves like the real pipeline.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.lock = threading.Lock()
+
+    def _call(self, text, output_tokens):
+        input_tokens = count_tokens(text)
+        latency = (
+            self.options['first_token']
+            + input_tokens / self.options['prefill_tps']
+            + output_tokens / self.options['output_tps']
+        )
+        time.sleep(latency * self.options['time_scale'])
+        with self.lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+        # Each sentence of "Key point noted. " is four tokens
+        return "Key point noted. " * max(1, output_tokens // 4)
+
+    def notes(self, text):
+        return self._call(text, min(int(count_tokens(text) * self.options['notes_ratio']), self.options['notes_cap']))
+
+    def summary(self, text):
+        return self._call(text, self.options['summary_tokens'])
+
+    def cost(self):
+        return (self.input_tokens * self.options['input_price'] + self.output_tokens * self.options['output_price']) / 1e6
+
+
+def make_document(tokens):
+    sentence_tokens = count_tokens(SENTENCE)
+    paragraph = SENTENCE * 8 + "\n\n"
+    return paragraph * max(1, tokens // (sentence_tokens * 8))
+
+
+class Command(BaseCommand):
+    help = 'Compares calls, latency and cost of single-pass and map-reduce summarization with a simulated model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', default='20000,100000,400000,1500000', help='Comma-separated document sizes in tokens')
+        parser.add_argument('--chunk-tokens', type=int, default=settings.SUMMARY_CHUNK_TOKENS, help='map_reduce budget')
+        parser.add_argument('--single-pass-tokens', type=int, default=settings.SUMMARY_SINGLE_PASS_MAX_TOKENS, help='single_pass budget')
+        parser.add_argument('--concurrency', type=int, default=settings.SUMMARY_MAX_CONCURRENCY, help='Parallel chunk calls')
+        parser.add_argument('--first-token', type=float, default=0.6, help='Seconds before the first output token')
+        parser.add_argument('--prefill-tps', type=float, default=25000, help='Input tokens processed per second')
+        parser.add_argument('--output-tps', type=float, default=200, help='Output tokens generated per second')
+        parser.add_argument('--notes-ratio', type=float, default=0.15, help='Notes size as a fraction of chunk input')
+        parser.add_argument('--notes-cap', type=int, default=8192, help='Most output tokens for one chunk of notes')
+        parser.add_argument('--summary-tokens', type=int, default=4000, help='Output tokens of the final summary')
+        parser.add_argument('--input-price', type=float, default=0.30, help='USD per million input tokens')
+        parser.add_argument('--output-price', type=float, default=2.50, help='USD per million output tokens')
+        parser.add_argument('--time-scale', type=float, default=0.01, help='Fraction of simulated latency actually slept')
+
+    def handle(self, *args, **options):
+        modes = [('single_pass', options['single_pass_tokens']), ('map_reduce', options['chunk_tokens'])]
+        self.stdout.write(
+            f"{'tokens':>9} {'mode':<12} {'calls':>5} {'input tok':>10} {'output tok':>10} "
+            f"{'latency (s)':>11} {'cost ($)':>9}"
+        )
+        for size in [int(n) for n in options['tokens'].split(',') if n.strip()]:
+            document = make_document(size)
+            for mode, budget in modes:
+                model = SimulatedGemini(options)
+                start, start_cpu = time.perf_counter(), time.process_time()
+                notes = reduce_to_budget(document, model.notes, budget, max_workers=options['concurrency'])
+                model.summary(notes)
+                # Token counting and chunking are real CPU work, not scaled model time
+                cpu = time.process_time() - start_cpu
+                latency = max(0.0, time.perf_counter() - start - cpu) / options['time_scale'] + cpu
+                self.stdout.write(
+                    f"{count_tokens(document):>9} {mode:<12} {model.calls:>5} {model.input_tokens:>10} "
+                    f"{model.output_tokens:>10} {latency:>11.1f} {model.cost():>9.4f}"
+                )
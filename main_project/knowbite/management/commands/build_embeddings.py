@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from knowbite.models import EmbeddingIndex, ExtractedText
+from result.embeddings import embed_extracted_text, is_current
+from result.retrieval import get_passage_index
+
+
+class Command(BaseCommand):
+    help = 'Embeds the passages of extracted texts that have no up-to-date embedding index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-embed every text, even when its index is current')
+
+    def handle(self, *args, **options):
+        indexes = {index.extracted_text_id: index for index in EmbeddingIndex.objects.defer('vectors')}
+        embedded = skipped = failed = 0
+        for extracted_text in ExtractedText.objects.order_by('pk').iterator():
+            index = indexes.get(extracted_text.pk)
+            if not options['all'] and index is not None and is_current(index, get_passage_index(extracted_text)):
+                skipped += 1
+                continue
+            try:
+                index = embed_extracted_text(extracted_text)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'Extracted text #{extracted_text.pk} failed: {e}'))
+                continue
+            embedded += 1
+            self.stdout.write(f'Embedded {index.count} passages of extracted text #{extracted_text.pk}')
+
+        self.stdout.write(self.style.SUCCESS(f'Embedded {embedded}, up to date {skipped}, failed {failed}'))
@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class FakeAssemblyAI:
+    """In-memory stand-in for the parts of the AssemblyAI v2 API the app uses.
+
+    Transcripts move from ``queued`` to ``processing`` to ``completed`` (or
+    ``error``) over ``delay`` seconds, and the webhook from the submit
+    request is called when they finish, like the real service does.
+    """
+
+    def __init__(self, base_url, delay=3.0, fail=False):
+        self.base_url = base_url
+        self.delay = delay
+        self.fail = fail
+        self.uploads = {}
+        self.transcripts = {}
+        self.lock = threading.Lock()
+
+    def upload(self, size, chunked=False):
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self.uploads[upload_id] = {"size": size, "chunked": chunked}
+        return {"upload_url": f"{self.base_url}/uploads/{upload_id}"}
+
+    def submit(self, payload):
+        transcript_id = uuid.uuid4().hex
+        upload_id = payload.get("audio_url", "").rsplit("/", 1)[-1]
+        transcript = {
+            "id": transcript_id,
+            "status": "queued",
+            "audio_url": payload.get("audio_url"),
+            "text": None,
+            "error": None,
+            "submitted_at": time.monotonic(),
+            "size": self.uploads.get(upload_id, {}).get("size", 0),
+        }
+        with self.lock:
+            self.transcripts[transcript_id] = transcript
+        timer = threading.Timer(self.delay, self.finish, args=(transcript_id, payload))
+        timer.daemon = True
+        timer.start()
+        return self.public(transcript)
+
+    def finish(self, transcript_id, payload):
+        with self.lock:
+            transcript = self.transcripts[transcript_id]
+            if self.fail:
+                transcript["status"] = "error"
+                transcript["error"] = "Fake transcription failure"
+            else:
+                transcript["status"] = "completed"
+                transcript["text"] = f"Fake transcript of {transcript['size']} bytes of audio."
+
+        webhook_url = payload.get("webhook_url")
+        if webhook_url:
+            headers = {"Content-Type": "application/json"}
+            if payload.get("webhook_auth_header_name"):
+                headers[payload["webhook_auth_header_name"]] = payload.get("webhook_auth_header_value", "")
+            body = json.dumps({"transcript_id": transcript_id, "status": transcript["status"]}).encode()
+            try:
+                urllib.request.urlopen(urllib.request.Request(webhook_url, data=body, headers=headers), timeout=10)
+            except Exception as e:
+                print(f"Webhook to {webhook_url} failed: {e}")
+
+    def get(self, transcript_id):
+        with self.lock:
+            transcript = self.transcripts.get(transcript_id)
+            if transcript is None:
+                return None
+            if transcript["status"] == "queued" and time.monotonic() - transcript["submitted_at"] > self.delay / 3:
+                transcript["status"] = "processing"
+            return self.public(transcript)
+
+    @staticmethod
+    def public(transcript):
+        return {key: transcript[key] for key in ("id", "status", "audio_url", "text", "error")}
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def is_chunked(self):
+            return self.headers.get("Transfer-Encoding", "").lower() == "chunked"
+
+        def read_body(self):
+            """Read the request body, byte counted, whether or not it is chunked"""
+            if self.is_chunked():
+                size = 0
+                data = b""
+                while True:
+                    chunk_size = int(self.rfile.readline().split(b";")[0], 16)
+                    if chunk_size == 0:
+                        self.rfile.readline()
+                        break
+                    chunk = self.rfile.read(chunk_size)
+                    self.rfile.readline()
+                    size += len(chunk)
+                    # Only JSON bodies are kept; uploads are just counted
+                    if len(data) < 1024 * 1024:
+                        data += chunk
+                return size, data
+            length = int(self.headers.get("Content-Length", 0))
+            remaining = length
+            data = b""
+            while remaining:
+                chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                if len(data) < 1024 * 1024:
+                    data += chunk
+            return length - remaining, data
+
+        def do_POST(self):
+            if not self.headers.get("authorization"):
+                self.read_body()
+                return self.send_json(401, {"error": "Authentication error, API token missing/invalid"})
+            size, data = self.read_body()
+            if self.path == "/v2/upload":
+                return self.send_json(200, api.upload(size, chunked=self.is_chunked()))
+            if self.path == "/v2/transcript":
+                try:
+                    payload = json.loads(data or b"{}")
+                except ValueError:
+                    return self.send_json(400, {"error": "Invalid JSON"})
+                if not payload.get("audio_url"):
+                    return self.send_json(400, {"error": "audio_url is required"})
+                return self.send_json(200, api.submit(payload))
+            self.send_json(404, {"error": "Not found"})
+
+        def do_GET(self):
+            if self.path.startswith("/v2/transcript/"):
+                transcript = api.get(self.path.rsplit("/", 1)[-1])
+                if transcript is None:
+                    return self.send_json(404, {"error": "Transcript not found"})
+                return self.send_json(200, transcript)
+            self.send_json(404, {"error": "Not found"})
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = 'Runs a local fake of the AssemblyAI API; point ASSEMBLYAI_BASE_URL at it for testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8300)
+        parser.add_argument('--delay', type=float, default=3.0, help='Seconds until a transcript finishes')
+        parser.add_argument('--fail', action='store_true', help='Finish every transcript with an error')
+
+    def handle(self, *args, **options):
+        base_url = f"http://{options['host']}:{options['port']}"
+        api = FakeAssemblyAI(base_url, delay=options['delay'], fail=options['fail'])
+        server = ThreadingHTTPServer((options['host'], options['port']), make_handler(api))
+        self.stdout.write(self.style.SUCCESS(f'Fake AssemblyAI listening on {base_url}'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Fake AssemblyAI stopped'))
+        finally:
+            server.server_close()
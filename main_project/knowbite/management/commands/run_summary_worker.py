@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from result.jobs import claim_next_job, job_heartbeat, requeue_stale_jobs, run_summary_job
+from result.quiz_bank import claim_refill, fill_bank
+from result.transcription import poll_pending_transcriptions
+
+
+class Command(BaseCommand):
+    help = 'Processes queued summary jobs outside of the web workers, polls pending transcripts and fills quiz banks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the queue until it is empty, then exit')
+        parser.add_argument('--sleep', type=float, default=settings.SUMMARY_WORKER_POLL_INTERVAL,
+                            help='Seconds to wait between polls when the queue is empty')
+
+    def requeue_stale_jobs(self):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Re-queued {requeued} stale summary jobs'))
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Summary worker started'))
+        next_requeue = 0.0
+        try:
+            while True:
+                close_old_connections()
+                # Jobs abandoned by a worker that died are picked up again while this one runs
+                if time.monotonic() >= next_requeue:
+                    self.requeue_stale_jobs()
+                    next_requeue = time.monotonic() + settings.SUMMARY_JOB_REQUEUE_INTERVAL
+                try:
+                    poll_pending_transcriptions()
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'Transcript polling failed: {e}'))
+
+                job = claim_next_job()
+                if job is None:
+                    # Quiz banks are filled only while no summary is waiting
+                    refill = claim_refill()
+                    if refill is not None:
+                        summary, difficulties = refill
+                        self.stdout.write(f'Filling {",".join(difficulties)} quiz bank for summary #{summary.pk}')
+                        try:
+                            fill_bank(summary, difficulties)
+                        except Exception as e:
+                            self.stdout.write(self.style.ERROR(f'Quiz bank for summary #{summary.pk} failed: {e}'))
+                        continue
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                self.stdout.write(f'Processing summary job #{job.pk} for file {job.uploaded_file_id}')
+                with job_heartbeat(job):
+                    job = run_summary_job(job)
+                if job.status == 'failed':
+                    self.stdout.write(self.style.ERROR(f'Job #{job.pk} failed: {job.error}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'Job #{job.pk} done'))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Summary worker stopped'))
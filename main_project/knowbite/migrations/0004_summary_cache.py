@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0003_extracted_text_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_hash', models.CharField(max_length=64)),
+                ('prompt_version', models.CharField(max_length=20)),
+                ('model_name', models.CharField(max_length=50)),
+                ('summary_text', models.TextField()),
+                ('hit_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'unique_together': {('source_hash', 'prompt_version', 'model_name')},
+            },
+        ),
+    ]
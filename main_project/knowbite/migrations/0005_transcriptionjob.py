@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0004_summary_cache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='summaryjob',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('extracting', 'Extracting'), ('transcribing', 'Waiting for transcript'), ('summarizing', 'Summarizing'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='TranscriptionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transcript_id', models.CharField(max_length=64, unique=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('error', 'Error')], default='queued', max_length=20)),
+                ('text', models.TextField(blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('poll_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_polled_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('uploaded_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transcription_jobs', to='knowbite.uploadedfile')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'last_polled_at'], name='knowbite_tr_status_16e1ae_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0005_transcriptionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('request_tat', models.FloatField(default=0)),
+                ('token_tat', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
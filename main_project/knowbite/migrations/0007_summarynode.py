@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0006_ratelimitstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('position', models.PositiveIntegerField()),
+                ('source_hash', models.CharField(max_length=64)),
+                ('prompt_version', models.CharField(max_length=20)),
+                ('summary_text', models.TextField()),
+                ('token_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('extracted_text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary_nodes', to='knowbite.extractedtext')),
+            ],
+            options={
+                'ordering': ['level', 'position'],
+                'indexes': [models.Index(fields=['extracted_text', 'prompt_version', 'level'], name='knowbite_su_extract_768680_idx')],
+            },
+        ),
+    ]
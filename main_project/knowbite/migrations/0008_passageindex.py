@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0007_summarynode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PassageIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_hash', models.CharField(max_length=64)),
+                ('passages', models.JSONField()),
+                ('lengths', models.JSONField()),
+                ('postings', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('extracted_text', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='passage_index', to='knowbite.extractedtext')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0008_passageindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_hash', models.CharField(max_length=64)),
+                ('model_name', models.CharField(max_length=100)),
+                ('dimensions', models.IntegerField()),
+                ('count', models.IntegerField()),
+                ('vectors', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('extracted_text', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='embedding_index', to='knowbite.extractedtext')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0009_embeddingindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatContextCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_hash', models.CharField(max_length=64)),
+                ('cache_name', models.CharField(blank=True, max_length=255)),
+                ('model_name', models.CharField(max_length=100)),
+                ('token_count', models.IntegerField(default=0)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('uploaded_file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='chat_cache', to='knowbite.uploadedfile')),
+            ],
+        ),
+    ]
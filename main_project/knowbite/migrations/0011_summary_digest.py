@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0010_chatcontextcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summary',
+            name='digest_text',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='summary',
+            name='digest_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
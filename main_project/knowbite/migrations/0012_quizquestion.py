@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0011_summary_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summary',
+            name='quiz_bank_refill',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.CreateModel(
+            name='QuizQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('difficulty', models.CharField(choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard')], max_length=10)),
+                ('question', models.TextField()),
+                ('option_a', models.TextField()),
+                ('option_b', models.TextField()),
+                ('option_c', models.TextField()),
+                ('option_d', models.TextField()),
+                ('correct_option', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C'), ('D', 'D')], max_length=1)),
+                ('times_served', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('summary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='knowbite.summary')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['summary', 'difficulty', 'times_served'], name='knowbite_qu_summary_650b97_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0012_quizquestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='correct_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='difficulty',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='submitted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='QuizItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField()),
+                ('question', models.TextField()),
+                ('option_a', models.TextField()),
+                ('option_b', models.TextField()),
+                ('option_c', models.TextField()),
+                ('option_d', models.TextField()),
+                ('correct_option', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C'), ('D', 'D')], max_length=1)),
+                ('user_choice', models.CharField(blank=True, max_length=1)),
+                ('is_correct', models.BooleanField(null=True)),
+                ('bank_question', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='answers', to='knowbite.quizquestion')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='knowbite.quiz')),
+            ],
+            options={
+                'ordering': ['position'],
+                'constraints': [models.UniqueConstraint(fields=('quiz', 'position'), name='unique_quiz_item_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0013_quizitem'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='summarycache',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='summarycache',
+            name='notes_version',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='summarycache',
+            name='summary_mode',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AlterUniqueTogether(
+            name='summarycache',
+            unique_together={('source_hash', 'prompt_version', 'notes_version', 'summary_mode', 'model_name')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0014_summary_cache_pipeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summaryjob',
+            name='output',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0015_summaryjob_output'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='embeddingindex',
+            name='passages_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='passageindex',
+            name='passages_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
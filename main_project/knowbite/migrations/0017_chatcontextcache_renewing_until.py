@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowbite', '0016_passage_list_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatcontextcache',
+            name='renewing_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
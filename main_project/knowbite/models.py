@@ -16,6 +16,7 @@ class UploadedFile(models.Model):
     file_type = models.CharField(max_length=10, choices=FILE_TYPES)
     youtube_link = models.URLField(blank=True, null=True)
     title = models.CharField(max_length=512, blank=True, null=True)  # New field for YouTube title
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # SHA-256 of the file bytes
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -40,6 +41,11 @@ class Summary(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     uploaded_file = models.OneToOneField(UploadedFile, on_delete=models.CASCADE)
     summary_text = models.TextField()
+    # Plain-text form of summary_text for chat and quiz prompts, see result.digest
+    digest_text = models.TextField(blank=True)
+    digest_version = models.IntegerField(default=0)
+    # Comma-separated quiz difficulties the worker should top up in the question bank
+    quiz_bank_refill = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -53,13 +59,221 @@ class ExtractedText(models.Model):
 
     def __str__(self):
         return f"Extracted text for {self.uploaded_file.filename()} by {self.user.username}"
+
+
+class PassageIndex(models.Model):
+    """BM25 inverted index over a file's extracted text, split into passages.
+
+    Built once per extracted text and used to pick the passages that go
+    into each chat prompt.
+    """
+    extracted_text = models.OneToOneField(ExtractedText, on_delete=models.CASCADE, related_name='passage_index')
+    source_hash = models.CharField(max_length=64)  # SHA-256 of the indexed text
+    passages_hash = models.CharField(max_length=64, blank=True)  # SHA-256 of the passage list
+    passages = models.JSONField()  # Passage texts in document order
+    lengths = models.JSONField()  # Number of indexed terms in each passage
+    postings = models.JSONField()  # Term -> [[passage number, term frequency], ...]
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Passage index for {self.extracted_text.uploaded_file.filename()} ({len(self.passages)} passages)"
+
+
+class EmbeddingIndex(models.Model):
+    """Embedding vectors of a file's passages, one float32 row per ``PassageIndex`` passage.
+
+    The database copy is the source of truth; each process caches it as a
+    memory-mapped ``.npy`` file under EMBEDDING_ROOT for searching.
+    """
+    extracted_text = models.OneToOneField(ExtractedText, on_delete=models.CASCADE, related_name='embedding_index')
+    source_hash = models.CharField(max_length=64)  # SHA-256 of the embedded text
+    passages_hash = models.CharField(max_length=64, blank=True)  # ``PassageIndex.passages_hash`` the rows match
+    model_name = models.CharField(max_length=100)
+    dimensions = models.IntegerField()
+    count = models.IntegerField()
+    vectors = models.BinaryField()  # Row-major float32, L2-normalized
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Embeddings for {self.extracted_text.uploaded_file.filename()} ({self.count} x {self.dimensions}, {self.model_name})"
+
+
+class ChatContextCache(models.Model):
+    """The stable prefix of a file's chat prompts, cached by Gemini between turns.
+
+    ``cache_name`` is the provider's cached-content handle; it is empty when
+    the prefix is sent inline instead (too short to cache, caching disabled,
+    or creation failed). The row is replaced once it expires or the prefix
+    changes, for example after the summary is regenerated.
+    """
+    uploaded_file = models.OneToOneField(UploadedFile, on_delete=models.CASCADE, related_name='chat_cache')
+    source_hash = models.CharField(max_length=64)  # SHA-256 of the cached prefix
+    cache_name = models.CharField(max_length=255, blank=True)
+    model_name = models.CharField(max_length=100)
+    token_count = models.IntegerField(default=0)
+    expires_at = models.DateTimeField()
+    renewing_until = models.DateTimeField(null=True, blank=True)  # Lease of the turn extending or replacing it
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Chat cache for {self.uploaded_file.filename()} ({self.cache_name or 'inline'}, {self.token_count} tokens)"
+
+
+class SummaryNode(models.Model):
+    """Notes for one chunk of a document, from a reduction round of the summary pipeline.
+
+    Level 0 nodes condense chunks of the extracted text, level 1 nodes
+    condense chunks of the joined level 0 notes, and so on up to the input
+    of the final summary call. Nodes are matched by the hash of their
+    input, so a regeneration only redoes chunks whose text changed.
+    """
+    extracted_text = models.ForeignKey(ExtractedText, on_delete=models.CASCADE, related_name='summary_nodes')
+    level = models.PositiveSmallIntegerField()
+    position = models.PositiveIntegerField()
+    source_hash = models.CharField(max_length=64)  # SHA-256 of the chunk that was condensed
+    prompt_version = models.CharField(max_length=20)
+    summary_text = models.TextField()
+    token_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['level', 'position']
+        indexes = [models.Index(fields=['extracted_text', 'prompt_version', 'level'])]
+
+    def __str__(self):
+        return f"Summary node {self.level}.{self.position} for {self.extracted_text.uploaded_file.filename()}"
+
+
+class ExtractedTextCache(models.Model):
+    """Extracted text shared by every upload with the same file bytes"""
+    content_hash = models.CharField(max_length=64, unique=True)
+    extracted_text = models.TextField()
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Extracted text {self.content_hash[:12]} ({self.hit_count} hits)"
+
+
+class SummaryCache(models.Model):
+    """Summary shared across users for the same source text, prompts, pipeline and model"""
+    source_hash = models.CharField(max_length=64)  # SHA-256 of the extracted text
+    prompt_version = models.CharField(max_length=20)
+    notes_version = models.CharField(max_length=20, blank=True)  # Prompt of the notes condensing long input
+    summary_mode = models.CharField(max_length=20, blank=True)  # SUMMARY_MODE the summary was made with
+    model_name = models.CharField(max_length=50)
+    summary_text = models.TextField()
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        unique_together = ('source_hash', 'prompt_version', 'notes_version', 'summary_mode', 'model_name')
+
+    def __str__(self):
+        return f"Summary {self.source_hash[:12]} ({self.model_name}, {self.prompt_version}, {self.summary_mode})"
+
+
+class CacheCounter(models.Model):
+    """Hit/miss totals for one of the processing caches"""
+    name = models.CharField(max_length=50, unique=True)
+    hits = models.BigIntegerField(default=0)
+    misses = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.hits} hits / {self.misses} misses"
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class QuizQuestion(models.Model):
+    """A multiple-choice question in a summary's quiz bank, reused across quizzes"""
+    DIFFICULTY_CHOICES = [
+        ('easy', 'Easy'),
+        ('medium', 'Medium'),
+        ('hard', 'Hard'),
+    ]
+    OPTION_CHOICES = [('A', 'A'), ('B', 'B'), ('C', 'C'), ('D', 'D')]
+
+    summary = models.ForeignKey(Summary, on_delete=models.CASCADE, related_name='questions')
+    difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES)
+    question = models.TextField()
+    option_a = models.TextField()
+    option_b = models.TextField()
+    option_c = models.TextField()
+    option_d = models.TextField()
+    correct_option = models.CharField(max_length=1, choices=OPTION_CHOICES)
+    times_served = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['summary', 'difficulty', 'times_served'])]
+
+    def __str__(self):
+        return f"{self.difficulty} question for {self.summary.uploaded_file.filename()}: {self.question[:50]}"
+
+    def as_mcq(self):
+        """The question in the dict form quiz templates and the session use"""
+        return {
+            "question": self.question,
+            "option_a": self.option_a,
+            "option_b": self.option_b,
+            "option_c": self.option_c,
+            "option_d": self.option_d,
+            "correct_option": self.correct_option,
+        }
+
+
 class Quiz(models.Model):
+    """One quiz attempt; its questions and answers are the ``QuizItem`` rows"""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     file = models.ForeignKey('UploadedFile', on_delete=models.CASCADE)
+    difficulty = models.CharField(max_length=10, blank=True)
+    correct_count = models.IntegerField(null=True, blank=True)
+    score = models.FloatField(null=True, blank=True)  # Percentage, set when submitted
     created_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.file.filename()} by {self.user.username} Quizzes"
+
+
+class QuizItem(models.Model):
+    """A question as it was asked in one quiz, with the user's answer once submitted.
+
+    The question is copied from the bank so results survive the bank
+    being reset when the summary is regenerated.
+    """
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='items')
+    bank_question = models.ForeignKey(
+        QuizQuestion, on_delete=models.SET_NULL, null=True, blank=True, related_name='answers'
+    )
+    position = models.IntegerField()
+    question = models.TextField()
+    option_a = models.TextField()
+    option_b = models.TextField()
+    option_c = models.TextField()
+    option_d = models.TextField()
+    correct_option = models.CharField(max_length=1, choices=QuizQuestion.OPTION_CHOICES)
+    user_choice = models.CharField(max_length=1, blank=True)
+    is_correct = models.BooleanField(null=True)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [models.UniqueConstraint(fields=['quiz', 'position'], name='unique_quiz_item_position')]
+
+    def __str__(self):
+        return f"Quiz #{self.quiz_id} question {self.position + 1}"
+
+    def option_text(self, letter):
+        return {'A': self.option_a, 'B': self.option_b, 'C': self.option_c, 'D': self.option_d}.get(letter, "")
 class ChatMessage(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     file = models.ForeignKey('UploadedFile', on_delete=models.CASCADE)
@@ -74,6 +288,101 @@ class ChatMessage(models.Model):
         return f'{self.role.capitalize()}: {self.content[:50]}...'
 
 
+class SummaryJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('extracting', 'Extracting'),
+        ('transcribing', 'Waiting for transcript'),
+        ('summarizing', 'Summarizing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ('queued', 'extracting', 'transcribing', 'summarizing')
+    # Active states a worker has taken the job into
+    CLAIMED_STATUSES = ('extracting', 'transcribing', 'summarizing')
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    uploaded_file = models.ForeignKey(UploadedFile, on_delete=models.CASCADE, related_name='summary_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    regenerate = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+    # Summary HTML written so far by the final call, tailed by the summary stream
+    output = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Summary job #{self.pk} for {self.uploaded_file.filename()} ({self.status})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    def set_status(self, status, error=''):
+        """Move the job to a new state and persist it"""
+        from django.utils import timezone
+
+        self.status = status
+        self.error = error
+        # Partial output belongs to one run of the final call
+        self.output = ''
+        if status in ('done', 'failed'):
+            self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'output', 'finished_at', 'updated_at'])
+
+    def set_output(self, output):
+        """Persist the summary written so far; this also keeps the job from looking stale"""
+        from django.utils import timezone
+
+        self.output = output
+        SummaryJob.objects.filter(pk=self.pk).update(output=output, updated_at=timezone.now())
+
+
+class TranscriptionJob(models.Model):
+    """An AssemblyAI transcript that is being processed for an audio upload.
+
+    Completed through the AssemblyAI webhook or, as a fallback, by the
+    poller in the summary worker.
+    """
+    # These mirror AssemblyAI's transcript statuses
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('error', 'Error'),
+    ]
+    PENDING_STATUSES = ('queued', 'processing')
+
+    uploaded_file = models.ForeignKey(UploadedFile, on_delete=models.CASCADE, related_name='transcription_jobs')
+    transcript_id = models.CharField(max_length=64, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    text = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    poll_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    last_polled_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'last_polled_at'])]
+
+    def __str__(self):
+        return f"Transcript {self.transcript_id} for {self.uploaded_file.filename()} ({self.status})"
+
+    @property
+    def is_pending(self):
+        return self.status in self.PENDING_STATUSES
+
+
 class Plan(models.Model):
     PLAN_CHOICES = [
         ('free', 'Free'),
@@ -276,4 +585,19 @@ class UserSubscription(models.Model):
         if remaining_messages <= 0:
             return False, f"You've reached the limit of {self.plan.chatbot_messages_per_file} messages for this file"
 
-        return True, f"OK - You have {remaining_messages} messages remaining for this file"
\ No newline at end of file
+        return True, f"OK - You have {remaining_messages} messages remaining for this file"
+
+class RateLimitState(models.Model):
+    """Shared schedule for a rate limit that every worker process draws from.
+
+    The ``*_tat`` columns are GCRA theoretical arrival times as UNIX
+    timestamps: the moment each budget will be fully paid off given the
+    requests that have already reserved a slot.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    request_tat = models.FloatField(default=0)
+    token_tat = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Rate limit {self.name}"
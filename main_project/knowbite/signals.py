@@ -1,7 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserSubscription, Plan
+from .models import EmbeddingIndex, UserSubscription, Plan
 from django.utils import timezone
 
 def get_or_create_free_plan():
@@ -48,3 +48,12 @@ def create_user_subscription(sender, instance, created, **kwargs):
             current_period_start=timezone.now(),
             current_period_end=None  # Free plan doesn't expire
         )
+
+
+@receiver(post_delete, sender=EmbeddingIndex)
+def remove_embedding_vectors(sender, instance, **kwargs):
+    """Delete the cached vector files with their index, e.g. when the note is deleted"""
+    # Imported here because result.embeddings imports the models of this app
+    from result.embeddings import remove_vectors
+
+    remove_vectors(instance.extracted_text_id)
@@ -8,6 +8,7 @@ urlpatterns = [
     path('upload/', views.upload_file, name='upload'),
     path('yournotes/', views.yournotes, name='yournotes'),
     path('yournotes/<int:file_id>/delete', views.yournotes, name='delete_file'),
+    path('search/', views.search_notes, name='search_notes'),
     path('settings/', views.settings, name='settings'),
     path('pricing/', views_subscription.pricing, name='pricing'),
     path('subscription/success/', views_subscription.subscription_success, name='subscription_success'),
@@ -1,11 +1,21 @@
+import asyncio
+import os
+import re
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 from .forms import FileUploadForm
-from .models import UploadedFile, ExtractedText
+from .models import UploadedFile, ExtractedText, UserSubscription
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib import messages
+from result import http_client
+from result.cache import get_cached_text, hash_file
+from result.embeddings import search_files
+from result.jobs import enqueue_summary_job
+from django.urls import reverse
 #import fitz # PyMuPDF for PDF handling
 # Create your views here.
 
@@ -22,15 +32,48 @@ def dashboard(request):
     }
     return render(request, 'knowbite/dashboard.html', context)
 
+def extract_video_id(url):
+    patterns = [
+        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
+        r'(?:embed\/)([0-9A-Za-z_-]{11})',
+        r'^([0-9A-Za-z_-]{11})$'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return None
+
+
+async def fetch_youtube_metadata(video_id, youtube_link):
+    """Fetch the video title (oEmbed) and transcript (TranscriptAPI) concurrently"""
+    # 2. Get title from YouTube oEmbed (no API key needed!)
+    oembed_url = f'https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json'
+    # 3. Get transcript from TranscriptAPI
+    API_KEY = os.getenv('API_KEY', 'sk_x_pq215sTsEweVptvuLwXWaQfSSQsosPvhKJOHreUsg')
+    url = 'https://transcriptapi.com/api/v2/youtube/transcript'
+    params = {'video_url': youtube_link, 'format': 'json'}
+
+    oembed_response, response = await asyncio.gather(
+        http_client.aget(oembed_url, timeout=10),
+        http_client.aget(url, params=params, headers={'Authorization': 'Bearer ' + API_KEY}, timeout=30)
+    )
+    oembed_response.raise_for_status()
+    title = oembed_response.json().get('title', 'Untitled Video')
+    response.raise_for_status()
+    return title, response.json()
+
+
 @login_required
-def upload_file(request):
+async def upload_file(request):
     if request.method == 'POST':
+        user = await request.auser()
         file_type = request.POST.get('file_type')
         youtube_link = request.POST.get('youtube_link', '').strip()
 
         # Get user's subscription
         try:
-            user_subscription = request.user.usersubscription
+            user_subscription = await UserSubscription.objects.select_related('plan').aget(user=user)
         except:
             messages.error(request, "You need an active subscription to upload files")
             return redirect('pricing')
@@ -41,48 +84,14 @@ def upload_file(request):
                 messages.error(request, "YouTube URL is required")
                 return redirect('dashboard')
             
-            import requests
-            import os
-            import re
-            
             try:
                 # 1. Extract video ID from URL
-                def extract_video_id(url):
-                    patterns = [
-                        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-                        r'(?:embed\/)([0-9A-Za-z_-]{11})',
-                        r'^([0-9A-Za-z_-]{11})$'
-                    ]
-                    for pattern in patterns:
-                        match = re.search(pattern, url)
-                        if match:
-                            return match.group(1)
-                    return None
-                
                 video_id = extract_video_id(youtube_link)
                 if not video_id:
                     messages.error(request, "Invalid YouTube URL")
                     return redirect('dashboard')
                 
-                # 2. Get title from YouTube oEmbed (no API key needed!)
-                oembed_url = f'https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json'
-                oembed_response = requests.get(oembed_url, timeout=10)
-                oembed_response.raise_for_status()
-                title = oembed_response.json().get('title', 'Untitled Video')
-                
-                # 3. Get transcript from TranscriptAPI
-                API_KEY = os.getenv('API_KEY', 'sk_x_pq215sTsEweVptvuLwXWaQfSSQsosPvhKJOHreUsg')
-                url = 'https://transcriptapi.com/api/v2/youtube/transcript'
-                params = {'video_url': youtube_link, 'format': 'json'}
-                
-                response = requests.get(
-                    url, 
-                    params=params, 
-                    headers={'Authorization': 'Bearer ' + API_KEY}, 
-                    timeout=30
-                )
-                response.raise_for_status()
-                data = response.json()
+                title, data = await fetch_youtube_metadata(video_id, youtube_link)
                 
                 transcript_segments = data.get('transcript', [])
                 
@@ -97,7 +106,7 @@ def upload_file(request):
                 print(f"Title: {title}, Duration: {duration_min} mins")
 
                 # 5. Check Subscription Limits
-                can_upload, message = user_subscription.can_upload_file('youtube', duration_min=duration_min)
+                can_upload, message = await sync_to_async(user_subscription.can_upload_file)('youtube', duration_min=duration_min)
                 if not can_upload:
                     messages.error(request, message)
                     return redirect('dashboard')
@@ -110,8 +119,8 @@ def upload_file(request):
                 return redirect('dashboard')
             
             try:
-                uploaded_file = UploadedFile.objects.create(
-                    user=request.user,
+                uploaded_file = await UploadedFile.objects.acreate(
+                    user=user,
                     file_type='youtube',
                     youtube_link=youtube_link,
                     file=None,
@@ -120,77 +129,99 @@ def upload_file(request):
                     # transcript_text=full_transcript_text 
                 )
 
-                ExtractedText.objects.create(user=request.user, uploaded_file=uploaded_file, extracted_text=full_transcript_text)
+                await ExtractedText.objects.acreate(user=user, uploaded_file=uploaded_file, extracted_text=full_transcript_text)
+                # The worker summarizes the transcript and indexes it for search
+                await sync_to_async(enqueue_summary_job)(user, uploaded_file)
                 messages.success(request, "YouTube link saved successfully")
                 return redirect('summary', file_id=uploaded_file.id)
             except Exception as e:
                 messages.error(request, f"Error saving YouTube link: {str(e)}")
                 return redirect('dashboard')
 
-        # Handle file uploads (PDF/Audio) - No changes made below here
-        form = FileUploadForm(request.POST, request.FILES)
-        if form.is_valid():
-            uploaded_file = form.save(commit=False)
-            uploaded_file.user = request.user
+        # File uploads only touch local storage and the database, so they run in a thread
+        return await sync_to_async(save_uploaded_file)(request, user_subscription)
+    
+    return await sync_to_async(render)(request, 'knowbite/dashboard.html')
+
+
+def save_uploaded_file(request, user_subscription):
+    """Validate and store a PDF/audio upload against the user's plan limits"""
+    form = FileUploadForm(request.POST, request.FILES)
+    if form.is_valid():
+        uploaded_file = form.save(commit=False)
+        uploaded_file.user = request.user
+        
+        # Validate file type consistency
+        if uploaded_file.file_type == 'youtube':
+            messages.error(request, "Invalid file type selection")
+            return redirect('dashboard')
             
-            # Validate file type consistency
-            if uploaded_file.file_type == 'youtube':
-                messages.error(request, "Invalid file type selection")
-                return redirect('dashboard')
+        # Check file size and other limits
+        file_size_mb = uploaded_file.file.size / (1024 * 1024)  # Convert to MB
+        
+        # For PDFs, get page count
+        pages = None            
+        if uploaded_file.file_type == 'pdf':
+            try:
+                # Get the file content as bytes
+                file_content = uploaded_file.file.read()
                 
-            # Check file size and other limits
-            file_size_mb = uploaded_file.file.size / (1024 * 1024)  # Convert to MB
-            
-            # For PDFs, get page count
-            pages = None            
-            if uploaded_file.file_type == 'pdf':
-                try:
-                    # Get the file content as bytes
-                    file_content = uploaded_file.file.read()
-                    
-                    import io
-                    import pdfplumber
-                    with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-                        pages = len(pdf.pages)
-                        print(f"PDF pages: {pages}")
-                    # Reset file pointer for later use
-                    uploaded_file.file.seek(0)
-                except Exception as e:
-                    print(f"Error counting PDF pages: {str(e)}")
-                    pages = None
-            
-            # For audio, get duration
-            duration_min = None
-            if uploaded_file.file_type == 'audio':
-                try:
-                    import mutagen
-                    audio = mutagen.File(uploaded_file.file)
-                    if audio:
-                        duration_min = audio.info.length / 60  # Convert seconds to minutes
-                        print(duration_min)
-                except:
-                    duration_min = None
-            
-            # Check limits based on file type
-            can_upload, message = user_subscription.can_upload_file(
-                uploaded_file.file_type,
-                file_size_mb=file_size_mb,
-                duration_min=duration_min,
-                pages=pages
-            )
+                import io
+                import pdfplumber
+                with pdfplumber.open(io.BytesIO(file_content)) as pdf:
+                    pages = len(pdf.pages)
+                    print(f"PDF pages: {pages}")
+                # Reset file pointer for later use
+                uploaded_file.file.seek(0)
+            except Exception as e:
+                print(f"Error counting PDF pages: {str(e)}")
+                pages = None
+        
+        # For audio, get duration
+        duration_min = None
+        if uploaded_file.file_type == 'audio':
+            try:
+                import mutagen
+                audio = mutagen.File(uploaded_file.file)
+                if audio:
+                    duration_min = audio.info.length / 60  # Convert seconds to minutes
+                    print(duration_min)
+            except:
+                duration_min = None
+        
+        # Check limits based on file type
+        can_upload, message = user_subscription.can_upload_file(
+            uploaded_file.file_type,
+            file_size_mb=file_size_mb,
+            duration_min=duration_min,
+            pages=pages
+        )
+        
+        if not can_upload:
+            messages.error(request, message)
+            return redirect('dashboard')
             
-            if not can_upload:
-                messages.error(request, message)
-                return redirect('dashboard')
-                
-            uploaded_file.save()
-            messages.success(request, "File uploaded successfully")
-            return redirect('summary', file_id=uploaded_file.id)
-        else:
-            # Improved error messaging
-            errors = "\n".join([f"{field}: {','.join(errors)}" for field, errors in form.errors.items()])
-            messages.error(request, f"Upload failed:\n{errors}")
-    
+        # Identical files reuse the text extracted from an earlier upload
+        try:
+            uploaded_file.content_hash = hash_file(uploaded_file.file)
+        except Exception as e:
+            print(f"Error hashing upload: {str(e)}")
+
+        uploaded_file.save()
+
+        cached_text = get_cached_text(uploaded_file.content_hash, count_miss=False)
+        if cached_text is not None:
+            ExtractedText.objects.create(user=request.user, uploaded_file=uploaded_file, extracted_text=cached_text)
+            # The worker summarizes the text and indexes it for search
+            enqueue_summary_job(request.user, uploaded_file)
+
+        messages.success(request, "File uploaded successfully")
+        return redirect('summary', file_id=uploaded_file.id)
+    else:
+        # Improved error messaging
+        errors = "\n".join([f"{field}: {','.join(errors)}" for field, errors in form.errors.items()])
+        messages.error(request, f"Upload failed:\n{errors}")
+
     return render(request, 'knowbite/dashboard.html')
 
 
@@ -212,6 +243,29 @@ def yournotes(request, file_id=None):
     }
     return render(request, 'knowbite/yournotes.html', context)
 
+@login_required
+def search_notes(request):
+    """Semantic search over the passages of all the user's notes, as JSON for the dashboard"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'results': []})
+    try:
+        hits = search_files(request.user, query)
+    except Exception as e:
+        print(f"Search error: {e}")
+        return JsonResponse({'error': 'Search is unavailable right now.'}, status=503)
+    results = [
+        {
+            'file_id': hit['uploaded_file'].id,
+            'title': hit['uploaded_file'].filename(),
+            'url': reverse('summary', args=[hit['uploaded_file'].id]),
+            'snippet': hit['text'][:300],
+            'score': round(hit['score'], 3),
+        }
+        for hit in hits
+    ]
+    return JsonResponse({'results': results})
+
 @login_required
 def settings(request):
     user_plan = request.user.usersubscription
@@ -1,12 +1,29 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
 
 class SecurityHeadersMiddleware:
+    # Runs natively on both stacks, so async views under ASGI are not
+    # bounced through a thread for this middleware
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         response = self.get_response(request)
-        
+        return self.add_headers(response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.add_headers(response)
+
+    def add_headers(self, response):
         # Add CSP headers
         if hasattr(settings, 'CSP_HEADER'):
             csp_parts = []
@@ -14,11 +31,42 @@ class SecurityHeadersMiddleware:
                 if sources:
                     # Join the sources with spaces and add to CSP parts
                     csp_parts.append(f"{directive} {' '.join(sources)}")
-            
+
             if csp_parts:
                 # Join all parts with semicolons and set the header
                 response["Content-Security-Policy"] = "; ".join(csp_parts)
                 # Also set the report-only header for testing
                 response["Content-Security-Policy-Report-Only"] = "; ".join(csp_parts)
-        
+
         return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that does not force the whole request onto the sync path.
+
+    WhiteNoise itself is sync-only, and a single sync middleware makes
+    Django run every async view through one shared thread under ASGI.
+    Static files are still served from a thread; everything else goes
+    straight to the async handler.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
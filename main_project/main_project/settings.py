@@ -16,6 +16,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
+import sys
+import tempfile
 import dj_database_url
 import certifi
 import shutil
@@ -135,7 +137,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'main_project.middleware.SecurityHeadersMiddleware',
     'allauth.account.middleware.AccountMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'main_project.middleware.AsyncWhiteNoiseMiddleware',
 ]
 
 # Security Headers
@@ -230,7 +232,13 @@ WSGI_APPLICATION = 'main_project.wsgi.application'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
 DATABASES = {
-    'default': dj_database_url.config(default=os.environ.get('DATABASE_URL'), conn_max_age=600, ssl_require=True)
+    # Persistent connections are not reused across requests under ASGI, so
+    # they are off by default; the summary worker keeps its own connection open
+    'default': dj_database_url.config(
+        default=os.environ.get('DATABASE_URL'),
+        conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', '0')),
+        ssl_require=True
+    )
     
 }
 
@@ -294,6 +302,112 @@ LOGIN_URL = 'login'
 ASSEMBLYAI_API_KEY = os.getenv('ASSEMBLYAI_API_KEY')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
+# Outbound HTTP (result/http_client.py): pooled sessions per host, default
+# timeouts and retries with jittered exponential backoff
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 3))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', 0.5))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', 10))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))
+
+# AssemblyAI transcription. Point ASSEMBLYAI_BASE_URL at `manage.py fake_assemblyai`
+# for local testing. With ASSEMBLYAI_WEBHOOK_URL set (the public URL of
+# webhooks/assemblyai/), transcripts complete through the webhook and the
+# worker's poller only picks up missed ones.
+ASSEMBLYAI_BASE_URL = os.getenv('ASSEMBLYAI_BASE_URL', 'https://api.assemblyai.com').rstrip('/')
+ASSEMBLYAI_WEBHOOK_URL = os.getenv('ASSEMBLYAI_WEBHOOK_URL', '')
+ASSEMBLYAI_WEBHOOK_SECRET = os.getenv('ASSEMBLYAI_WEBHOOK_SECRET', '')
+TRANSCRIPTION_POLL_INTERVAL = int(os.getenv('TRANSCRIPTION_POLL_INTERVAL', 15))
+TRANSCRIPTION_TIMEOUT_SECONDS = int(os.getenv('TRANSCRIPTION_TIMEOUT_SECONDS', 3 * 60 * 60))
+# Audio is piped from storage to AssemblyAI in chunks of this many bytes
+TRANSCRIPTION_UPLOAD_CHUNK_SIZE = int(os.getenv('TRANSCRIPTION_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024))
+
+# Background summary worker (python manage.py run_summary_worker)
+SUMMARY_WORKER_POLL_INTERVAL = float(os.getenv('SUMMARY_WORKER_POLL_INTERVAL', 2))
+# A claimed job whose heartbeat (refreshed every SUMMARY_JOB_HEARTBEAT_SECONDS while it
+# runs) is older than SUMMARY_JOB_STALE_SECONDS is re-queued; workers check every
+# SUMMARY_JOB_REQUEUE_INTERVAL seconds.
+SUMMARY_JOB_STALE_SECONDS = int(os.getenv('SUMMARY_JOB_STALE_SECONDS', 900))
+SUMMARY_JOB_HEARTBEAT_SECONDS = float(os.getenv('SUMMARY_JOB_HEARTBEAT_SECONDS', 30))
+SUMMARY_JOB_REQUEUE_INTERVAL = float(os.getenv('SUMMARY_JOB_REQUEUE_INTERVAL', 60))
+
+# Stream first-time summaries to the page as the worker writes them, instead of
+# showing them once the job is done. The worker saves its partial output every
+# SUMMARY_STREAM_FLUSH_SECONDS and the stream checks the job every
+# SUMMARY_STREAM_POLL_INTERVAL, handing over to status polling after
+# SUMMARY_STREAM_MAX_SECONDS.
+SUMMARY_STREAMING_ENABLED = os.getenv('SUMMARY_STREAMING_ENABLED', 'True') == 'True'
+SUMMARY_STREAM_FLUSH_SECONDS = float(os.getenv('SUMMARY_STREAM_FLUSH_SECONDS', 0.5))
+SUMMARY_STREAM_POLL_INTERVAL = float(os.getenv('SUMMARY_STREAM_POLL_INTERVAL', 0.5))
+SUMMARY_STREAM_MAX_SECONDS = int(os.getenv('SUMMARY_STREAM_MAX_SECONDS', 600))
+
+# Chunk summarization: parallel map calls over token-budgeted chunks
+SUMMARY_MAX_CONCURRENCY = int(os.getenv('SUMMARY_MAX_CONCURRENCY', 4))
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', 32000))
+SUMMARY_CHUNK_OVERLAP_TOKENS = int(os.getenv('SUMMARY_CHUNK_OVERLAP_TOKENS', 200))
+# 'single_pass' sends documents up to SUMMARY_SINGLE_PASS_MAX_TOKENS in one call;
+# 'map_reduce' condenses anything over SUMMARY_CHUNK_TOKENS first
+SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'single_pass')
+SUMMARY_SINGLE_PASS_MAX_TOKENS = int(os.getenv('SUMMARY_SINGLE_PASS_MAX_TOKENS', 800000))
+
+# Chat retrieval: the extracted text is indexed in passages and only the best matches go into each prompt
+RETRIEVAL_PASSAGE_TOKENS = int(os.getenv('RETRIEVAL_PASSAGE_TOKENS', 300))
+RETRIEVAL_PASSAGE_OVERLAP_TOKENS = int(os.getenv('RETRIEVAL_PASSAGE_OVERLAP_TOKENS', 40))
+CHAT_CONTEXT_PASSAGES = int(os.getenv('CHAT_CONTEXT_PASSAGES', 6))
+# 'bm25', or 'hybrid' to also rank passages by embedding similarity
+CHAT_RETRIEVAL = os.getenv('CHAT_RETRIEVAL', 'hybrid')
+
+# Chat prompt prefix (instructions + document summary) kept in Gemini's context cache between turns.
+# Prefixes under CHAT_CACHE_MIN_TOKENS are below Gemini's minimum and are sent inline.
+CHAT_PROMPT_CACHING_ENABLED = os.getenv('CHAT_PROMPT_CACHING_ENABLED', 'True') == 'True'
+CHAT_CACHE_TTL_SECONDS = int(os.getenv('CHAT_CACHE_TTL_SECONDS', 3600))
+CHAT_CACHE_REFRESH_SECONDS = int(os.getenv('CHAT_CACHE_REFRESH_SECONDS', 300))
+# How long one turn may take to extend or replace a file's cache before another may take over
+CHAT_CACHE_LEASE_SECONDS = int(os.getenv('CHAT_CACHE_LEASE_SECONDS', 120))
+CHAT_CACHE_MIN_TOKENS = int(os.getenv('CHAT_CACHE_MIN_TOKENS', 1024))
+
+# Quiz question bank: quizzes are sampled from stored questions, and the worker tops a
+# difficulty back up to QUIZ_BANK_SIZE unserved questions once a quiz would have to repeat.
+# New summaries get their bank pre-generated for QUIZ_BANK_PREGENERATE (comma-separated, may be empty).
+QUIZ_BANK_SIZE = int(os.getenv('QUIZ_BANK_SIZE', 20))
+QUIZ_BANK_PREGENERATE = os.getenv('QUIZ_BANK_PREGENERATE', 'medium')
+
+# Passage embeddings for semantic search. EMBEDDING_BACKEND is a dotted path to an
+# embedder class; result.embeddings.HashingEmbedder runs locally without network access.
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'result.embeddings.GeminiEmbedder')
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'gemini-embedding-001')
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', 768))
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 100))
+# Per-process cache of memory-mapped vector files; the database holds the originals
+EMBEDDING_ROOT = os.getenv('EMBEDDING_ROOT', os.path.join(tempfile.gettempdir(), 'knowbite-embeddings'))
+
+# LLM gateway: Gemini quota shared by all workers through the database, and retries on 429/5xx
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', 120))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv('GEMINI_TOKENS_PER_MINUTE', 1000000))
+GEMINI_REQUEST_BURST = int(os.getenv('GEMINI_REQUEST_BURST', 4))
+# Output tokens reserved per call until the real usage is known
+LLM_OUTPUT_TOKEN_ESTIMATE = int(os.getenv('LLM_OUTPUT_TOKEN_ESTIMATE', 1024))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 4))
+LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', 1))
+LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', 30))
+
+# PDF extraction: pages are processed in parallel and only image-only pages are OCR'd
+PDF_EXTRACTION_WORKERS = int(os.getenv('PDF_EXTRACTION_WORKERS', os.cpu_count() or 1))
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', 4))
+# Pages with at least this many vector drawings are checked for tables
+PDF_TABLE_MIN_DRAWINGS = int(os.getenv('PDF_TABLE_MIN_DRAWINGS', 6))
+PDF_PAGE_TIMEOUT = int(os.getenv('PDF_PAGE_TIMEOUT', 60))
+PDF_OCR_MIN_PAGE_CHARS = int(os.getenv('PDF_OCR_MIN_PAGE_CHARS', 25))
+# OCR rasterizes PDF_OCR_WINDOW pages at a time at this resolution
+PDF_OCR_DPI = int(os.getenv('PDF_OCR_DPI', 200))
+PDF_OCR_WINDOW = int(os.getenv('PDF_OCR_WINDOW', 1))
+
+# Summaries shared across users for identical source text
+SUMMARY_CACHE_ENABLED = os.getenv('SUMMARY_CACHE_ENABLED', 'True') == 'True'
+SUMMARY_CACHE_TTL_DAYS = int(os.getenv('SUMMARY_CACHE_TTL_DAYS', 30))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', 5000))
+
 # Polar.sh configuration
 POLAR_API_KEY = os.getenv('POLAR_API_KEY')
 POLAR_CLIENT_TOKEN = os.getenv('POLAR_CLIENT_TOKEN')
@@ -316,6 +430,12 @@ DEFAULT_FROM_EMAIL = 'KnowBite <onboarding@resend.dev'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Logging Configuration
+# App logs also go to LOG_FILE (default BASE_DIR/debug.log). Set LOG_FILE='' for
+# console-only logging; `manage.py test` never writes the file.
+RUNNING_TESTS = sys.argv[1:2] == ['test']
+LOG_FILE = '' if RUNNING_TESTS else os.getenv('LOG_FILE', str(BASE_DIR / 'debug.log'))
+LOG_HANDLERS = ['console', 'file'] if LOG_FILE else ['console']
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -330,19 +450,24 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
-        'file': {
-            'class': 'logging.FileHandler',
-            'filename': 'debug.log',
-            'formatter': 'verbose',
-        },
     },
     'loggers': {
         'knowbite': {  # This will catch all loggers in your knowbite app
-            'handlers': ['console', 'file'],
+            'handlers': LOG_HANDLERS,
             'level': 'DEBUG',
         },
+        'result': {
+            'handlers': LOG_HANDLERS,
+            'level': 'INFO',
+        },
     },
 }
+if LOG_FILE:
+    LOGGING['handlers']['file'] = {
+        'class': 'logging.FileHandler',
+        'filename': LOG_FILE,
+        'formatter': 'verbose',
+    }
 
 TAILWIND_APP_NAME = 'theme'
 INTERNAL_IPS = [
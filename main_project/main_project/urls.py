@@ -28,11 +28,16 @@ urlpatterns = [
     path('logout/', users_views.logout_view, name='logout'),
     path('register/', users_views.register, name='register'),
     path('summary/<int:file_id>/', result_views.summary_result, name='summary'),
+    path('summary/<int:file_id>/status/', result_views.summary_status, name='summary_status'),
+    path('summary/<int:file_id>/stream/', result_views.summary_stream, name='summary_stream'),
     path("quiz/<int:file_id>/options/", result_views.quiz_options, name="quiz_options"),
     path("quiz/<int:file_id>/generate/", result_views.take_quiz, name="take_quiz"),
-    path("quiz/<int:file_id>/display/", result_views.submit_quiz, name="submit_quiz"),
+    path("quiz/<int:file_id>/display/<int:quiz_id>/", result_views.submit_quiz, name="submit_quiz"),
     path("chatbot/<int:file_id>/", result_views.chatbot, name='chatbot'),
+    path('chat/<int:file_id>/stream/', result_views.chat_stream, name='chat_stream'),
     path("transcript/<int:file_id>/", result_views.transcripts, name='transcripts'),
+    path('webhooks/assemblyai/', result_views.assemblyai_webhook, name='assemblyai_webhook'),
+    path('ops/metrics/', result_views.ops_metrics, name='ops_metrics'),
     path('terms_of_service/', users_views.terms_of_service, name='terms'),
     path('privacy_policy', users_views.privacy_policy, name='privacy'),
     path('accounts/', include('allauth.urls')),
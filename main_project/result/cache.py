@@ -0,0 +1,145 @@
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from knowbite.models import CacheCounter, ExtractedTextCache, SummaryCache
+
+logger = logging.getLogger(__name__)
+
+EXTRACTED_TEXT_CACHE = 'extracted_text'
+SUMMARY_CACHE = 'summary'
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text):
+    return hash_bytes(text.encode('utf-8'))
+
+
+def hash_file(file_field, chunk_size=1024 * 1024):
+    """SHA-256 of a stored file, read from the storage backend in chunks"""
+    digest = hashlib.sha256()
+    file_field.open('rb')
+    try:
+        for chunk in file_field.chunks(chunk_size):
+            digest.update(chunk)
+    finally:
+        file_field.seek(0)
+    return digest.hexdigest()
+
+
+def get_content_hash(uploaded_file):
+    """Return the file's content hash, computing and saving it if missing"""
+    if uploaded_file.content_hash:
+        return uploaded_file.content_hash
+    if not uploaded_file.file:
+        return None
+    uploaded_file.content_hash = hash_file(uploaded_file.file)
+    uploaded_file.save(update_fields=['content_hash'])
+    return uploaded_file.content_hash
+
+
+def record_cache_event(name, hit):
+    """Bump the hit or miss counter for one of the caches"""
+    field = 'hits' if hit else 'misses'
+    counter, _ = CacheCounter.objects.get_or_create(name=name)
+    CacheCounter.objects.filter(pk=counter.pk).update(**{field: F(field) + 1})
+
+
+def get_cached_text(content_hash, count_miss=True):
+    """Look up extracted text for a content hash, counting the hit or miss.
+
+    The upload view passes ``count_miss=False`` so that a miss is only
+    counted once, when the summary pipeline actually extracts the file.
+    """
+    if not content_hash:
+        return None
+    updated = ExtractedTextCache.objects.filter(content_hash=content_hash).update(
+        hit_count=F('hit_count') + 1,
+        last_used_at=timezone.now()
+    )
+    if not updated:
+        if count_miss:
+            record_cache_event(EXTRACTED_TEXT_CACHE, hit=False)
+        return None
+
+    record_cache_event(EXTRACTED_TEXT_CACHE, hit=True)
+    logger.info(f"Extracted text cache hit for {content_hash[:12]}")
+    return ExtractedTextCache.objects.values_list('extracted_text', flat=True).get(content_hash=content_hash)
+
+
+def store_extracted_text(content_hash, text):
+    """Remember the extracted text for a content hash; failed extractions are not cached"""
+    if not content_hash or not text or not text.strip():
+        return
+    try:
+        ExtractedTextCache.objects.get_or_create(content_hash=content_hash, defaults={'extracted_text': text})
+    except IntegrityError:
+        # Another worker stored the same file first
+        pass
+
+
+def get_cached_summary(source_hash, prompt_version, model_name, notes_version='', summary_mode=''):
+    """Return a shared summary for this source/prompts/pipeline/model, or None.
+
+    ``notes_version`` and ``summary_mode`` are part of the key because the
+    notes stage and the mode decide what the final call actually sees.
+    Entries older than SUMMARY_CACHE_TTL_DAYS are treated as misses and removed.
+    """
+    if not settings.SUMMARY_CACHE_ENABLED:
+        return None
+    entries = SummaryCache.objects.filter(
+        source_hash=source_hash,
+        prompt_version=prompt_version,
+        notes_version=notes_version,
+        summary_mode=summary_mode,
+        model_name=model_name
+    )
+    cutoff = timezone.now() - timedelta(days=settings.SUMMARY_CACHE_TTL_DAYS)
+    entries.filter(created_at__lt=cutoff).delete()
+
+    updated = entries.update(hit_count=F('hit_count') + 1, last_used_at=timezone.now())
+    record_cache_event(SUMMARY_CACHE, hit=bool(updated))
+    if not updated:
+        return None
+
+    logger.info(f"Summary cache hit for {source_hash[:12]} ({model_name}, {prompt_version}, {summary_mode})")
+    return entries.values_list('summary_text', flat=True).first()
+
+
+def store_summary(source_hash, prompt_version, model_name, summary_text, notes_version='', summary_mode=''):
+    """Save a freshly generated summary for other users, replacing an older one"""
+    if not settings.SUMMARY_CACHE_ENABLED:
+        return
+    try:
+        SummaryCache.objects.update_or_create(
+            source_hash=source_hash,
+            prompt_version=prompt_version,
+            notes_version=notes_version,
+            summary_mode=summary_mode,
+            model_name=model_name,
+            defaults={'summary_text': summary_text}
+        )
+    except IntegrityError:
+        pass
+    evict_summaries()
+
+
+def evict_summaries():
+    """Drop expired entries, then the least recently used ones above the size limit"""
+    cutoff = timezone.now() - timedelta(days=settings.SUMMARY_CACHE_TTL_DAYS)
+    SummaryCache.objects.filter(created_at__lt=cutoff).delete()
+
+    overflow = SummaryCache.objects.count() - settings.SUMMARY_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        stale_ids = list(
+            SummaryCache.objects.order_by('last_used_at').values_list('id', flat=True)[:overflow]
+        )
+        SummaryCache.objects.filter(id__in=stale_ids).delete()
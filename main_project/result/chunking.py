@@ -0,0 +1,146 @@
+import logging
+import re
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Separates pages in extracted PDF text, like pdftotext does
+PAGE_BREAK = "\f"
+
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+PAGE_PATTERN = re.compile(PAGE_BREAK)
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+
+
+def count_tokens(text):
+    """Estimate how many Gemini tokens ``text`` uses.
+
+    Words count as one token per four characters (at least one) and each
+    punctuation mark as one, which tracks SentencePiece closely enough for
+    budgeting without a tokenizer round trip.
+    """
+    return sum((len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == '_' else 1
+               for piece in WORD_PATTERN.findall(text))
+
+
+def split_after(pattern, text, keep=None):
+    """Split ``text`` after each match of ``pattern``, so pieces keep their separators"""
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        if keep is None or keep(match):
+            pieces.append(text[start:match.end()])
+            start = match.end()
+    pieces.append(text[start:])
+    return [piece for piece in pieces if piece]
+
+
+def split_sentences(text):
+    """Split at sentence ends, but never inside a ``$...$`` formula"""
+    scanned = 0
+    dollars = 0
+
+    def outside_formula(match):
+        nonlocal scanned, dollars
+        dollars += text.count('$', scanned, match.start())
+        scanned = match.start()
+        return dollars % 2 == 0
+
+    return split_after(SENTENCE_PATTERN, text, outside_formula)
+
+
+def split_words(text, max_tokens):
+    """Last resort for a single oversized sentence: cut between words"""
+    pieces = []
+    current = []
+    size = 0
+    for word in re.findall(r"\S+\s*", text):
+        tokens = count_tokens(word)
+        if current and size + tokens > max_tokens:
+            pieces.append(''.join(current))
+            current, size = [], 0
+        current.append(word)
+        size += tokens
+    if current:
+        pieces.append(''.join(current))
+    return pieces
+
+
+def _units(text, max_tokens):
+    """Break text into pieces of at most ``max_tokens``, as coarse as possible.
+
+    Pages are kept whole when they fit, then paragraphs, then sentences,
+    and only a sentence longer than the budget is split between words.
+    Every piece keeps its trailing whitespace, so joining them restores
+    the text.
+    """
+    splitters = [
+        lambda t: split_after(PAGE_PATTERN, t),
+        lambda t: split_after(PARAGRAPH_PATTERN, t),
+        split_sentences,
+    ]
+
+    def split(piece, level):
+        tokens = count_tokens(piece)
+        if tokens <= max_tokens:
+            return [(piece, tokens)]
+        if level == len(splitters):
+            return [(part, count_tokens(part)) for part in split_words(piece, max_tokens)]
+        parts = splitters[level](piece)
+        if len(parts) == 1:
+            return split(piece, level + 1)
+        return [unit for part in parts for unit in split(part, level + 1)]
+
+    return split(text, 0)
+
+
+def _overlap(text, overlap_tokens):
+    """The trailing sentences of a chunk that fit in ``overlap_tokens``"""
+    tail = []
+    size = 0
+    for sentence in reversed(split_sentences(text)):
+        tokens = count_tokens(sentence)
+        if size + tokens > overlap_tokens:
+            break
+        tail.insert(0, sentence)
+        size += tokens
+    return ''.join(tail), size
+
+
+def chunk_text(text, max_tokens=None, overlap_tokens=None):
+    """Pack text into as few chunks as fit ``max_tokens`` each.
+
+    Chunks only end at page, paragraph or sentence boundaries (or between
+    words, for a sentence that is longer than the whole budget). With
+    ``overlap_tokens``, each chunk starts with the last sentences of the
+    previous one so context carries across the cut.
+    """
+    max_tokens = max_tokens or settings.SUMMARY_CHUNK_TOKENS
+    overlap_tokens = settings.SUMMARY_CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    overlap_tokens = min(overlap_tokens, max_tokens // 4)
+    if not text.strip():
+        return []
+
+    chunks = []
+    current = []
+    size = 0
+    for piece, tokens in _units(text, max_tokens - overlap_tokens):
+        if current and size + tokens > max_tokens:
+            chunk = ''.join(current)
+            chunks.append(chunk)
+            tail, size = _overlap(chunk, overlap_tokens) if overlap_tokens else ('', 0)
+            current = [tail] if tail else []
+        current.append(piece)
+        size += tokens
+    if current:
+        chunks.append(''.join(current))
+
+    chunks = [chunk.strip() for chunk in chunks if chunk.strip()]
+    sizes = [count_tokens(chunk) for chunk in chunks]
+    logger.info(
+        f"Split {count_tokens(text)} tokens into {len(chunks)} chunks "
+        f"(budget {max_tokens}, overlap {overlap_tokens}, sizes {min(sizes)}-{max(sizes)})"
+    )
+    return chunks
@@ -0,0 +1,110 @@
+import logging
+import re
+import unicodedata
+from html.parser import HTMLParser
+
+from .chunking import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Bump when make_digest changes, so stored digests are rebuilt
+DIGEST_VERSION = 1
+
+SKIPPED_TAGS = {'style', 'script', 'svg', 'head'}
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'header', 'footer', 'blockquote', 'pre', 'figure', 'figcaption',
+    'ul', 'ol', 'br', 'hr',
+}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+# Variation selectors and joiners that only glue emoji together
+EMOJI_JOINERS = {'\u200d', '\ufe0e', '\ufe0f', '\u20e3'}
+SPACES_PATTERN = re.compile(r"[ \t]+")
+BLANK_LINES_PATTERN = re.compile(r"\n\s*\n+")
+
+
+def _is_emoji(char):
+    # Symbols below U+2600 (degree sign, arrows, box drawing) carry meaning and are kept
+    return char in EMOJI_JOINERS or (ord(char) >= 0x2600 and unicodedata.category(char) in ('So', 'Sk'))
+
+
+class _DigestParser(HTMLParser):
+    """Keeps the text of summary HTML with just enough structure for a model to follow it"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+        self.tables = 0
+        self.row = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skipping += 1
+        elif tag in HEADING_TAGS:
+            self.parts.append("\n\n" + "#" * int(tag[1]) + " ")
+        elif tag == 'li':
+            self.parts.append("\n- ")
+        elif tag == 'table':
+            self.tables += 1
+            self.parts.append("\n\n")
+        elif tag == 'tr':
+            self.row = []
+        elif tag in ('td', 'th') and self.row is not None:
+            self.row.append([])
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag == 'table':
+            self.tables = max(0, self.tables - 1)
+            self.parts.append("\n\n")
+        elif tag == 'tr' and self.row is not None:
+            cells = [' '.join(''.join(cell).split()) for cell in self.row]
+            self.parts.append("\n| " + " | ".join(cells) + " |")
+            self.row = None
+        elif tag in HEADING_TAGS or tag in BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if self.skipping:
+            return
+        if self.row is not None and self.row:
+            self.row[-1].append(data)
+        elif self.row is None and (data.strip() or not self.tables):
+            # Whitespace between table rows would split the table
+            self.parts.append(data)
+
+    def text(self):
+        return ''.join(self.parts)
+
+
+def make_digest(summary_html):
+    """Plain-text digest of a blog-style summary for use in prompts.
+
+    Stylesheets, scripts, tags, CSS classes and emoji are dropped; headings,
+    list items and table rows keep a light Markdown shape, and ``$...$``
+    math is left as it is.
+    """
+    parser = _DigestParser()
+    parser.feed(summary_html)
+    parser.close()
+    text = ''.join(char for char in parser.text() if not _is_emoji(char))
+    lines = [SPACES_PATTERN.sub(' ', line).strip() for line in text.splitlines()]
+    # Headings left empty once their emoji is gone are dropped too
+    lines = [line for line in lines if not line or line.strip('#- ')]
+    return BLANK_LINES_PATTERN.sub("\n\n", "\n".join(lines)).strip()
+
+
+def summary_digest(summary):
+    """The stored digest of a ``Summary``, built and saved first if missing or out of date"""
+    if summary.digest_text and summary.digest_version == DIGEST_VERSION:
+        return summary.digest_text
+    summary.digest_text = make_digest(summary.summary_text)
+    summary.digest_version = DIGEST_VERSION
+    summary.save(update_fields=['digest_text', 'digest_version'])
+    logger.info(
+        f"Digest of summary {summary.pk}: {count_tokens(summary.summary_text)} -> {count_tokens(summary.digest_text)} tokens"
+    )
+    return summary.digest_text
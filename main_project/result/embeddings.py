@@ -0,0 +1,227 @@
+import glob
+import hashlib
+import heapq
+import logging
+import os
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from knowbite.models import EmbeddingIndex, PassageIndex
+
+from .cache import hash_text
+from .retrieval import get_passage_index, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Task hints for embedders that tune vectors for one side of a search
+DOCUMENT = 'document'
+QUERY = 'query'
+
+
+def normalize(vectors):
+    """L2-normalize rows so a dot product is the cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class GeminiEmbedder:
+    """Embeds through the LLM gateway, so calls share the Gemini rate limit"""
+
+    TASK_TYPES = {DOCUMENT: 'RETRIEVAL_DOCUMENT', QUERY: 'RETRIEVAL_QUERY'}
+
+    def __init__(self):
+        self.dimensions = settings.EMBEDDING_DIMENSIONS
+        self.name = f"{settings.EMBEDDING_MODEL}-{self.dimensions}"
+
+    def embed(self, texts, task=DOCUMENT):
+        # Imported here so the local embedder works without a Gemini client
+        from .llm import BACKGROUND, INTERACTIVE, get_gateway
+
+        priority = INTERACTIVE if task == QUERY else BACKGROUND
+        rows = []
+        for start in range(0, len(texts), settings.EMBEDDING_BATCH_SIZE):
+            rows.extend(get_gateway().embed(
+                texts[start:start + settings.EMBEDDING_BATCH_SIZE],
+                feature='embedding',
+                priority=priority,
+                task_type=self.TASK_TYPES[task],
+                output_dimensionality=self.dimensions
+            ))
+        return normalize(rows)
+
+
+class HashingEmbedder:
+    """Deterministic local embedder: hashed bag of words, no network or model files.
+
+    Only matches shared terms, so it is meant for tests and offline
+    development rather than real semantic search.
+    """
+
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts, task=DOCUMENT):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                digest = int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little')
+                vectors[row, digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        return normalize(vectors)
+
+
+@lru_cache(maxsize=None)
+def get_embedder():
+    """The embedder named by EMBEDDING_BACKEND, created once per process"""
+    return import_string(settings.EMBEDDING_BACKEND)()
+
+
+def vectors_path(index):
+    return os.path.join(
+        settings.EMBEDDING_ROOT,
+        f"{index.extracted_text_id}-{index.passages_hash[:16]}-{index.model_name}.npy"
+    )
+
+
+def load_vectors(index):
+    """The index's vectors as a read-only memory map, written to disk on first use"""
+    path = vectors_path(index)
+    if not os.path.exists(path):
+        os.makedirs(settings.EMBEDDING_ROOT, exist_ok=True)
+        vectors = np.frombuffer(bytes(index.vectors), dtype=np.float32).reshape(index.count, index.dimensions)
+        # Written under a temporary name so other processes never map a partial file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            np.save(f, vectors)
+        os.replace(temporary, path)
+        # Files of an earlier text or model for the same extracted text are never read again
+        remove_vectors(index.extracted_text_id, keep=path)
+    return np.load(path, mmap_mode='r')
+
+
+def remove_vectors(extracted_text_id, keep=None):
+    """Delete the ``.npy`` files of an extracted text under EMBEDDING_ROOT, except ``keep``"""
+    for path in glob.glob(os.path.join(settings.EMBEDDING_ROOT, f"{extracted_text_id}-*.npy")):
+        if path != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def embed_extracted_text(extracted_text):
+    """Embed every passage of an ``ExtractedText`` and store the vectors"""
+    embedder = get_embedder()
+    passage_index = get_passage_index(extracted_text)
+    passages = passage_index.passages
+    vectors = embedder.embed(passages, DOCUMENT) if passages else np.zeros((0, embedder.dimensions), np.float32)
+    index, _ = EmbeddingIndex.objects.update_or_create(
+        extracted_text=extracted_text,
+        defaults={
+            'source_hash': hash_text(extracted_text.extracted_text),
+            'passages_hash': passage_index.passages_hash,
+            'model_name': embedder.name,
+            'dimensions': embedder.dimensions,
+            'count': len(passages),
+            'vectors': vectors.astype(np.float32).tobytes(),
+        }
+    )
+    remove_vectors(extracted_text.pk, keep=vectors_path(index))
+    logger.info(f"Embedded {len(passages)} passages of extracted text {extracted_text.pk} with {embedder.name}")
+    return index
+
+
+def index_for_search(extracted_text):
+    """Build the passage index and embeddings of an ``ExtractedText`` unless they are current.
+
+    The summary worker calls this for every note it processes, including
+    ones whose text was stored at upload (cached PDFs, YouTube transcripts),
+    so every note shows up in chat retrieval and the dashboard search
+    without embedding calls in the upload request. Failures are logged
+    rather than raised: the passage index is rebuilt on first use and
+    ``build_embeddings`` fills in missing vectors.
+    """
+    try:
+        passage_index = get_passage_index(extracted_text)
+        index = EmbeddingIndex.objects.filter(extracted_text=extracted_text).defer('vectors').first()
+        if index is None or not is_current(index, passage_index):
+            embed_extracted_text(extracted_text)
+    except Exception as e:
+        logger.warning(f"Indexing extracted text {extracted_text.pk} for search failed: {e}")
+
+
+def is_current(index, passage_index):
+    """Whether the vectors were made by the current embedder from exactly these passages"""
+    return (
+        index.model_name == get_embedder().name
+        and index.passages_hash == passage_index.passages_hash
+        and index.count == len(passage_index.passages)
+    )
+
+
+def top_k(vectors, query_vector, k):
+    """``(row, score)`` pairs of the ``k`` rows most similar to ``query_vector``, best first"""
+    if not len(vectors):
+        return []
+    scores = vectors @ query_vector
+    if len(scores) > k:
+        rows = np.argpartition(-scores, k - 1)[:k]
+    else:
+        rows = np.arange(len(scores))
+    rows = rows[np.argsort(-scores[rows])]
+    return [(int(row), float(scores[row])) for row in rows]
+
+
+def semantic_search(extracted_text, query, limit, passage_index=None):
+    """Numbers of ``passage_index`` passages closest to ``query``, best first.
+
+    Empty if the text is not embedded yet, or was embedded from a different
+    split into passages.
+    """
+    passage_index = passage_index or get_passage_index(extracted_text)
+    index = EmbeddingIndex.objects.filter(extracted_text=extracted_text).first()
+    if index is None or not is_current(index, passage_index):
+        return []
+    query_vector = get_embedder().embed([query], QUERY)[0]
+    return [row for row, _ in top_k(load_vectors(index), query_vector, limit)]
+
+
+def search_files(user, query, limit=10):
+    """Best-matching passages across all of a user's files.
+
+    Returns dicts with the ``uploaded_file``, the passage ``text`` and its
+    cosine ``score``, best first.
+    """
+    embedder = get_embedder()
+    indexes = EmbeddingIndex.objects.filter(
+        extracted_text__uploaded_file__user=user, model_name=embedder.name, count__gt=0
+    ).exclude(passages_hash='').defer('vectors').select_related('extracted_text__uploaded_file')
+    if not indexes:
+        return []
+
+    query_vector = embedder.embed([query], QUERY)[0]
+    hits = []
+    for index in indexes:
+        for row, score in top_k(load_vectors(index), query_vector, limit):
+            if score > 0:
+                hits.append((score, index, row))
+    hits = heapq.nlargest(limit, hits, key=lambda hit: hit[0])
+
+    # Rows only line up with the passage list they were embedded from
+    passages = {
+        (extracted_text_id, passages_hash): texts
+        for extracted_text_id, passages_hash, texts in PassageIndex.objects.filter(
+            extracted_text_id__in={index.extracted_text_id for _, index, _ in hits}
+        ).values_list('extracted_text_id', 'passages_hash', 'passages')
+    }
+    results = []
+    for score, index, row in hits:
+        texts = passages.get((index.extracted_text_id, index.passages_hash))
+        if texts and row < len(texts):
+            results.append({'uploaded_file': index.extracted_text.uploaded_file, 'text': texts[row], 'score': score})
+    return results
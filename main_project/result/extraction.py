@@ -0,0 +1,272 @@
+import logging
+import math
+import resource
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+import pdfplumber
+import pymupdf  # PyMuPDF
+import pytesseract
+from django.conf import settings
+from PIL import Image
+
+from .chunking import PAGE_BREAK
+
+logger = logging.getLogger(__name__)
+
+# Per-page extraction strategies, cheapest first
+TEXT = 'text'
+TABLE = 'table'
+OCR = 'ocr'
+
+
+def current_rss_kb():
+    """Resident memory of this process right now, in KB (0 where /proc is not available)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ExtractionStats:
+    """Per-document counters, including the memory high-water marks of OCR.
+
+    ``peak_rss_growth_kb`` is how far resident memory rose above where it
+    was when the stats were created, so a long-lived worker reports each
+    document's own peak rather than the largest one it has ever handled.
+    """
+
+    def __init__(self, pages=0, strategies=None, peak_image_bytes=0, peak_rss_growth_kb=0):
+        self.pages = pages
+        self.strategies = dict(strategies or {})
+        self.peak_image_bytes = peak_image_bytes
+        self.peak_rss_growth_kb = peak_rss_growth_kb
+        self._baseline_rss_kb = current_rss_kb()
+
+    @property
+    def ocr_pages(self):
+        return self.strategies.get(OCR, 0)
+
+    def record_strategy(self, strategy):
+        self.strategies[strategy] = self.strategies.get(strategy, 0) + 1
+
+    def record_images(self, images):
+        """Track the largest set of rasterized pages held in memory at once"""
+        held = sum(image.width * image.height * len(image.getbands()) for image in images)
+        self.peak_image_bytes = max(self.peak_image_bytes, held)
+
+    def record_rss(self):
+        """Sample resident memory; call it where the document holds the most, e.g. rendered pages"""
+        self.peak_rss_growth_kb = max(self.peak_rss_growth_kb, current_rss_kb() - self._baseline_rss_kb)
+
+    def merge(self, other):
+        for strategy, count in other.strategies.items():
+            self.strategies[strategy] = self.strategies.get(strategy, 0) + count
+        self.peak_image_bytes = max(self.peak_image_bytes, other.peak_image_bytes)
+        self.peak_rss_growth_kb = max(self.peak_rss_growth_kb, other.peak_rss_growth_kb)
+
+    def as_dict(self):
+        return {
+            'pages': self.pages,
+            'strategies': self.strategies,
+            'peak_image_bytes': self.peak_image_bytes,
+            'peak_rss_growth_kb': self.peak_rss_growth_kb,
+        }
+
+    def __str__(self):
+        strategies = ", ".join(f"{count} {name}" for name, count in sorted(self.strategies.items()))
+        return (
+            f"{self.pages} pages ({strategies or 'none'}), "
+            f"peak page images {self.peak_image_bytes / (1024 * 1024):.1f} MB, "
+            f"peak RSS growth {self.peak_rss_growth_kb / 1024:.1f} MB"
+        )
+
+
+def count_pages(pdf_path):
+    with pymupdf.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def classify_page(page, text, min_chars):
+    """Pick the cheapest extractor that works for a PyMuPDF page.
+
+    Pages with a real text layer use PyMuPDF's text, unless they look like
+    they contain a table, which pdfplumber lays out better. Pages without
+    text are only OCR'd when they actually contain an image.
+    """
+    if len(text.strip()) >= min_chars:
+        if len(page.get_drawings()) >= settings.PDF_TABLE_MIN_DRAWINGS and page.find_tables().tables:
+            return TABLE
+        return TEXT
+    if page.get_images(full=False):
+        return OCR
+    return TEXT
+
+
+def _page_windows(page_numbers, window):
+    """Group sorted 0-based page numbers into runs of consecutive pages, at most ``window`` long"""
+    run = []
+    for page_number in page_numbers:
+        if run and (page_number != run[-1] + 1 or len(run) >= window):
+            yield run
+            run = []
+        run.append(page_number)
+    if run:
+        yield run
+
+
+def render_page(page, dpi):
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+    image = Image.frombytes('L', (pixmap.width, pixmap.height), pixmap.samples)
+    del pixmap
+    return image
+
+
+def iter_page_images(doc, page_numbers, dpi=None, window=None, stats=None):
+    """Yield ``(page_number, image)`` for the given 0-based pages of an open document.
+
+    Only ``window`` pages are rasterized at a time and each image is closed
+    as soon as the consumer asks for the next one, so memory stays bounded
+    by the window size instead of the document length.
+    """
+    dpi = dpi or settings.PDF_OCR_DPI
+    window = window or settings.PDF_OCR_WINDOW
+    for run in _page_windows(sorted(page_numbers), window):
+        images = [render_page(doc[page_number], dpi) for page_number in run]
+        if stats is not None:
+            stats.record_images(images)
+            stats.record_rss()
+        try:
+            for page_number, image in zip(run, images):
+                yield page_number, image
+                image.close()
+        finally:
+            for image in images:
+                image.close()
+            del images
+
+
+def ocr_image(image, timeout):
+    return pytesseract.image_to_string(image, config='--psm 6', timeout=timeout)
+
+
+def extract_pages(pdf_path, page_numbers, min_chars, timeout):
+    """Extract a run of pages in a single pass over the open document.
+
+    Returns ``(texts, errors, stats)``. Runs inside a pool process, so it
+    only takes and returns picklable values.
+    """
+    stats = ExtractionStats()
+    texts = {}
+    errors = []
+    ocr_pages = []
+    plumber = None
+
+    with pymupdf.open(pdf_path) as doc:
+        try:
+            for page_number in page_numbers:
+                try:
+                    page = doc[page_number]
+                    text = page.get_text()
+                    strategy = classify_page(page, text, min_chars)
+                    if strategy == TABLE:
+                        if plumber is None:
+                            plumber = pdfplumber.open(pdf_path)
+                        text = plumber.pages[page_number].extract_text() or text
+                    elif strategy == OCR:
+                        ocr_pages.append(page_number)
+                    texts[page_number] = text
+                    stats.record_strategy(strategy)
+                except Exception as e:
+                    errors.append(f"page {page_number + 1}: {e}")
+        finally:
+            if plumber is not None:
+                plumber.close()
+
+        pending = set(ocr_pages)
+        try:
+            for page_number, image in iter_page_images(doc, ocr_pages, stats=stats):
+                try:
+                    texts[page_number] = ocr_image(image, timeout)
+                except RuntimeError as e:
+                    # pytesseract raises RuntimeError when its timeout expires
+                    logger.warning(f"OCR timed out on page {page_number + 1}: {e}")
+                pending.discard(page_number)
+        except Exception as e:
+            errors.extend(f"page {page_number + 1}: {e}" for page_number in sorted(pending))
+
+    stats.record_rss()
+    return texts, errors, stats.as_dict()
+
+
+def _extract_parallel(pdf_path, page_count, workers, min_chars, timeout, stats):
+    pages = [""] * page_count
+    errors = []
+    batch_size = settings.PDF_PAGES_PER_TASK
+    batches = [list(range(start, min(start + batch_size, page_count))) for start in range(0, page_count, batch_size)]
+    # Batches queue behind each other, so the wait for any one batch is
+    # bounded by how many rounds the pool needs plus one batch of OCR.
+    wait = timeout * batch_size * (math.ceil(len(batches) / workers) + 1)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            executor.submit(extract_pages, pdf_path, batch, min_chars, timeout)
+            for batch in batches
+        ]
+        for batch, future in zip(batches, futures):
+            try:
+                texts, batch_errors, batch_stats = future.result(timeout=wait)
+            except FutureTimeoutError:
+                errors.extend(f"page {page_number + 1}: timed out" for page_number in batch)
+                continue
+            except Exception as e:
+                errors.extend(f"page {page_number + 1}: {e}" for page_number in batch)
+                continue
+            for page_number, text in texts.items():
+                pages[page_number] = text
+            errors.extend(batch_errors)
+            stats.merge(ExtractionStats(**batch_stats))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return pages, errors
+
+
+def extract_pdf(pdf_path, max_workers=None, page_timeout=None, min_chars=None):
+    """Extract a PDF page by page, keeping page order. Returns ``(text, stats)``.
+
+    Every page is read once with the cheapest extractor that works for it
+    (see ``classify_page``). With more than one worker, runs of
+    PDF_PAGES_PER_TASK pages are spread over a process pool. OCR is bounded
+    by ``page_timeout`` seconds per page, and a page that fails contributes
+    an empty string instead of failing the document. Pages are separated
+    by ``PAGE_BREAK`` so chunking can keep them whole.
+    """
+    max_workers = max_workers or settings.PDF_EXTRACTION_WORKERS
+    page_timeout = page_timeout or settings.PDF_PAGE_TIMEOUT
+    min_chars = settings.PDF_OCR_MIN_PAGE_CHARS if min_chars is None else min_chars
+
+    page_count = count_pages(pdf_path)
+    stats = ExtractionStats(pages=page_count)
+    if page_count == 0:
+        return "", stats
+
+    workers = max(1, min(max_workers, math.ceil(page_count / settings.PDF_PAGES_PER_TASK)))
+    if workers == 1:
+        texts, errors, page_stats = extract_pages(pdf_path, range(page_count), min_chars, page_timeout)
+        pages = [texts.get(page_number, "") for page_number in range(page_count)]
+        stats.merge(ExtractionStats(**page_stats))
+    else:
+        pages, errors = _extract_parallel(pdf_path, page_count, workers, min_chars, page_timeout, stats)
+
+    if errors:
+        logger.warning(f"Failed to extract {len(errors)} of {page_count} pages from {pdf_path}: {errors}")
+        if len(errors) >= page_count:
+            raise Exception(f"Failed to extract text from PDF: {errors[0]}")
+
+    logger.info(f"Extracted {pdf_path}: {stats}")
+    return PAGE_BREAK.join(pages), stats
+
+
+def extract_pdf_text(pdf_path, **kwargs):
+    text, _ = extract_pdf(pdf_path, **kwargs)
+    return text
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+_lock = threading.Lock()
+_sessions = {}
+_metrics = {}
+# Event loop -> (httpx.AsyncClient, the generator that closes it with the loop)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class HostMetrics:
+    """Request counts and latencies for one outbound host"""
+
+    def __init__(self, window=500):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.statuses = {}
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds, status=None, error=False, retry=False):
+        self.requests += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.recent.append(seconds)
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        if error:
+            self.errors += 1
+        if retry:
+            self.retries += 1
+
+    def percentile(self, fraction):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'statuses': self.statuses,
+            'avg_ms': round(1000 * self.total_seconds / self.requests, 1) if self.requests else 0.0,
+            'p50_ms': round(1000 * self.percentile(0.5), 1),
+            'p95_ms': round(1000 * self.percentile(0.95), 1),
+            'max_ms': round(1000 * self.max_seconds, 1),
+        }
+
+
+def _host(url):
+    return urlsplit(url).netloc
+
+
+def _record(host, seconds, status=None, error=False, retry=False):
+    with _lock:
+        metrics = _metrics.setdefault(host, HostMetrics())
+        metrics.record(seconds, status=status, error=error, retry=retry)
+        summary = metrics.as_dict() if metrics.requests % 100 == 0 else None
+    if summary:
+        logger.info(f"HTTP {host}: {summary}")
+
+
+def get_metrics():
+    """Per-host request metrics for this process"""
+    with _lock:
+        return {host: metrics.as_dict() for host, metrics in sorted(_metrics.items())}
+
+
+def default_timeout():
+    return (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+
+
+def backoff_delay(attempt, retry_after=None, base=None, cap=None):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header"""
+    base = settings.HTTP_BACKOFF_BASE if base is None else base
+    cap = settings.HTTP_BACKOFF_MAX if cap is None else cap
+    if retry_after:
+        try:
+            return min(float(retry_after), cap)
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _retries_for(method, retries):
+    # Non-idempotent requests (and streamed bodies, which cannot be replayed)
+    # are only retried when the caller asks for it
+    if retries is not None:
+        return retries
+    return settings.HTTP_MAX_RETRIES if method.upper() in IDEMPOTENT_METHODS else 0
+
+
+def get_session(url):
+    """Keep-alive session for the URL's host, shared by every caller in the process"""
+    host = _host(url)
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.HTTP_POOL_MAXSIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+    return session
+
+
+def request(method, url, retries=None, **kwargs):
+    """``requests``-style call over a pooled session with a default timeout and retries.
+
+    Connection errors, timeouts and 429/5xx responses are retried with
+    jittered exponential backoff. The final response is returned as-is, so
+    callers still decide whether to ``raise_for_status()``.
+    """
+    kwargs.setdefault('timeout', default_timeout())
+    retries = _retries_for(method, retries)
+    host = _host(url)
+    session = get_session(url)
+
+    for attempt in range(retries + 1):
+        start = time.monotonic()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            retry = attempt < retries
+            _record(host, time.monotonic() - start, error=True, retry=retry)
+            if not retry:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"{method} {host} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        retry = response.status_code in RETRY_STATUSES and attempt < retries
+        _record(host, time.monotonic() - start, status=response.status_code,
+                error=response.status_code >= 500, retry=retry)
+        if not retry:
+            return response
+        delay = backoff_delay(attempt, response.headers.get('Retry-After'))
+        logger.warning(f"{method} {host} returned {response.status_code}, retrying in {delay:.1f}s")
+        response.close()
+        time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+async def _close_with_loop(loop, client):
+    """Parked on the client's event loop until the loop's ``shutdown_asyncgens()`` resumes it"""
+    try:
+        yield
+    finally:
+        _async_clients.pop(loop, None)
+        await client.aclose()
+
+
+async def aget_async_client():
+    """Shared ``httpx.AsyncClient`` for the running event loop.
+
+    Connections cannot move between loops, so each loop gets its own
+    client, closed while that loop shuts down: ``asyncio.run`` (which
+    asgiref's ``async_to_sync`` and uvicorn use) finalizes pending async
+    generators before closing the loop. Short-lived loops, such as one per
+    request under WSGI, therefore do not leak their connection pools.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=settings.HTTP_POOL_MAXSIZE),
+            timeout=httpx.Timeout(settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+        )
+        closer = _close_with_loop(loop, client)
+        # Runs up to the yield without suspending, so no other task can create a second client
+        await closer.__anext__()
+        entry = _async_clients[loop] = (client, closer)
+    return entry[0]
+
+
+async def arequest(method, url, retries=None, **kwargs):
+    """Async counterpart of ``request`` for ASGI views, with the same retry rules and metrics"""
+    retries = _retries_for(method, retries)
+    host = _host(url)
+    client = await aget_async_client()
+
+    for attempt in range(retries + 1):
+        start = time.monotonic()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            retry = attempt < retries
+            _record(host, time.monotonic() - start, error=True, retry=retry)
+            if not retry:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"{method} {host} failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        retry = response.status_code in RETRY_STATUSES and attempt < retries
+        _record(host, time.monotonic() - start, status=response.status_code,
+                error=response.status_code >= 500, retry=retry)
+        if not retry:
+            return response
+        delay = backoff_delay(attempt, response.headers.get('Retry-After'))
+        logger.warning(f"{method} {host} returned {response.status_code}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+async def aget(url, **kwargs):
+    return await arequest('GET', url, **kwargs)
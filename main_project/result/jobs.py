@@ -0,0 +1,159 @@
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from knowbite.models import Summary, SummaryJob
+
+from .transcription import TranscriptionPending
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_summary_job(user, uploaded_file, regenerate=False):
+    """Queue a summary job for a file, reusing one that is already pending.
+
+    A regenerate request is never dropped in favour of the pending job: a
+    job still in the queue is switched to regenerating, and one that is
+    already running gets a regenerate job queued behind it.
+    """
+    with transaction.atomic():
+        active_job = (
+            SummaryJob.objects.select_for_update()
+            .filter(uploaded_file=uploaded_file, status__in=SummaryJob.ACTIVE_STATUSES)
+            .order_by('-created_at')
+            .first()
+        )
+        if active_job and (active_job.regenerate or not regenerate):
+            return active_job
+        if active_job and active_job.status == 'queued':
+            active_job.regenerate = True
+            active_job.save(update_fields=['regenerate', 'updated_at'])
+            logger.info(f"Summary job #{active_job.pk} for file {uploaded_file.pk} switched to regenerate")
+            return active_job
+
+        job = SummaryJob.objects.create(user=user, uploaded_file=uploaded_file, regenerate=regenerate)
+    logger.info(f"Queued summary job #{job.pk} for file {uploaded_file.pk} (regenerate={regenerate})")
+    return job
+
+
+def get_active_job(uploaded_file):
+    """Return the pending or running job for a file, if any"""
+    return SummaryJob.objects.filter(
+        uploaded_file=uploaded_file,
+        status__in=SummaryJob.ACTIVE_STATUSES
+    ).order_by('-created_at').first()
+
+
+def claim_next_job():
+    """Atomically take the oldest queued job and mark it as extracting.
+
+    Rows are locked with SKIP LOCKED so several workers can poll the same
+    table without handing out a job twice. A file whose previous job is still
+    running (a regenerate chained behind it) waits until that job ends.
+    """
+    running = SummaryJob.objects.filter(
+        uploaded_file=OuterRef('uploaded_file'),
+        status__in=SummaryJob.CLAIMED_STATUSES
+    )
+    with transaction.atomic():
+        job = (
+            SummaryJob.objects.select_for_update(skip_locked=True)
+            .filter(status='queued')
+            .exclude(Exists(running))
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = 'extracting'
+        job.attempts += 1
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'started_at', 'updated_at'])
+    return job
+
+
+@contextmanager
+def job_heartbeat(job, interval=None):
+    """Touch ``job.updated_at`` every ``interval`` seconds while the block runs.
+
+    A running job's ``updated_at`` is its heartbeat: ``requeue_stale_jobs``
+    only takes jobs whose heartbeat stopped, so a long extraction or summary
+    call is never handed to a second worker. The beat runs in a thread
+    because the pipeline blocks on extraction and network calls.
+    """
+    interval = interval or settings.SUMMARY_JOB_HEARTBEAT_SECONDS
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                SummaryJob.objects.filter(pk=job.pk, status__in=SummaryJob.CLAIMED_STATUSES).update(
+                    updated_at=timezone.now()
+                )
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'summary-job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield job
+    finally:
+        stop.set()
+        thread.join()
+
+
+def requeue_stale_jobs():
+    """Put jobs back in the queue when the worker running them died mid-way.
+
+    Staleness is measured from the heartbeat (see ``job_heartbeat``), so
+    this is safe to run from every worker while others are busy. A
+    ``transcribing`` job is only waiting on AssemblyAI, so re-running it
+    does not submit the audio again; it just checks the transcript.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.SUMMARY_JOB_STALE_SECONDS)
+    return SummaryJob.objects.filter(
+        status__in=SummaryJob.CLAIMED_STATUSES,
+        updated_at__lt=cutoff
+    ).update(status='queued', output='')
+
+
+def run_summary_job(job):
+    """Run extraction and summarization for a claimed job"""
+    # Imported here because result.views imports this module
+    from result.views import generate_or_retrieve_summary
+
+    uploaded_file = job.uploaded_file
+    if not job.regenerate and Summary.objects.filter(user=job.user, uploaded_file=uploaded_file).exists():
+        job.set_status('done')
+        return job
+
+    try:
+        summary = generate_or_retrieve_summary(
+            job.user,
+            uploaded_file,
+            on_stage=job.set_status,
+            use_cache=not job.regenerate,
+            on_output=job.set_output
+        )
+    except TranscriptionPending as e:
+        # Resumed by the transcription webhook or poller
+        logger.info(f"Summary job #{job.pk} waiting for transcript: {e}")
+        job.set_status('transcribing')
+        return job
+    except Exception as e:
+        summary = f"Error: {str(e)}"
+
+    if isinstance(summary, str) and summary.startswith('Error'):
+        logger.error(f"Summary job #{job.pk} failed: {summary}")
+        job.set_status('failed', error=summary)
+    else:
+        logger.info(f"Summary job #{job.pk} finished")
+        job.set_status('done')
+    return job
@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types as genai_types
+
+from .chunking import count_tokens
+from .http_client import backoff_delay
+from .ratelimit import SharedRateLimiter
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Limiter priorities: lower is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+class FeatureMetrics:
+    """Call counts, latencies and token usage for one LLM feature"""
+
+    def __init__(self, window=500):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.total_seconds = 0.0
+        self.queued_seconds = 0.0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.recent = deque(maxlen=window)
+
+    def as_dict(self):
+        ordered = sorted(self.recent)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'avg_ms': round(1000 * self.total_seconds / self.calls, 1) if self.calls else 0.0,
+            'p95_ms': round(1000 * p95, 1),
+            'avg_queued_ms': round(1000 * self.queued_seconds / self.calls, 1) if self.calls else 0.0,
+            'prompt_tokens': self.prompt_tokens,
+            'cached_tokens': self.cached_tokens,
+            'output_tokens': self.output_tokens,
+        }
+
+
+def status_code(error):
+    """HTTP status of a Gemini failure, or None for errors that never got a response"""
+    if isinstance(error, genai_errors.APIError):
+        return error.code
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    return None
+
+
+def is_retryable(error):
+    return status_code(error) in RETRY_STATUSES or isinstance(error, httpx.TransportError)
+
+
+def estimate_tokens(prompt):
+    """Rough token cost of a call, reserved up front and settled from the real usage afterwards"""
+    return count_tokens(str(prompt)) + settings.LLM_OUTPUT_TOKEN_ESTIMATE
+
+
+def used_tokens(usage):
+    if usage is None:
+        return None
+    return getattr(usage, 'total_token_count', None) or (usage.prompt_token_count or 0) + (usage.candidates_token_count or 0)
+
+
+class LLMGateway:
+    """Single entry point for Gemini calls from chat, summaries and quizzes.
+
+    Every call waits for a slot from the rate limiter shared by all worker
+    processes, with interactive requests served ahead of background ones. 429 and 5xx
+    responses (by status code, not message text) and transport errors are
+    retried with jittered exponential backoff. Latency, queueing time and
+    token usage are recorded per feature.
+    """
+
+    def __init__(self, client, limiter, max_retries=None, backoff_base=None, backoff_max=None):
+        self.client = client
+        self.limiter = limiter
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = settings.LLM_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = settings.LLM_BACKOFF_MAX if backoff_max is None else backoff_max
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _metrics_for(self, feature):
+        return self._metrics.setdefault(feature, FeatureMetrics())
+
+    def _record(self, feature, seconds=None, queued=0.0, usage=None, error=False, retry=False, status=None):
+        with self._lock:
+            metrics = self._metrics_for(feature)
+            if seconds is not None:
+                metrics.calls += 1
+                metrics.total_seconds += seconds
+                metrics.queued_seconds += queued
+                metrics.recent.append(seconds)
+            if usage is not None:
+                metrics.prompt_tokens += usage.prompt_token_count or 0
+                metrics.cached_tokens += getattr(usage, 'cached_content_token_count', None) or 0
+                metrics.output_tokens += usage.candidates_token_count or 0
+            if error:
+                metrics.errors += 1
+            if retry:
+                metrics.retries += 1
+            if status == 429:
+                metrics.rate_limited += 1
+
+    def get_metrics(self):
+        with self._lock:
+            return {feature: metrics.as_dict() for feature, metrics in sorted(self._metrics.items())}
+
+    def _settle(self, estimate, usage):
+        actual = used_tokens(usage)
+        if actual is not None:
+            self.limiter.settle(estimate, actual)
+
+    def _should_retry(self, feature, error, attempt):
+        retry = is_retryable(error) and attempt < self.max_retries
+        self._record(feature, error=True, retry=retry, status=status_code(error))
+        if retry:
+            delay = backoff_delay(attempt, base=self.backoff_base, cap=self.backoff_max)
+            logger.warning(f"Gemini {feature} call failed ({status_code(error) or error}), retrying in {delay:.1f}s")
+            return delay
+        return None
+
+    def generate(self, prompt, feature, priority=BACKGROUND, model=GEMINI_MODEL, **kwargs):
+        """Blocking ``generate_content``; returns the Gemini response"""
+        estimate = estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            queued = self.limiter.acquire(tokens=estimate, priority=priority)
+            start = time.monotonic()
+            try:
+                response = self.client.models.generate_content(model=model, contents=prompt, **kwargs)
+            except Exception as e:
+                delay = self._should_retry(feature, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            usage = getattr(response, 'usage_metadata', None)
+            self._record(feature, time.monotonic() - start, queued, usage)
+            self._settle(estimate, usage)
+            return response
+
+    def embed(self, texts, feature, priority=BACKGROUND, model=None, **config):
+        """Blocking ``embed_content`` for a batch of texts; returns one list of floats per text"""
+        model = model or settings.EMBEDDING_MODEL
+        estimate = sum(count_tokens(text) for text in texts)
+        for attempt in range(self.max_retries + 1):
+            queued = self.limiter.acquire(tokens=estimate, priority=priority)
+            start = time.monotonic()
+            try:
+                response = self.client.models.embed_content(
+                    model=model, contents=texts, config=genai_types.EmbedContentConfig(**config)
+                )
+            except Exception as e:
+                delay = self._should_retry(feature, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._record(feature, time.monotonic() - start, queued)
+            return [embedding.values for embedding in response.embeddings]
+
+    def create_cache(self, system_instruction, feature, ttl, priority=INTERACTIVE, model=GEMINI_MODEL):
+        """Blocking ``caches.create`` holding ``system_instruction`` for ``ttl`` seconds; returns the CachedContent"""
+        config = genai_types.CreateCachedContentConfig(system_instruction=system_instruction, ttl=f"{ttl}s")
+        for attempt in range(self.max_retries + 1):
+            queued = self.limiter.acquire(priority=priority)
+            start = time.monotonic()
+            try:
+                cached = self.client.caches.create(model=model, config=config)
+            except Exception as e:
+                delay = self._should_retry(feature, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._record(feature, time.monotonic() - start, queued)
+            return cached
+
+    def extend_cache(self, name, ttl):
+        """Push a cached content's expiry ``ttl`` seconds into the future; returns the CachedContent"""
+        return self.client.caches.update(name=name, config=genai_types.UpdateCachedContentConfig(ttl=f"{ttl}s"))
+
+    def delete_cache(self, name):
+        self.client.caches.delete(name=name)
+
+    def stream(self, prompt, feature, priority=BACKGROUND, model=GEMINI_MODEL, **kwargs):
+        """Streaming ``generate_content``; yields text pieces.
+
+        Failures are only retried before the first piece has been yielded.
+        """
+        estimate = estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            queued = self.limiter.acquire(tokens=estimate, priority=priority)
+            start = time.monotonic()
+            started = False
+            usage = None
+            try:
+                for chunk in self.client.models.generate_content_stream(model=model, contents=prompt, **kwargs):
+                    usage = getattr(chunk, 'usage_metadata', None) or usage
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+            except Exception as e:
+                delay = None if started else self._should_retry(feature, e, attempt)
+                if delay is None:
+                    if started:
+                        self._record(feature, error=True)
+                    raise
+                time.sleep(delay)
+                continue
+            self._record(feature, time.monotonic() - start, queued, usage)
+            self._settle(estimate, usage)
+            return
+
+    async def agenerate(self, prompt, feature, priority=INTERACTIVE, model=GEMINI_MODEL, **kwargs):
+        """Async ``generate``; waits for the limiter and backoff on the event loop"""
+        estimate = estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            queued = await self.limiter.aacquire(tokens=estimate, priority=priority)
+            start = time.monotonic()
+            try:
+                response = await self.client.aio.models.generate_content(model=model, contents=prompt, **kwargs)
+            except Exception as e:
+                delay = self._should_retry(feature, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            usage = getattr(response, 'usage_metadata', None)
+            self._record(feature, time.monotonic() - start, queued, usage)
+            await sync_to_async(self._settle)(estimate, usage)
+            return response
+
+    async def astream(self, prompt, feature, priority=INTERACTIVE, model=GEMINI_MODEL, **kwargs):
+        """Async ``stream``"""
+        estimate = estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            queued = await self.limiter.aacquire(tokens=estimate, priority=priority)
+            start = time.monotonic()
+            started = False
+            usage = None
+            try:
+                async for chunk in await self.client.aio.models.generate_content_stream(
+                    model=model, contents=prompt, **kwargs
+                ):
+                    usage = getattr(chunk, 'usage_metadata', None) or usage
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+            except Exception as e:
+                delay = None if started else self._should_retry(feature, e, attempt)
+                if delay is None:
+                    if started:
+                        self._record(feature, error=True)
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._record(feature, time.monotonic() - start, queued, usage)
+            await sync_to_async(self._settle)(estimate, usage)
+            return
+
+
+def get_gateway():
+    """Process-wide gateway, created on first use"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway(
+                client=genai.Client(api_key=settings.GEMINI_API_KEY),
+                limiter=SharedRateLimiter(
+                    'gemini',
+                    requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+                    tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE,
+                    burst=settings.GEMINI_REQUEST_BURST
+                )
+            )
+    return _gateway
@@ -0,0 +1,183 @@
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+OPTION_LETTERS = ('A', 'B', 'C', 'D')
+OPTION_FIELDS = ('option_a', 'option_b', 'option_c', 'option_d')
+
+# Response schema for Gemini's constrained JSON output, in the OpenAPI subset it accepts
+MCQ_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'question': {'type': 'STRING'},
+            'option_a': {'type': 'STRING'},
+            'option_b': {'type': 'STRING'},
+            'option_c': {'type': 'STRING'},
+            'option_d': {'type': 'STRING'},
+            'correct_option': {'type': 'STRING', 'enum': list(OPTION_LETTERS)},
+        },
+        'required': ['question', *OPTION_FIELDS, 'correct_option'],
+        'propertyOrdering': ['question', *OPTION_FIELDS, 'correct_option'],
+    },
+}
+
+FENCE_PATTERN = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+OPTION_PREFIX_PATTERN = re.compile(r"^\s*[(\[]?([A-Da-d])[)\].:]\s+")
+ANSWER_PATTERN = re.compile(r"^\W*(?i:option\s+)?([A-D])(?:[).:\]]|\s*$)")
+# Legacy "Question: / A) / Correct Answer: X" text, for responses that ignore the schema
+TEXT_QUESTION_PATTERN = re.compile(r"^(?:Q(?:uestion)?\s*\d*|\d+)\s*[:.)]\s*(.+)$", re.IGNORECASE)
+TEXT_OPTION_PATTERN = re.compile(r"^[(\[]?([A-Da-d])[)\].:]\s*(.*)$")
+TEXT_ANSWER_PATTERN = re.compile(r"^\W*(?:correct\s+)?answer\W*[:\-]\W*(.*)$", re.IGNORECASE)
+
+
+def build_mcq_prompt(summary_text, num_questions, difficulty, avoid=()):
+    """Prompt for ``num_questions`` MCQs; the JSON shape itself is enforced by MCQ_SCHEMA"""
+    avoid_block = ""
+    if avoid:
+        listed = "\n".join(f"- {question}" for question in avoid)
+        avoid_block = f"\n    Do not repeat or rephrase any of these existing questions:\n{listed}\n"
+    return f"""
+    Generate {num_questions} multiple-choice questions based on the following summary.
+    The questions should be {difficulty} level.
+    Use Latex formulas **where necessary**.
+    Use diagrams such as graphs, circuit diagrams etc **if necessary**.
+    You can ask questions using related images using the html image tag.
+
+    - Each question must have four answer choices in option_a to option_d.
+    - Do not prefix the choices with their letter.
+    - Set correct_option to the letter (A, B, C or D) of the correct choice.
+    - Return a JSON array with one object per question.
+    {avoid_block}
+    Summary: {summary_text}
+    """
+
+
+def _strip_option(text):
+    return OPTION_PREFIX_PATTERN.sub('', text, count=1).strip()
+
+
+def _answer_letter(answer, options):
+    """Letter of the correct answer given as a letter, "B) ...", "Option B" or the option text"""
+    answer = str(answer).strip()
+    if len(answer) == 1:
+        answer = answer.upper()
+    match = ANSWER_PATTERN.match(answer)
+    if match:
+        return match.group(1).upper()
+    for letter, option in zip(OPTION_LETTERS, options):
+        if answer and _strip_option(answer).lower() == option.lower():
+            return letter
+    return None
+
+
+def validate_mcq(item):
+    """The MCQ dict stored in the bank for one parsed item, or None if it is unusable"""
+    if not isinstance(item, dict):
+        return None
+    question = item.get('question')
+    if not isinstance(question, str) or not question.strip():
+        return None
+
+    options = [item.get(field) for field in OPTION_FIELDS]
+    if any(option is None for option in options):
+        # Also accept {"options": [...]} and {"options": {"A": ...}}
+        listed = item.get('options')
+        if isinstance(listed, dict):
+            listed = [listed.get(letter, listed.get(letter.lower())) for letter in OPTION_LETTERS]
+        if not isinstance(listed, list) or len(listed) != 4:
+            return None
+        options = listed
+    if not all(isinstance(option, (str, int, float)) and str(option).strip() for option in options):
+        return None
+    options = [_strip_option(str(option)) for option in options]
+    if len({option.lower() for option in options}) != 4:
+        return None
+
+    answer = item.get('correct_option', item.get('answer', item.get('correct_answer')))
+    letter = _answer_letter(answer, options) if answer is not None else None
+    if letter is None:
+        return None
+
+    mcq = {'question': question.strip()}
+    mcq.update(zip(OPTION_FIELDS, options))
+    mcq['correct_option'] = letter
+    return mcq
+
+
+def _json_items(text):
+    """Objects of a JSON response, recovering every complete object from truncated or broken JSON"""
+    try:
+        data = json.loads(text)
+    except (ValueError, RecursionError):
+        data = None
+    if isinstance(data, dict):
+        data = data.get('questions', [data])
+    if isinstance(data, list):
+        return data
+
+    decoder = json.JSONDecoder()
+    items = []
+    position = text.find('{')
+    while position != -1:
+        try:
+            item, end = decoder.raw_decode(text, position)
+        except (ValueError, RecursionError):
+            # A broken or cut-off object: resume at the next one
+            position = text.find('{', position + 1)
+            continue
+        if isinstance(item, dict) and 'questions' in item and isinstance(item['questions'], list):
+            items.extend(item['questions'])
+        else:
+            items.append(item)
+        position = text.find('{', end)
+    return items
+
+
+def _text_items(text):
+    """Items from the legacy plain-text format, tolerating numbering, markdown and spacing drift"""
+    items = []
+    current = None
+    for line in text.splitlines():
+        line = line.strip().replace('**', '')
+        if not line:
+            continue
+        answer = TEXT_ANSWER_PATTERN.match(line)
+        question = TEXT_QUESTION_PATTERN.match(line)
+        option = TEXT_OPTION_PATTERN.match(line)
+        if answer:
+            if current is not None:
+                current['answer'] = answer.group(1)
+        elif question:
+            current = {'question': question.group(1), 'options': {}}
+            items.append(current)
+        elif current is None:
+            continue
+        elif option:
+            current['options'][option.group(1).upper()] = option.group(2)
+        elif not current['options']:
+            # Question text that wrapped onto another line
+            current['question'] = f"{current['question']} {line}".strip()
+    return items
+
+
+def parse_mcq_response(mcq_text):
+    """Valid MCQs from a model response; malformed questions are dropped, never the whole batch.
+
+    Handles the schema's JSON array, JSON cut off mid-stream, code fences,
+    and the older ``Question: / A) ... / Correct Answer: X`` text format.
+    """
+    if not mcq_text:
+        return []
+    text = FENCE_PATTERN.sub('', mcq_text).strip()
+    items = _json_items(text) if '{' in text else []
+    mcqs = [mcq for mcq in map(validate_mcq, items) if mcq is not None]
+    if not mcqs:
+        items = _text_items(text)
+        mcqs = [mcq for mcq in map(validate_mcq, items) if mcq is not None]
+    if len(mcqs) < len(items):
+        logger.warning(f"Dropped {len(items) - len(mcqs)} of {len(items)} malformed MCQs")
+    return mcqs
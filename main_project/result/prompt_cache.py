@@ -0,0 +1,159 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from google.genai import types as genai_types
+
+from knowbite.models import ChatContextCache
+
+from .cache import hash_text
+from .chunking import count_tokens
+from .llm import GEMINI_MODEL, get_gateway, status_code
+
+logger = logging.getLogger(__name__)
+
+
+def _create_provider_cache(uploaded_file, instruction):
+    """Returns ``(cache_name, expires_at, tokens)``, with a provider-side cache when the prefix qualifies"""
+    ttl = settings.CHAT_CACHE_TTL_SECONDS
+    tokens = count_tokens(instruction)
+    cache_name = ''
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    if settings.CHAT_PROMPT_CACHING_ENABLED and tokens >= settings.CHAT_CACHE_MIN_TOKENS:
+        try:
+            cached = get_gateway().create_cache(instruction, feature='chat_cache', ttl=ttl)
+            cache_name = cached.name
+            expires_at = cached.expire_time or expires_at
+            usage = getattr(cached, 'usage_metadata', None)
+            tokens = getattr(usage, 'total_token_count', None) or tokens
+        except Exception as e:
+            # Sent inline until the row expires, then creation is tried again
+            logger.warning(f"Creating the chat cache for file {uploaded_file.pk} failed: {e}")
+    return cache_name, expires_at, tokens
+
+
+def _delete_provider_cache(cache_name, reason):
+    try:
+        get_gateway().delete_cache(cache_name)
+    except Exception as e:
+        logger.warning(f"Deleting chat cache {cache_name} ({reason}) failed, it expires on its own: {e}")
+
+
+def _is_current(cache, source_hash, now, margin=0):
+    """Whether ``cache`` holds this prefix and stays valid for ``margin`` more seconds"""
+    return (
+        cache.source_hash == source_hash
+        and cache.model_name == GEMINI_MODEL
+        and cache.expires_at > now + timedelta(seconds=margin)
+    )
+
+
+def _claim_renewal(uploaded_file, source_hash):
+    """Take the file's renewal lease. Returns ``(cache, lease)``; ``lease`` is None if not needed or held elsewhere.
+
+    The row lock is only held for this short transaction, never across
+    provider calls, which wait on the shared rate limiter and the network.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        cache, _ = ChatContextCache.objects.select_for_update().get_or_create(
+            uploaded_file=uploaded_file,
+            defaults={'source_hash': '', 'model_name': GEMINI_MODEL, 'expires_at': now}
+        )
+        if _is_current(cache, source_hash, now, settings.CHAT_CACHE_REFRESH_SECONDS):
+            return cache, None
+        if cache.renewing_until and cache.renewing_until > now:
+            return cache, None
+        cache.renewing_until = now + timedelta(seconds=settings.CHAT_CACHE_LEASE_SECONDS)
+        cache.save(update_fields=['renewing_until', 'updated_at'])
+        return cache, cache.renewing_until
+
+
+def _renew(cache, lease, uploaded_file, instruction, source_hash):
+    """Extend or replace the cache under ``lease`` and save it, unless the lease was lost meanwhile"""
+    now = timezone.now()
+    held = ChatContextCache.objects.filter(pk=cache.pk, renewing_until=lease)
+
+    if _is_current(cache, source_hash, now) and cache.cache_name:
+        try:
+            extended = get_gateway().extend_cache(cache.cache_name, settings.CHAT_CACHE_TTL_SECONDS)
+            cache.expires_at = extended.expire_time or now + timedelta(seconds=settings.CHAT_CACHE_TTL_SECONDS)
+            held.update(expires_at=cache.expires_at, renewing_until=None, updated_at=timezone.now())
+            return cache
+        except Exception as e:
+            logger.warning(f"Extending chat cache {cache.cache_name} failed, creating a new one: {e}")
+
+    old_name, old_expires_at = cache.cache_name, cache.expires_at
+    cache_name, expires_at, tokens = _create_provider_cache(uploaded_file, instruction)
+    saved = held.update(
+        source_hash=source_hash,
+        cache_name=cache_name,
+        model_name=GEMINI_MODEL,
+        token_count=tokens,
+        expires_at=expires_at,
+        renewing_until=None,
+        updated_at=timezone.now(),
+    )
+    if not saved:
+        # The lease ran out or the row was dropped; another turn owns the renewal now
+        if cache_name:
+            _delete_provider_cache(cache_name, 'lost the renewal lease')
+        return _inline(uploaded_file, source_hash)
+
+    if old_name and old_name != cache_name and old_expires_at > now:
+        _delete_provider_cache(old_name, 'replaced')
+    cache.source_hash, cache.cache_name, cache.model_name = source_hash, cache_name, GEMINI_MODEL
+    cache.token_count, cache.expires_at, cache.renewing_until = tokens, expires_at, None
+    logger.info(f"Chat prefix for file {uploaded_file.pk}: {tokens} tokens, {cache_name or 'sent inline'}")
+    return cache
+
+
+def _inline(uploaded_file, source_hash):
+    """An unsaved cache that sends the prefix inline, for a turn that cannot use the stored one"""
+    return ChatContextCache(
+        uploaded_file=uploaded_file, source_hash=source_hash, model_name=GEMINI_MODEL, expires_at=timezone.now()
+    )
+
+
+def get_chat_cache(uploaded_file, instruction):
+    """The ``ChatContextCache`` for a file's chat prefix ``instruction``, kept in step with it.
+
+    A cache that is about to expire has its TTL extended; one whose prefix
+    has changed (the summary was regenerated) or that has already expired
+    is replaced, and the old provider cache deleted. One turn at a time
+    renews a file's cache, under a short lease recorded on the row; turns
+    that arrive meanwhile use the old cache while it is still valid, or
+    send the prefix inline, instead of creating provider caches of their own.
+    """
+    source_hash = hash_text(instruction)
+    cache = ChatContextCache.objects.filter(uploaded_file=uploaded_file).first()
+    if cache is not None and _is_current(cache, source_hash, timezone.now(), settings.CHAT_CACHE_REFRESH_SECONDS):
+        return cache
+
+    cache, lease = _claim_renewal(uploaded_file, source_hash)
+    if lease is not None:
+        return _renew(cache, lease, uploaded_file, instruction, source_hash)
+    if _is_current(cache, source_hash, timezone.now()):
+        return cache
+    return _inline(uploaded_file, source_hash)
+
+
+def chat_config(uploaded_file, instruction):
+    """Generation config that supplies ``instruction`` from the cache, or inline when it is not cached"""
+    cache = get_chat_cache(uploaded_file, instruction)
+    if cache.cache_name:
+        return genai_types.GenerateContentConfig(cached_content=cache.cache_name)
+    return genai_types.GenerateContentConfig(system_instruction=instruction)
+
+
+async def aforget_missing_cache(uploaded_file, config, error):
+    """Drop the cache row when a cached call failed because the provider no longer has the cache.
+
+    The next turn then creates a new one instead of reusing the dead
+    handle until its recorded expiry.
+    """
+    if config.cached_content and status_code(error) in (403, 404):
+        logger.warning(f"Chat cache {config.cached_content} is gone, recreating it on the next turn")
+        await ChatContextCache.objects.filter(uploaded_file=uploaded_file).adelete()
@@ -0,0 +1,176 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from google.genai import types as genai_types
+
+from knowbite.models import Quiz, QuizItem, QuizQuestion, Summary
+
+from .digest import summary_digest
+from .llm import BACKGROUND, INTERACTIVE, get_gateway
+from .mcq import MCQ_SCHEMA, build_mcq_prompt, parse_mcq_response
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+# Most existing questions listed in a prompt as ones not to repeat
+AVOID_LIMIT = 50
+
+MCQ_CONFIG = genai_types.GenerateContentConfig(response_mime_type='application/json', response_schema=MCQ_SCHEMA)
+
+
+def generate_mcqs_with_gemini(summary_text, num_questions, difficulty, priority=INTERACTIVE, avoid=()):
+    """Raw JSON response for ``num_questions`` MCQs, constrained to MCQ_SCHEMA"""
+    prompt = build_mcq_prompt(summary_text, num_questions, difficulty, avoid)
+    response = get_gateway().generate(prompt, feature='quiz', priority=priority, config=MCQ_CONFIG)
+    return response.text or ""
+
+
+async def agenerate_mcqs_with_gemini(summary_text, num_questions, difficulty, avoid=()):
+    """Async version of ``generate_mcqs_with_gemini`` for the ASGI quiz view"""
+    prompt = build_mcq_prompt(summary_text, num_questions, difficulty, avoid)
+    response = await get_gateway().agenerate(prompt, feature='quiz', priority=INTERACTIVE, config=MCQ_CONFIG)
+    return response.text or ""
+
+
+def _still_missing(mcqs, num_questions, avoid):
+    """How many questions a top-up call should ask for, and the questions it must not repeat"""
+    return num_questions - len(mcqs), [*avoid, *(mcq['question'] for mcq in mcqs)][-AVOID_LIMIT:]
+
+
+def generate_mcqs(summary_text, num_questions, difficulty, priority=INTERACTIVE, avoid=()):
+    """Up to ``num_questions`` valid MCQs.
+
+    Questions that fail validation are dropped individually, and only
+    that many are asked for again in a single top-up call.
+    """
+    mcqs = parse_mcq_response(generate_mcqs_with_gemini(summary_text, num_questions, difficulty, priority, avoid))
+    missing, seen = _still_missing(mcqs, num_questions, avoid)
+    if missing > 0:
+        logger.info(f"Topping up {missing} of {num_questions} {difficulty} questions")
+        mcqs += parse_mcq_response(generate_mcqs_with_gemini(summary_text, missing, difficulty, priority, seen))
+    return mcqs[:num_questions]
+
+
+async def agenerate_mcqs(summary_text, num_questions, difficulty, avoid=()):
+    """Async version of ``generate_mcqs``"""
+    mcqs = parse_mcq_response(await agenerate_mcqs_with_gemini(summary_text, num_questions, difficulty, avoid))
+    missing, seen = _still_missing(mcqs, num_questions, avoid)
+    if missing > 0:
+        logger.info(f"Topping up {missing} of {num_questions} {difficulty} questions")
+        mcqs += parse_mcq_response(await agenerate_mcqs_with_gemini(summary_text, missing, difficulty, seen))
+    return mcqs[:num_questions]
+
+
+def _normalize(question):
+    return ' '.join(question.lower().split())
+
+
+def store_questions(summary, difficulty, mcqs, served=False):
+    """Add parsed MCQs to the summary's bank, skipping ones it already holds; returns the new rows"""
+    known = {
+        _normalize(question)
+        for question in summary.questions.filter(difficulty=difficulty).values_list('question', flat=True)
+    }
+    rows = []
+    for mcq in mcqs:
+        key = _normalize(mcq['question'])
+        if not key or key in known or mcq['correct_option'] not in ('A', 'B', 'C', 'D'):
+            continue
+        known.add(key)
+        rows.append(QuizQuestion(summary=summary, difficulty=difficulty, times_served=int(served), **mcq))
+    return QuizQuestion.objects.bulk_create(rows)
+
+
+def unserved_count(summary, difficulty):
+    return summary.questions.filter(difficulty=difficulty, times_served=0).count()
+
+
+def sample_questions(summary, difficulty, count):
+    """Up to ``count`` bank questions of a difficulty, least served first, marked as served"""
+    questions = list(summary.questions.filter(difficulty=difficulty).order_by('times_served', '?')[:count])
+    QuizQuestion.objects.filter(pk__in=[question.pk for question in questions]).update(times_served=F('times_served') + 1)
+    return questions
+
+
+def reset_bank(summary):
+    """Drop a summary's questions after it changed and queue pre-generation of the new bank"""
+    summary.questions.all().delete()
+    difficulties = [d.strip() for d in settings.QUIZ_BANK_PREGENERATE.split(',') if d.strip() in DIFFICULTIES]
+    summary.quiz_bank_refill = ','.join(difficulties)
+    summary.save(update_fields=['quiz_bank_refill'])
+
+
+def request_refill(summary, difficulty):
+    """Ask the worker to top up one difficulty of a summary's bank"""
+    with transaction.atomic():
+        summary = Summary.objects.select_for_update().get(pk=summary.pk)
+        difficulties = set(filter(None, summary.quiz_bank_refill.split(',')))
+        if difficulty not in difficulties:
+            summary.quiz_bank_refill = ','.join(sorted(difficulties | {difficulty}))
+            summary.save(update_fields=['quiz_bank_refill'])
+
+
+def claim_refill():
+    """Take the next summary whose bank needs topping up; returns ``(summary, difficulties)`` or None"""
+    with transaction.atomic():
+        summary = (
+            Summary.objects.select_for_update(skip_locked=True)
+            .exclude(quiz_bank_refill='')
+            .order_by('pk')
+            .first()
+        )
+        if summary is None:
+            return None
+        difficulties = summary.quiz_bank_refill.split(',')
+        summary.quiz_bank_refill = ''
+        summary.save(update_fields=['quiz_bank_refill'])
+    return summary, difficulties
+
+
+def fill_bank(summary, difficulties):
+    """Generate questions at background priority until each difficulty has QUIZ_BANK_SIZE unserved"""
+    digest = summary_digest(summary)
+    for difficulty in difficulties:
+        missing = settings.QUIZ_BANK_SIZE - unserved_count(summary, difficulty)
+        if missing <= 0:
+            continue
+        known = list(summary.questions.filter(difficulty=difficulty).values_list('question', flat=True))
+        mcqs = generate_mcqs(digest, missing, difficulty, priority=BACKGROUND, avoid=known[-AVOID_LIMIT:])
+        added = store_questions(summary, difficulty, mcqs)
+        logger.info(f"Added {len(added)} {difficulty} questions to the quiz bank of summary {summary.pk}")
+
+
+def create_attempt(user, uploaded_file, difficulty, questions):
+    """Store a quiz and the bank questions it asks, in the order they are shown"""
+    with transaction.atomic():
+        quiz = Quiz.objects.create(user=user, file=uploaded_file, difficulty=difficulty)
+        QuizItem.objects.bulk_create([
+            QuizItem(quiz=quiz, bank_question=question, position=position, **question.as_mcq())
+            for position, question in enumerate(questions)
+        ])
+    return quiz
+
+
+def grade_attempt(quiz, answers):
+    """Record the chosen letters (``answers`` maps position strings to letters) and score the quiz.
+
+    A quiz is graded once; later submissions leave the stored result as it is.
+    """
+    with transaction.atomic():
+        quiz = Quiz.objects.select_for_update().get(pk=quiz.pk)
+        if quiz.submitted_at is not None:
+            return quiz
+        items = list(quiz.items.all())
+        for item in items:
+            choice = answers.get(str(item.position), "")
+            item.user_choice = choice if choice in ('A', 'B', 'C', 'D') else ""
+            item.is_correct = item.user_choice == item.correct_option
+        QuizItem.objects.bulk_update(items, ['user_choice', 'is_correct'])
+        quiz.correct_count = sum(item.is_correct for item in items)
+        quiz.score = quiz.correct_count / len(items) * 100 if items else 0
+        quiz.submitted_at = timezone.now()
+        quiz.save(update_fields=['correct_count', 'score', 'submitted_at'])
+    return quiz
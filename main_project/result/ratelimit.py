@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.db.models import F
+
+from knowbite.models import RateLimitState
+
+logger = logging.getLogger(__name__)
+
+
+class SharedRateLimiter:
+    """Requests-per-minute and tokens-per-minute budgets shared by every worker.
+
+    The schedule lives in a ``RateLimitState`` row, so all gunicorn workers
+    and nodes using the same database draw from one quota (node clocks are
+    assumed to be NTP-synced). It is a GCRA limiter: a caller reserves the
+    next free slot with a compare-and-swap update and then sleeps until
+    that slot starts, so requests are queued in arrival order across
+    processes instead of being rejected.
+
+    Callers with ``priority`` above 0 do not reserve while there is a
+    backlog; they sleep until the GCRA allow-time of their request and try
+    again, so interactive requests that arrive later are still scheduled
+    first, at the cost of one database round trip per attempt.
+    """
+
+    def __init__(self, name, requests_per_minute, tokens_per_minute, burst=1):
+        if requests_per_minute <= 0 or tokens_per_minute <= 0:
+            raise ValueError("requests_per_minute and tokens_per_minute must be positive")
+        self.name = name
+        self.tokens_per_minute = tokens_per_minute
+        self.request_interval = 60.0 / requests_per_minute
+        self.token_interval = 60.0 / tokens_per_minute
+        # ``burst`` requests, and one minute's worth of tokens, may go at once
+        self.request_tolerance = self.request_interval * max(1, burst)
+        self.token_tolerance = 60.0
+
+    def _state(self):
+        state, _ = RateLimitState.objects.get_or_create(name=self.name)
+        return state
+
+    def _reserve(self, tokens, priority):
+        """Try to reserve a slot for one request of ``tokens`` tokens.
+
+        Returns ``(reserved, wait)``: the seconds until the reserved slot
+        starts, or, for a less urgent caller facing a backlog, the seconds
+        until that backlog clears and it should try again.
+        """
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            state = self._state()
+            now = time.time()
+            request_tat = max(state.request_tat, now) + self.request_interval
+            token_tat = max(state.token_tat, now) + tokens * self.token_interval
+            wait = max(request_tat - now - self.request_tolerance, token_tat - now - self.token_tolerance, 0.0)
+            if wait and priority > 0:
+                return False, wait
+            updated = RateLimitState.objects.filter(
+                pk=state.pk, request_tat=state.request_tat, token_tat=state.token_tat
+            ).update(request_tat=request_tat, token_tat=token_tat)
+            if updated:
+                return True, wait
+            # Another process reserved in between; read the new schedule and retry
+
+    def acquire(self, tokens=0, priority=0):
+        """Wait for a slot for one request of ``tokens`` tokens. Returns the seconds waited."""
+        start = time.monotonic()
+        while True:
+            reserved, wait = self._reserve(tokens, priority)
+            if reserved:
+                break
+            time.sleep(wait)
+        if wait:
+            logger.debug(f"Rate limit {self.name}: waiting {wait:.2f}s for a slot")
+            time.sleep(wait)
+        return time.monotonic() - start
+
+    async def aacquire(self, tokens=0, priority=0):
+        """``acquire`` for async callers: waits on the event loop instead of a thread"""
+        start = time.monotonic()
+        while True:
+            reserved, wait = await sync_to_async(self._reserve)(tokens, priority)
+            if reserved:
+                break
+            await asyncio.sleep(wait)
+        if wait:
+            logger.debug(f"Rate limit {self.name}: waiting {wait:.2f}s for a slot")
+            await asyncio.sleep(wait)
+        return time.monotonic() - start
+
+    def settle(self, estimated, actual):
+        """Charge (or refund) the difference between estimated and actual token usage"""
+        if actual == estimated:
+            return
+        RateLimitState.objects.filter(name=self.name).update(
+            token_tat=F('token_tat') + (actual - estimated) * self.token_interval
+        )
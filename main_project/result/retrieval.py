@@ -0,0 +1,138 @@
+import json
+import logging
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+
+from knowbite.models import PassageIndex
+
+from .cache import hash_text
+from .chunking import chunk_text
+
+logger = logging.getLogger(__name__)
+
+TERM_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers
+him his how i if in into is it its itself just me more most my no nor not now of off on once only or other our
+ours out over own same she should so some such than that the their theirs them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with would you your
+""".split())
+
+# Standard BM25 parameters
+K1 = 1.5
+B = 0.75
+
+
+def tokenize(text):
+    """Lowercased terms of ``text`` without stopwords, as used for indexing and queries"""
+    return [term for term in TERM_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+def build_index(text):
+    """Split text into passages and return ``(passages, lengths, postings)`` for BM25"""
+    passages = chunk_text(
+        text,
+        max_tokens=settings.RETRIEVAL_PASSAGE_TOKENS,
+        overlap_tokens=settings.RETRIEVAL_PASSAGE_OVERLAP_TOKENS
+    )
+    lengths = []
+    postings = {}
+    for number, passage in enumerate(passages):
+        terms = Counter(tokenize(passage))
+        lengths.append(sum(terms.values()))
+        for term, frequency in terms.items():
+            postings.setdefault(term, []).append([number, frequency])
+    return passages, lengths, postings
+
+
+def hash_passages(passages):
+    """Identifies a passage list, so row numbers computed against it can be checked later"""
+    return hash_text(json.dumps(passages))
+
+
+def index_extracted_text(extracted_text):
+    """Build (or rebuild) the passage index of an ``ExtractedText``"""
+    passages, lengths, postings = build_index(extracted_text.extracted_text)
+    index, _ = PassageIndex.objects.update_or_create(
+        extracted_text=extracted_text,
+        defaults={
+            'source_hash': hash_text(extracted_text.extracted_text),
+            'passages_hash': hash_passages(passages),
+            'passages': passages,
+            'lengths': lengths,
+            'postings': postings,
+        }
+    )
+    logger.info(f"Indexed {len(passages)} passages, {len(postings)} terms for extracted text {extracted_text.pk}")
+    return index
+
+
+def get_passage_index(extracted_text):
+    """The extracted text's passage index, built now if it is missing or out of date"""
+    index = PassageIndex.objects.filter(extracted_text=extracted_text).first()
+    if (
+        index is None
+        or index.source_hash != hash_text(extracted_text.extracted_text)
+        or not index.passages_hash
+    ):
+        index = index_extracted_text(extracted_text)
+    return index
+
+
+def search(index, query, limit=None):
+    """Numbers of the ``limit`` passages that best match ``query``, best first.
+
+    Passages are ranked with BM25; passages sharing no terms with the query
+    are left out.
+    """
+    limit = limit or settings.CHAT_CONTEXT_PASSAGES
+    count = len(index.lengths)
+    if not count:
+        return []
+    average_length = sum(index.lengths) / count or 1
+
+    scores = {}
+    for term in set(tokenize(query)):
+        postings = index.postings.get(term)
+        if not postings:
+            continue
+        idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+        for number, frequency in postings:
+            norm = K1 * (1 - B + B * index.lengths[number] / average_length)
+            scores[number] = scores.get(number, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+def fuse_rankings(rankings, k=60):
+    """Merge ranked lists of passage numbers with reciprocal rank fusion"""
+    scores = {}
+    for ranking in rankings:
+        for rank, number in enumerate(ranking):
+            scores[number] = scores.get(number, 0.0) + 1 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def relevant_passages(extracted_text, query, limit=None):
+    """Top passages for ``query`` in document order, or the opening passages if nothing matches.
+
+    With CHAT_RETRIEVAL set to ``hybrid``, BM25 results are fused with an
+    embedding search when the text has been embedded.
+    """
+    limit = limit or settings.CHAT_CONTEXT_PASSAGES
+    index = get_passage_index(extracted_text)
+    numbers = search(index, query, limit)
+    if settings.CHAT_RETRIEVAL == 'hybrid':
+        # Imported here because result.embeddings imports this module
+        from .embeddings import semantic_search
+
+        try:
+            numbers = fuse_rankings([numbers, semantic_search(extracted_text, query, limit, index)])[:limit]
+        except Exception as e:
+            logger.warning(f"Semantic search failed, using BM25 only: {e}")
+    numbers = [number for number in numbers if 0 <= number < len(index.passages)]
+    numbers = numbers or list(range(min(limit, len(index.passages))))
+    return [index.passages[number] for number in sorted(numbers)]
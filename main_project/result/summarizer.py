@@ -0,0 +1,91 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .chunking import chunk_text, count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def is_error(result):
+    return isinstance(result, str) and result.startswith('Error')
+
+
+def summarize_chunks(chunks, summarize, max_workers=None, rate_limiter=None):
+    """Map stage: summarize chunks concurrently and return results in chunk order.
+
+    ``summarize`` is called once per chunk from a thread pool of at most
+    ``max_workers`` threads. Calls that go through the LLM gateway are
+    already paced by its limiter; callers that bypass it can pass their own
+    ``rate_limiter`` to take a token before every call. If a chunk fails, the remaining chunks are cancelled
+    and its error string is returned instead of the list.
+    """
+    if max_workers is None:
+        max_workers = settings.SUMMARY_MAX_CONCURRENCY
+
+    def run(index, chunk):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        logger.debug(f"Summarizing chunk {index + 1} of {len(chunks)}")
+        return summarize(chunk)
+
+    workers = max(1, min(max_workers, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run, i, chunk) for i, chunk in enumerate(chunks)]
+        results = []
+        for i, future in enumerate(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = f"Error: Failed to summarize chunk {i + 1} - {str(e)}"
+            if is_error(result):
+                for pending in futures[i + 1:]:
+                    pending.cancel()
+                logger.error(f"Error in chunk {i + 1}: {result}")
+                return result
+            results.append(result)
+    return results
+
+
+def reduce_to_budget(text, summarize, max_tokens, max_workers=None, rate_limiter=None, tree=None):
+    """Reduce stage: condense text in rounds until it fits ``max_tokens``.
+
+    Each round packs the text into chunks of the budget, maps ``summarize``
+    over them with ``summarize_chunks`` and joins the results, so a
+    document that fits the budget costs no calls at all. With a
+    ``SummaryTree``, chunks condensed in an earlier run are reused and only
+    new or changed ones are summarized. Returns the reduced text, or an
+    error string.
+    """
+    tokens = count_tokens(text)
+    level = 0
+    while tokens > max_tokens:
+        chunks = chunk_text(text, max_tokens)
+        notes = tree.cached(level, chunks) if tree else [None] * len(chunks)
+        missing = [i for i, note in enumerate(notes) if note is None]
+        if missing:
+            fresh = summarize_chunks(
+                [chunks[i] for i in missing], summarize, max_workers=max_workers, rate_limiter=rate_limiter
+            )
+            if is_error(fresh):
+                return fresh
+            for i, note in zip(missing, fresh):
+                notes[i] = note
+        if tree:
+            tree.store(level, chunks, notes)
+
+        reduced = "\n\n".join(notes)
+        reduced_tokens = count_tokens(reduced)
+        logger.info(
+            f"Reduction round {level + 1}: {len(chunks)} chunks ({len(chunks) - len(missing)} reused), "
+            f"{tokens} -> {reduced_tokens} tokens"
+        )
+        if reduced_tokens >= tokens:
+            return f"Error: Chunk summaries did not shrink the text ({tokens} -> {reduced_tokens} tokens)"
+        text, tokens = reduced, reduced_tokens
+        level += 1
+
+    if tree:
+        tree.prune(level)
+    return text
@@ -0,0 +1,54 @@
+import logging
+
+from django.db import transaction
+
+from knowbite.models import SummaryNode
+
+from .cache import hash_text
+from .chunking import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryTree:
+    """Persists the reduce stage's chunk notes for one document as ``SummaryNode`` rows.
+
+    Passed to ``reduce_to_budget``, it supplies notes for chunks that were
+    condensed before (matched by the hash of the chunk, so chunks that only
+    moved are reused too) and stores each level once it is complete.
+    """
+
+    def __init__(self, extracted_text, prompt_version):
+        self.extracted_text = extracted_text
+        self.prompt_version = prompt_version
+
+    def _nodes(self):
+        return SummaryNode.objects.filter(extracted_text=self.extracted_text, prompt_version=self.prompt_version)
+
+    def cached(self, level, chunks):
+        """Stored notes for each chunk of ``level``, or None where there are none"""
+        notes = dict(self._nodes().filter(level=level).values_list('source_hash', 'summary_text'))
+        return [notes.get(hash_text(chunk)) for chunk in chunks]
+
+    def store(self, level, chunks, notes):
+        """Replace the nodes of ``level`` with the notes for ``chunks``"""
+        with transaction.atomic():
+            self._nodes().filter(level=level).delete()
+            SummaryNode.objects.bulk_create([
+                SummaryNode(
+                    extracted_text=self.extracted_text,
+                    level=level,
+                    position=position,
+                    source_hash=hash_text(chunk),
+                    prompt_version=self.prompt_version,
+                    summary_text=note,
+                    token_count=count_tokens(note)
+                )
+                for position, (chunk, note) in enumerate(zip(chunks, notes))
+            ])
+
+    def prune(self, levels):
+        """Drop levels left over from a deeper tree once a reduction needs only ``levels``"""
+        deleted, _ = self._nodes().filter(level__gte=levels).delete()
+        if deleted:
+            logger.info(f"Pruned {deleted} summary nodes above level {levels - 1}")
@@ -1,3 +1,983 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import pymupdf
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from google.genai import errors as genai_errors
+
+from knowbite.management.commands.fake_assemblyai import FakeAssemblyAI, make_handler
+from knowbite.models import (
+    ChatContextCache, EmbeddingIndex, ExtractedText, PassageIndex, RateLimitState, Summary, SummaryJob, SummaryNode,
+    TranscriptionJob, UploadedFile
+)
+
+from . import http_client
+from .cache import get_cached_summary, hash_bytes, store_extracted_text, store_summary
+from .chunking import PAGE_BREAK, chunk_text, count_tokens, split_sentences
+from .digest import make_digest
+from .embeddings import embed_extracted_text, get_embedder, semantic_search, vectors_path
+from .jobs import claim_next_job, enqueue_summary_job, job_heartbeat, requeue_stale_jobs, run_summary_job
+from .llm import BACKGROUND, INTERACTIVE, LLMGateway
+from .prompt_cache import get_chat_cache
+from .quiz_bank import create_attempt, grade_attempt, store_questions
+from .ratelimit import SharedRateLimiter
+from .retrieval import build_index, fuse_rankings, index_extracted_text, relevant_passages, search, tokenize
+from .summarizer import reduce_to_budget, summarize_chunks
+from .summary_tree import SummaryTree
+from .mcq import OPTION_FIELDS, parse_mcq_response, validate_mcq
+from .transcription import WEBHOOK_AUTH_HEADER, poll_pending_transcriptions, start_transcription
+
+
+def make_mcq(number, correct='B'):
+    return {
+        'question': f"What does step {number} of the Krebs cycle produce, given $\\Delta G < 0$?",
+        'option_a': f"NADH {number}",
+        'option_b': f"ATP {number}",
+        'option_c': f"CO2 {number}",
+        'option_d': f"FADH2 {number}",
+        'correct_option': correct,
+    }
+
+
+VALID = [make_mcq(number, 'ABCD'[number % 4]) for number in range(5)]
+VALID_JSON = json.dumps(VALID)
+
+LEGACY_TEXT = """Question: What is 2 + 2?
+A) 3
+B) 4
+C) 5
+D) 6
+Correct Answer: B
+
+Question: Which organelle makes ATP?
+A) Nucleus
+B) Ribosome
+C) Mitochondrion
+D) Golgi body
+Correct Answer: C
+"""
+
+# (name, response, number of questions that must survive)
+MALFORMED_CORPUS = [
+    ('empty', '', 0),
+    ('whitespace', '   \n\t ', 0),
+    ('prose refusal', "I'm sorry, I can't generate questions for this summary.", 0),
+    ('schema output', VALID_JSON, 5),
+    ('code fence', f"```json\n{VALID_JSON}\n```", 5),
+    ('leading prose', f"Here are your questions:\n{VALID_JSON}\nGood luck!", 5),
+    ('wrapped in object', json.dumps({'questions': VALID}), 5),
+    ('single object', json.dumps(VALID[0]), 1),
+    ('truncated mid-object', VALID_JSON[:VALID_JSON.rindex('{') + 40], 4),
+    ('truncated after comma', VALID_JSON[:VALID_JSON.rindex('{')], 4),
+    ('missing closing bracket', VALID_JSON[:-1], 5),
+    ('trailing comma', VALID_JSON[:-1] + ',]', 5),
+    ('one missing option', json.dumps([VALID[0], {k: v for k, v in VALID[1].items() if k != 'option_c'}, VALID[2]]), 2),
+    ('one bad answer letter', json.dumps([VALID[0], {**VALID[1], 'correct_option': 'E'}]), 1),
+    ('answer as option text', json.dumps([{**VALID[0], 'correct_option': VALID[0]['option_c']}]), 1),
+    ('answer with parenthesis', json.dumps([{**VALID[0], 'correct_option': 'D) FADH2 0'}]), 1),
+    ('lowercase answer', json.dumps([{**VALID[0], 'correct_option': 'c'}]), 1),
+    ('options list', json.dumps([{'question': 'Q?', 'options': ['w', 'x', 'y', 'z'], 'answer': 'A'}]), 1),
+    ('options dict', json.dumps([{'question': 'Q?', 'options': {'A': 'w', 'B': 'x', 'C': 'y', 'D': 'z'}, 'answer': 'D'}]), 1),
+    ('three options', json.dumps([{'question': 'Q?', 'options': ['w', 'x', 'y'], 'answer': 'A'}]), 0),
+    ('duplicate options', json.dumps([{**VALID[0], 'option_b': VALID[0]['option_a']}]), 0),
+    ('empty question', json.dumps([{**VALID[0], 'question': '  '}]), 0),
+    ('null fields', json.dumps([{**VALID[0], 'option_a': None}]), 0),
+    ('non-object items', json.dumps([1, 'two', None, [3], VALID[0]]), 1),
+    ('letter-prefixed options', json.dumps([{**VALID[0], 'option_a': 'A) NADH 0', 'option_b': 'B. ATP 0'}]), 1),
+    ('latex braces in prose', "Use $\\frac{1}{2}$ and {} everywhere", 0),
+    ('deep nesting', '[' * 5000, 0),
+    ('legacy text format', LEGACY_TEXT, 2),
+    ('legacy with markdown', LEGACY_TEXT.replace('Question:', '**Question:**').replace('Correct Answer:', '**Correct Answer:**'), 2),
+    ('legacy numbered', LEGACY_TEXT.replace('Question:', '1.').replace('A)', '(A)'), 2),
+    ('legacy answer with text', LEGACY_TEXT.replace('Correct Answer: B', 'Correct Answer: B) 4'), 2),
+    ('legacy missing answer', LEGACY_TEXT.replace('Correct Answer: B\n', ''), 1),
+    ('legacy crlf', LEGACY_TEXT.replace('\n', '\r\n'), 2),
+]
+
+
+class ParseMcqResponseTests(SimpleTestCase):
+
+    def assertValidMcqs(self, mcqs):
+        for mcq in mcqs:
+            self.assertEqual(validate_mcq(mcq), mcq)
+            self.assertIn(mcq['correct_option'], ('A', 'B', 'C', 'D'))
+            self.assertEqual(len({mcq[field] for field in OPTION_FIELDS}), 4)
+
+    def test_malformed_corpus(self):
+        for name, response, expected in MALFORMED_CORPUS:
+            with self.subTest(name):
+                mcqs = parse_mcq_response(response)
+                self.assertEqual(len(mcqs), expected)
+                self.assertValidMcqs(mcqs)
+
+    def test_schema_output_round_trips(self):
+        self.assertEqual(parse_mcq_response(VALID_JSON), VALID)
+
+    def test_every_truncation_keeps_complete_questions(self):
+        # A response cut off anywhere, as when a stream drops, keeps every question finished before the cut
+        for cut in range(len(VALID_JSON) + 1):
+            text = VALID_JSON[:cut]
+            mcqs = parse_mcq_response(text)
+            complete = sum(1 for mcq in VALID if text.find(json.dumps(mcq)) != -1)
+            self.assertGreaterEqual(len(mcqs), complete, cut)
+            self.assertValidMcqs(mcqs)
+
+    def test_random_corruption_never_raises(self):
+        rng = random.Random(24)
+        alphabet = '{}[]",:\\ \nABCDabcd0123$'
+        for _ in range(2000):
+            chars = list(VALID_JSON)
+            for _ in range(rng.randint(1, 8)):
+                position = rng.randrange(len(chars))
+                action = rng.choice(('delete', 'insert', 'replace'))
+                if action == 'delete':
+                    del chars[position]
+                elif action == 'insert':
+                    chars.insert(position, rng.choice(alphabet))
+                else:
+                    chars[position] = rng.choice(alphabet)
+            mcqs = parse_mcq_response(''.join(chars))
+            self.assertLessEqual(len(mcqs), len(VALID))
+            self.assertValidMcqs(mcqs)
+
+
+class ChunkTextTests(SimpleTestCase):
+
+    def test_count_tokens(self):
+        self.assertEqual(count_tokens(""), 0)
+        # Words cost a token per four characters, punctuation one each
+        self.assertEqual(count_tokens("a cat sat"), 3)
+        self.assertEqual(count_tokens("photosynthesis."), 5)
+
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(chunk_text("One sentence.  ", max_tokens=50, overlap_tokens=0), ["One sentence."])
+        self.assertEqual(chunk_text(" \n\n ", max_tokens=50, overlap_tokens=0), [])
+
+    def test_chunks_fit_the_budget_and_end_at_sentences(self):
+        text = " ".join(f"Sentence number {number} describes one step of the cycle." for number in range(60))
+        chunks = chunk_text(text, max_tokens=60, overlap_tokens=0)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(count_tokens(chunk), 60)
+            self.assertTrue(chunk.endswith("cycle."))
+        self.assertEqual(" ".join(chunks), text)
+
+    def test_pages_and_paragraphs_are_kept_whole_when_they_fit(self):
+        page = "Alpha beta gamma. Delta epsilon.\n\nZeta eta theta."
+        chunks = chunk_text(PAGE_BREAK.join([page] * 3), max_tokens=count_tokens(page) + 2, overlap_tokens=0)
+        self.assertEqual(chunks, [page] * 3)
+
+    def test_overlap_repeats_the_previous_sentences(self):
+        sentences = [f"Fact {number} is stated here." for number in range(30)]
+        chunks = chunk_text(" ".join(sentences), max_tokens=40, overlap_tokens=10)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            last_sentence = previous.rsplit(". ", 1)[-1]
+            self.assertTrue(chunk.startswith(last_sentence.rstrip(".")))
+            self.assertLessEqual(count_tokens(chunk), 40)
+
+    def test_oversized_sentence_is_split_between_words(self):
+        text = " ".join(["word"] * 100)
+        chunks = chunk_text(text, max_tokens=25, overlap_tokens=0)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(" ".join(chunks).split(), text.split())
+
+    def test_formulas_are_not_split(self):
+        self.assertEqual(split_sentences("Let $x = 1. y$ hold. Next."), ["Let $x = 1. y$ hold. ", "Next."])
+
+
+def bm25_index(passages):
+    """An unsaved ``PassageIndex`` over exactly these passages"""
+    lengths, postings = [], {}
+    for number, passage in enumerate(passages):
+        terms = tokenize(passage)
+        lengths.append(len(terms))
+        for term in sorted(set(terms)):
+            postings.setdefault(term, []).append([number, terms.count(term)])
+    return PassageIndex(passages=passages, lengths=lengths, postings=postings)
+
+
+class RetrievalTests(TestCase):
+    passages = [
+        "The cell membrane controls what enters the cell.",
+        "Mitochondria produce ATP through respiration. Mitochondria have two membranes.",
+        "Photosynthesis happens in chloroplasts.",
+        "Ribosomes build proteins from amino acids.",
+    ]
+
+    def test_tokenize_drops_stopwords_and_case(self):
+        self.assertEqual(tokenize("The ATP of the Cell, and its DNA"), ['atp', 'cell', 'dna'])
+
+    def test_build_index_counts_terms_per_passage(self):
+        with override_settings(RETRIEVAL_PASSAGE_TOKENS=15, RETRIEVAL_PASSAGE_OVERLAP_TOKENS=0):
+            passages, lengths, postings = build_index(" ".join(self.passages))
+        self.assertGreater(len(passages), 1)
+        self.assertEqual(len(lengths), len(passages))
+        for term, entries in postings.items():
+            for number, frequency in entries:
+                self.assertEqual(tokenize(passages[number]).count(term), frequency)
+
+    def test_bm25_ranks_by_term_frequency_and_rarity(self):
+        index = bm25_index(self.passages)
+        self.assertEqual(search(index, "mitochondria", limit=4), [1])
+        # Two mentions of "cell" beat one
+        self.assertEqual(search(index, "cell chloroplasts", limit=4), [0, 2])
+        self.assertEqual(search(index, "ribosomes proteins cell", limit=1), [3])
+        self.assertEqual(search(index, "the and of", limit=4), [])
+
+    def test_rare_terms_outweigh_common_ones(self):
+        index = bm25_index(["protein folding", "protein structure", "protein enzyme", "enzyme kinetics"])
+        self.assertEqual(search(index, "protein enzyme", limit=4)[0], 2)
+        self.assertEqual(search(index, "protein kinetics", limit=1), [3])
+
+    def test_fusion_rewards_agreement(self):
+        self.assertEqual(fuse_rankings([[1, 2, 3], [3, 1, 4]])[:2], [1, 3])
+
+    @override_settings(CHAT_RETRIEVAL='bm25', CHAT_CONTEXT_PASSAGES=2)
+    def test_relevant_passages_keep_document_order_or_fall_back_to_the_opening(self):
+        user = User.objects.create(username='reader')
+        uploaded_file = UploadedFile.objects.create(user=user, file='uploads/cells.pdf', file_type='pdf')
+        extracted_text = ExtractedText.objects.create(
+            user=user, uploaded_file=uploaded_file, extracted_text="\n\n".join(self.passages)
+        )
+        with override_settings(RETRIEVAL_PASSAGE_TOKENS=15, RETRIEVAL_PASSAGE_OVERLAP_TOKENS=0):
+            passages = index_extracted_text(extracted_text).passages
+
+        found = relevant_passages(extracted_text, "ribosomes and chloroplasts")
+        self.assertEqual(found, [passage for passage in passages if 'Ribosomes' in passage or 'chloroplasts' in passage])
+        self.assertEqual(relevant_passages(extracted_text, "quantum gravity"), passages[:2])
+
+
+class MakeDigestTests(SimpleTestCase):
+
+    def test_styles_scripts_and_tags_are_dropped(self):
+        html = (
+            '<head><style>.title { color: red; }</style></head>'
+            '<p class="lead">Cells <b>divide</b>.</p><script>alert("x")</script><svg><text>logo</text></svg>'
+        )
+        self.assertEqual(make_digest(html), "Cells divide.")
+
+    def test_whitespace_is_collapsed(self):
+        self.assertEqual(make_digest("<p>The   cell\t wall</p>\n\n\n<p> is   rigid </p>"), "The cell wall\n\nis rigid")
+
+    def test_structure_keeps_a_markdown_shape(self):
+        html = (
+            "<h2>Cells</h2><ul><li>Nucleus</li><li>Ribosome</li></ul>"
+            "<table><tr><th>Organelle</th><th>Role</th></tr>\n<tr><td> Mitochondrion </td><td>ATP</td></tr></table>"
+        )
+        self.assertEqual(
+            make_digest(html),
+            "## Cells\n\n- Nucleus\n- Ribosome\n\n| Organelle | Role |\n| Mitochondrion | ATP |"
+        )
+
+    def test_emoji_go_but_symbols_and_math_stay(self):
+        html = "<h2>\U0001F680 Energy</h2><h3>\u2728</h3><p>At 25\u00b0C, $\\Delta G &lt; 0$ \u2192 spontaneous \u2705</p>"
+        self.assertEqual(make_digest(html), "## Energy\n\nAt 25\u00b0C, $\\Delta G < 0$ \u2192 spontaneous")
+
+
+class QuizGradingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='student')
+        self.uploaded_file = UploadedFile.objects.create(user=self.user, file='uploads/krebs.pdf', file_type='pdf')
+        self.summary = Summary.objects.create(user=self.user, uploaded_file=self.uploaded_file, summary_text="<p>Krebs</p>")
+        # Correct answers A, B, C, D, A
+        stored = store_questions(self.summary, 'medium', [make_mcq(number, 'ABCD'[number % 4]) for number in range(5)])
+        self.quiz = create_attempt(self.user, self.uploaded_file, 'medium', stored)
+
+    def test_answers_are_scored_by_position(self):
+        quiz = grade_attempt(self.quiz, {'0': 'A', '1': 'B', '2': 'A', '4': 'A'})
+        self.assertEqual((quiz.correct_count, quiz.score), (3, 60))
+        self.assertIsNotNone(quiz.submitted_at)
+        items = list(quiz.items.order_by('position').values_list('user_choice', 'is_correct'))
+        self.assertEqual(items, [('A', True), ('B', True), ('A', False), ('', False), ('A', True)])
+
+    def test_invalid_letters_count_as_unanswered(self):
+        quiz = grade_attempt(self.quiz, {'0': 'a', '1': 'E', '2': 'C) CO2 2'})
+        self.assertEqual(quiz.correct_count, 0)
+        self.assertEqual(set(quiz.items.values_list('user_choice', flat=True)), {''})
+
+    def test_a_quiz_is_graded_once(self):
+        grade_attempt(self.quiz, {str(position): 'ABCDA'[position] for position in range(5)})
+        quiz = grade_attempt(self.quiz, {})
+        self.assertEqual((quiz.correct_count, quiz.score), (5, 100))
+        self.assertEqual(quiz.items.filter(is_correct=True).count(), 5)
+
+
+class SummarizeChunksTests(SimpleTestCase):
+    """The map stage runs chunks concurrently but returns them in document order"""
+
+    def test_results_keep_chunk_order_when_finishing_out_of_order(self):
+        chunks = [f"chunk {i}" for i in range(4)]
+        done = {chunk: threading.Event() for chunk in chunks}
+        finished = []
+
+        def summarize(chunk):
+            # Each chunk waits for the one after it, so the last finishes first
+            index = chunks.index(chunk)
+            if index + 1 < len(chunks):
+                self.assertTrue(done[chunks[index + 1]].wait(5))
+            finished.append(chunk)
+            done[chunk].set()
+            return chunk.upper()
+
+        self.assertEqual(summarize_chunks(chunks, summarize, max_workers=4), [chunk.upper() for chunk in chunks])
+        self.assertEqual(finished, chunks[::-1])
+
+    def test_concurrency_is_bounded_by_max_workers(self):
+        lock = threading.Lock()
+        running = 0
+        peak = 0
+
+        def summarize(chunk):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+            return chunk
+
+        self.assertEqual(summarize_chunks([str(i) for i in range(6)], summarize, max_workers=2), [str(i) for i in range(6)])
+        self.assertEqual(peak, 2)
+
+    def test_first_failed_chunk_is_returned(self):
+        def summarize(chunk):
+            if chunk == "bad":
+                raise ValueError("model refused")
+            return chunk
+
+        self.assertEqual(
+            summarize_chunks(["good", "bad", "good"], summarize, max_workers=1),
+            "Error: Failed to summarize chunk 2 - model refused"
+        )
+
+
+@override_settings(SUMMARY_CHUNK_OVERLAP_TOKENS=0)
+class SummaryTreeTests(TestCase):
+    """Chunk notes are stored per document and reused by later reductions"""
+
+    def setUp(self):
+        user = User.objects.create(username='writer')
+        uploaded_file = UploadedFile.objects.create(user=user, file='uploads/book.pdf', file_type='pdf')
+        self.extracted_text = ExtractedText.objects.create(user=user, uploaded_file=uploaded_file, extracted_text="")
+        self.summarized = []
+
+    def summarize(self, chunk):
+        self.summarized.append(chunk)
+        return f"Notes on {chunk.split()[1].rstrip('.')}."
+
+    def pages(self, *topics):
+        return PAGE_BREAK.join(f"Chapter {topic}. " + f"The {topic} chapter explains one idea. " * 8 for topic in topics)
+
+    def reduce(self, text, tree):
+        return reduce_to_budget(text, self.summarize, max_tokens=110, max_workers=2, tree=tree)
+
+    def test_unchanged_chunks_reuse_their_nodes(self):
+        tree = SummaryTree(self.extracted_text, 'notes-v1')
+        self.assertEqual(self.reduce(self.pages('alpha', 'beta', 'gamma'), tree), "Notes on alpha.\n\nNotes on beta.\n\nNotes on gamma.")
+        self.assertEqual(len(self.summarized), 3)
+        self.assertEqual(SummaryNode.objects.filter(level=0).count(), 3)
+
+        # Only the edited chapter is condensed again, and a moved chapter is still reused
+        self.summarized.clear()
+        self.assertEqual(
+            self.reduce(self.pages('gamma', 'alpha', 'delta'), tree),
+            "Notes on gamma.\n\nNotes on alpha.\n\nNotes on delta."
+        )
+        self.assertEqual([chunk.split()[1] for chunk in self.summarized], ['delta.'])
+        self.assertEqual(
+            list(SummaryNode.objects.filter(level=0).order_by('position').values_list('summary_text', flat=True)),
+            ["Notes on gamma.", "Notes on alpha.", "Notes on delta."]
+        )
+
+    def test_nodes_of_another_prompt_version_are_not_reused(self):
+        self.reduce(self.pages('alpha', 'beta'), SummaryTree(self.extracted_text, 'notes-v1'))
+        self.reduce(self.pages('alpha', 'beta'), SummaryTree(self.extracted_text, 'notes-v2'))
+        self.assertEqual(len(self.summarized), 4)
+
+    def test_text_under_budget_prunes_old_levels(self):
+        tree = SummaryTree(self.extracted_text, 'notes-v1')
+        self.reduce(self.pages('alpha', 'beta'), tree)
+        self.assertEqual(self.reduce("A short note.", tree), "A short note.")
+        self.assertFalse(SummaryNode.objects.exists())
+
+
+class AsyncClientTests(SimpleTestCase):
+
+    def test_client_is_shared_within_a_loop_and_closed_with_it(self):
+        async def clients():
+            return await http_client.aget_async_client(), await http_client.aget_async_client()
+
+        first, again = asyncio.run(clients())
+        self.assertIs(first, again)
+        self.assertTrue(first.is_closed)
+        second, _ = asyncio.run(clients())
+        self.assertIsNot(second, first)
+        self.assertTrue(second.is_closed)
+        self.assertEqual(len(http_client._async_clients), 0)
+
+
+@override_settings(SUMMARY_CACHE_ENABLED=True)
+class SummaryCacheKeyTests(TestCase):
+    key = {'prompt_version': 'blog-v1', 'notes_version': 'notes-v1', 'summary_mode': 'single_pass', 'model_name': 'm'}
+
+    def test_pipeline_changes_miss(self):
+        store_summary('a' * 64, summary_text='<p>Summary</p>', **self.key)
+        self.assertEqual(get_cached_summary('a' * 64, **self.key), '<p>Summary</p>')
+        self.assertIsNone(get_cached_summary('a' * 64, **{**self.key, 'summary_mode': 'map_reduce'}))
+        self.assertIsNone(get_cached_summary('a' * 64, **{**self.key, 'notes_version': 'notes-v2'}))
+
+
+class SummaryJobQueueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='queue')
+        self.uploaded_file = UploadedFile.objects.create(user=self.user, file='uploads/notes.pdf', file_type='pdf')
+
+    def test_pending_job_is_reused(self):
+        job = enqueue_summary_job(self.user, self.uploaded_file)
+        self.assertEqual(enqueue_summary_job(self.user, self.uploaded_file), job)
+        self.assertEqual(SummaryJob.objects.count(), 1)
+
+    def test_regenerate_upgrades_queued_job(self):
+        job = enqueue_summary_job(self.user, self.uploaded_file)
+        regenerated = enqueue_summary_job(self.user, self.uploaded_file, regenerate=True)
+        self.assertEqual(regenerated.pk, job.pk)
+        self.assertTrue(regenerated.regenerate)
+        self.assertEqual(SummaryJob.objects.count(), 1)
+
+    def test_regenerate_is_chained_behind_running_job(self):
+        enqueue_summary_job(self.user, self.uploaded_file)
+        running = claim_next_job()
+        follow_up = enqueue_summary_job(self.user, self.uploaded_file, regenerate=True)
+        self.assertNotEqual(follow_up.pk, running.pk)
+        self.assertEqual(follow_up.status, 'queued')
+        self.assertTrue(follow_up.regenerate)
+        # Asking again while it waits does not queue a third job
+        self.assertEqual(enqueue_summary_job(self.user, self.uploaded_file, regenerate=True), follow_up)
+        self.assertEqual(enqueue_summary_job(self.user, self.uploaded_file), follow_up)
+
+        # The follow-up only starts once the running job has finished
+        self.assertIsNone(claim_next_job())
+        running.set_status('done')
+        self.assertEqual(claim_next_job().pk, follow_up.pk)
+
+    @override_settings(SUMMARY_JOB_STALE_SECONDS=60)
+    def test_stale_claimed_jobs_are_requeued(self):
+        stale = timezone.now() - timedelta(minutes=5)
+        for status in SummaryJob.CLAIMED_STATUSES + ('queued', 'done', 'failed'):
+            uploaded_file = UploadedFile.objects.create(user=self.user, file=f'uploads/{status}.pdf', file_type='pdf')
+            job = SummaryJob.objects.create(user=self.user, uploaded_file=uploaded_file, status=status)
+            SummaryJob.objects.filter(pk=job.pk).update(updated_at=stale)
+
+        self.assertEqual(requeue_stale_jobs(), len(SummaryJob.CLAIMED_STATUSES))
+        self.assertEqual(
+            sorted(SummaryJob.objects.values_list('status', flat=True)),
+            ['done', 'failed'] + ['queued'] * (len(SummaryJob.CLAIMED_STATUSES) + 1)
+        )
+
+
+class FakeClock:
+    """Stands in for the ``time`` module: sleeping advances the clock instead of waiting"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class SharedRateLimiterTests(TestCase):
+    """GCRA scheduling against the ``RateLimitState`` row, with one request a second and no burst"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('result.ratelimit.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = SharedRateLimiter('test', requests_per_minute=60, tokens_per_minute=1_000_000)
+
+    def test_reservations_are_scheduled_in_arrival_order(self):
+        waits = [self.limiter._reserve(0, INTERACTIVE) for _ in range(4)]
+        self.assertEqual(waits, [(True, 0.0), (True, 1.0), (True, 2.0), (True, 3.0)])
+        self.assertEqual(RateLimitState.objects.get(name='test').request_tat, self.clock.now + 4)
+
+    def test_interactive_requests_go_ahead_of_background_ones(self):
+        self.limiter._reserve(0, INTERACTIVE)
+        self.limiter._reserve(0, INTERACTIVE)
+
+        # A background caller facing a backlog does not take a slot...
+        self.assertEqual(self.limiter._reserve(0, BACKGROUND), (False, 2.0))
+        self.assertEqual(RateLimitState.objects.get(name='test').request_tat, self.clock.now + 2)
+        # ...so an interactive request arriving after it gets the next one
+        self.assertEqual(self.limiter._reserve(0, INTERACTIVE), (True, 2.0))
+
+    def test_background_caller_sleeps_to_the_allow_time(self):
+        self.limiter._reserve(0, INTERACTIVE)
+        self.limiter._reserve(0, INTERACTIVE)
+
+        self.assertEqual(self.limiter.acquire(priority=BACKGROUND), 2.0)
+        # One sleep until the backlog clears, not a polling loop, and no error
+        self.assertEqual(self.clock.sleeps, [2.0])
+        self.assertEqual(RateLimitState.objects.get(name='test').request_tat, self.clock.now + 1)
+
+    def test_token_budget_delays_large_requests(self):
+        limiter = SharedRateLimiter('tokens', requests_per_minute=6000, tokens_per_minute=600)
+        # A minute's worth of tokens goes at once; the next request waits for its share to refill
+        reserved, wait = limiter._reserve(600, INTERACTIVE)
+        self.assertTrue(reserved)
+        self.assertAlmostEqual(wait, 0.0)
+        reserved, wait = limiter._reserve(300, INTERACTIVE)
+        self.assertTrue(reserved)
+        self.assertAlmostEqual(wait, 30.0)
+
+    def test_stale_schedule_is_reread_after_a_concurrent_update(self):
+        stale = self.limiter._state()
+        # Another process reserves after this one read the row
+        self.limiter._reserve(0, INTERACTIVE)
+        fresh = self.limiter._state
+        states = iter([stale])
+        with mock.patch.object(self.limiter, '_state', side_effect=lambda: next(states, None) or fresh()):
+            # The compare-and-swap against the stale row fails, so the slot after the other one is taken
+            self.assertEqual(self.limiter._reserve(0, INTERACTIVE), (True, 1.0))
+        self.assertEqual(RateLimitState.objects.get(name='test').request_tat, self.clock.now + 2)
+
+
+def api_error(code):
+    error_class = genai_errors.ClientError if code < 500 else genai_errors.ServerError
+    return error_class(code, {'error': {'code': code, 'message': 'failed', 'status': 'FAILED'}})
+
+
+class StubModels:
+    """``client.models`` that raises or returns queued outcomes in order"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def generate_content(self, model, contents, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        """Each outcome is a list of text pieces, optionally ending in an exception"""
+        self.calls += 1
+        for piece in self.outcomes.pop(0):
+            if isinstance(piece, Exception):
+                raise piece
+            yield SimpleNamespace(text=piece, usage_metadata=None)
+
+
+class StubLimiter:
+    def acquire(self, tokens=0, priority=0):
+        return 0.0
+
+    def settle(self, estimated, actual):
+        pass
+
+
+class LLMGatewayRetryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.sleeps = []
+        clock = SimpleNamespace(sleep=self.sleeps.append, monotonic=time.monotonic)
+        for patcher in (
+            mock.patch('result.llm.time', clock),
+            # Take the top of each jitter range so the backoff is predictable
+            mock.patch('result.http_client.random.uniform', lambda low, high: high),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def gateway(self, *outcomes, max_retries=3):
+        models = StubModels(outcomes)
+        gateway = LLMGateway(
+            SimpleNamespace(models=models), StubLimiter(), max_retries=max_retries, backoff_base=1, backoff_max=30
+        )
+        return gateway, models
+
+    def test_retryable_errors_back_off_exponentially(self):
+        response = SimpleNamespace(text='ok', usage_metadata=None)
+        gateway, models = self.gateway(api_error(503), api_error(429), httpx.ConnectError('reset'), response)
+        self.assertIs(gateway.generate('prompt', feature='test'), response)
+        self.assertEqual(models.calls, 4)
+        self.assertEqual(self.sleeps, [1, 2, 4])
+        metrics = gateway.get_metrics()['test']
+        self.assertEqual((metrics['calls'], metrics['retries'], metrics['rate_limited']), (1, 3, 1))
+
+    def test_client_errors_are_raised_immediately(self):
+        for code in (400, 403, 404):
+            with self.subTest(code):
+                gateway, models = self.gateway(api_error(code), SimpleNamespace(text='ok', usage_metadata=None))
+                with self.assertRaises(genai_errors.ClientError):
+                    gateway.generate('prompt', feature='test')
+                self.assertEqual(models.calls, 1)
+                self.assertEqual(self.sleeps, [])
+
+    def test_gives_up_after_max_retries(self):
+        gateway, models = self.gateway(*[api_error(500)] * 3, max_retries=2)
+        with self.assertRaises(genai_errors.ServerError):
+            gateway.generate('prompt', feature='test')
+        self.assertEqual(models.calls, 3)
+        self.assertEqual(self.sleeps, [1, 2])
+
+    def test_stream_is_only_retried_before_the_first_piece(self):
+        gateway, models = self.gateway([api_error(503)], ['Hel', 'lo'])
+        self.assertEqual(list(gateway.stream('prompt', feature='test')), ['Hel', 'lo'])
+        self.assertEqual(models.calls, 2)
+
+        gateway, models = self.gateway(['Hel', api_error(503)], ['Hello'])
+        pieces = []
+        with self.assertRaises(genai_errors.ServerError):
+            for piece in gateway.stream('prompt', feature='test'):
+                pieces.append(piece)
+        # Retrying would repeat text the caller has already shown
+        self.assertEqual((pieces, models.calls), (['Hel'], 1))
+
+
+class SummaryJobHeartbeatTests(TransactionTestCase):
+    """The heartbeat thread writes through its own connection, so this runs outside a test transaction"""
+
+    @override_settings(SUMMARY_JOB_STALE_SECONDS=60)
+    def test_running_job_is_not_requeued_until_its_heartbeat_stops(self):
+        user = User.objects.create(username='heart')
+        uploaded_file = UploadedFile.objects.create(user=user, file='uploads/notes.pdf', file_type='pdf')
+        enqueue_summary_job(user, uploaded_file)
+        job = claim_next_job()
+        stale = timezone.now() - timedelta(minutes=5)
+
+        with job_heartbeat(job, interval=0.02):
+            SummaryJob.objects.filter(pk=job.pk).update(updated_at=stale)
+            time.sleep(0.2)
+            self.assertEqual(requeue_stale_jobs(), 0)
+
+        SummaryJob.objects.filter(pk=job.pk).update(updated_at=stale)
+        self.assertEqual(requeue_stale_jobs(), 1)
+
+
+class TranscriptionTests(TestCase):
+    """Transcription jobs against the fake AssemblyAI server from ``manage.py fake_assemblyai``"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Transcripts only finish when a test calls ``finish``
+        cls.api = FakeAssemblyAI('', delay=3600)
+        handler = type('QuietHandler', (make_handler(cls.api),), {'log_message': lambda *args: None})
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        cls.api.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            ASSEMBLYAI_API_KEY='test-key',
+            ASSEMBLYAI_BASE_URL=cls.api.base_url,
+            ASSEMBLYAI_WEBHOOK_URL='https://testserver/webhooks/assemblyai/',
+            ASSEMBLYAI_WEBHOOK_SECRET='webhook-secret',
+            TRANSCRIPTION_UPLOAD_CHUNK_SIZE=64 * 1024,
+            MEDIA_ROOT=cls.media_root,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.api.fail = False
+        self.user = User.objects.create(username='listener')
+        self.audio = b'RIFF' + bytes(range(256)) * 1000
+        self.uploaded_file = UploadedFile(user=self.user, file_type='audio')
+        self.uploaded_file.file.save('lecture.wav', ContentFile(self.audio))
+        self.summary_job = SummaryJob.objects.create(user=self.user, uploaded_file=self.uploaded_file, status='transcribing')
+
+    def finish(self, job):
+        """Complete the transcript on the fake server without it calling the webhook"""
+        self.api.finish(job.transcript_id, {})
+
+    def post_webhook(self, job, secret='webhook-secret'):
+        return self.client.post(
+            reverse('assemblyai_webhook'),
+            data=json.dumps({'transcript_id': job.transcript_id, 'status': 'completed'}),
+            content_type='application/json',
+            headers={WEBHOOK_AUTH_HEADER: secret},
+            secure=True
+        )
+
+    def test_audio_is_uploaded_in_chunks(self):
+        job = start_transcription(self.uploaded_file)
+        self.assertEqual(job.status, 'queued')
+        upload_id = self.api.transcripts[job.transcript_id]['audio_url'].rsplit('/', 1)[-1]
+        self.assertEqual(self.api.uploads[upload_id], {'size': len(self.audio), 'chunked': True})
+
+    def test_webhook_completes_transcript_and_resumes_summary(self):
+        job = start_transcription(self.uploaded_file)
+        self.finish(job)
+        response = self.post_webhook(job)
+        self.assertEqual(response.json(), {'status': 'completed'})
+
+        job.refresh_from_db()
+        self.assertEqual(job.text, f"Fake transcript of {len(self.audio)} bytes of audio.")
+        self.assertIsNotNone(job.completed_at)
+        self.summary_job.refresh_from_db()
+        self.assertEqual(self.summary_job.status, 'queued')
+
+    def test_webhook_error_fails_summary(self):
+        self.api.fail = True
+        job = start_transcription(self.uploaded_file)
+        self.finish(job)
+        self.assertEqual(self.post_webhook(job).json(), {'status': 'error'})
+
+        self.summary_job.refresh_from_db()
+        self.assertEqual(self.summary_job.status, 'failed')
+        self.assertEqual(self.summary_job.error, 'Transcription failed: Fake transcription failure')
+
+    def test_duplicate_webhook_is_ignored(self):
+        job = start_transcription(self.uploaded_file)
+        self.finish(job)
+        self.post_webhook(job)
+        # The resumed summary job has been picked up by a worker by the time AssemblyAI retries
+        self.summary_job.refresh_from_db()
+        self.summary_job.set_status('extracting')
+
+        response = self.post_webhook(job)
+        self.assertEqual(response.json(), {'status': 'completed'})
+        self.summary_job.refresh_from_db()
+        self.assertEqual(self.summary_job.status, 'extracting')
+
+    def test_webhook_with_wrong_secret_is_rejected(self):
+        job = start_transcription(self.uploaded_file)
+        self.finish(job)
+        self.assertEqual(self.post_webhook(job, secret='guess').status_code, 401)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+
+    def test_poller_completes_transcript_without_webhook(self):
+        job = start_transcription(self.uploaded_file)
+        self.assertEqual(poll_pending_transcriptions(), 1)
+        job.refresh_from_db()
+        self.assertIn(job.status, TranscriptionJob.PENDING_STATUSES)
+        # Polled recently, so it is not asked about again yet
+        self.assertEqual(poll_pending_transcriptions(), 0)
+
+        self.finish(job)
+        TranscriptionJob.objects.filter(pk=job.pk).update(last_polled_at=None)
+        self.assertEqual(poll_pending_transcriptions(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.summary_job.refresh_from_db()
+        self.assertEqual(self.summary_job.status, 'queued')
+
+    @override_settings(TRANSCRIPTION_TIMEOUT_SECONDS=60)
+    def test_poller_times_out_stuck_transcript(self):
+        job = start_transcription(self.uploaded_file)
+        TranscriptionJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+
+        poll_pending_transcriptions()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'error')
+        self.assertEqual(job.error, 'Timed out waiting for the transcript')
+        self.summary_job.refresh_from_db()
+        self.assertEqual(self.summary_job.status, 'failed')
+
+
+class EmbeddingSearchTests(TestCase):
+    """Notes are searchable from the dashboard and chat, with vectors that match their passages"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.embedding_root = tempfile.mkdtemp()
+        settings_override = override_settings(
+            EMBEDDING_BACKEND='result.embeddings.HashingEmbedder',
+            EMBEDDING_ROOT=self.embedding_root,
+            MEDIA_ROOT=self.media_root,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_embedder.cache_clear()
+        self.addCleanup(get_embedder.cache_clear)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.embedding_root, ignore_errors=True)
+
+        self.user = User.objects.create(username='reader')
+        with mock.patch('users.signals.send_login_notification'):
+            self.client.force_login(self.user)
+
+    def make_pdf(self):
+        document = pymupdf.open()
+        document.new_page().insert_text((72, 72), "Photosynthesis", fontsize=9)
+        return document.tobytes()
+
+    def search(self, query):
+        response = self.client.get(reverse('search_notes'), {'q': query}, secure=True)
+        return [result['file_id'] for result in response.json()['results']]
+
+    def test_cached_pdf_and_youtube_link_are_searchable_after_the_worker_runs(self):
+        pdf = self.make_pdf()
+        store_extracted_text(hash_bytes(pdf), "Chlorophyll absorbs light during photosynthesis in the chloroplast.")
+        self.client.post(
+            reverse('upload'),
+            {'file_type': 'pdf', 'file': SimpleUploadedFile('leaves.pdf', pdf, content_type='application/pdf')},
+            secure=True
+        )
+
+        transcript = {'transcript': [{'text': 'Mitochondria release energy through cellular respiration.', 'start': 0, 'duration': 90}]}
+        with mock.patch('knowbite.views.fetch_youtube_metadata', return_value=('Cells', transcript)):
+            self.client.post(
+                reverse('upload'),
+                {'file_type': 'youtube', 'youtube_link': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'},
+                secure=True
+            )
+
+        # Nothing is embedded in the upload requests; they queue summary jobs instead
+        self.assertEqual(self.search('chlorophyll'), [])
+        self.assertEqual(SummaryJob.objects.filter(status='queued').count(), 2)
+        with mock.patch('result.views.build_summary', return_value="Summary"):
+            while (job := claim_next_job()) is not None:
+                self.assertEqual(run_summary_job(job).status, 'done')
+
+        pdf_file = UploadedFile.objects.get(user=self.user, file_type='pdf')
+        video = UploadedFile.objects.get(user=self.user, file_type='youtube')
+        self.assertEqual(self.search('chlorophyll chloroplast')[:1], [pdf_file.pk])
+        self.assertEqual(self.search('mitochondria respiration')[:1], [video.pk])
+
+    def test_vectors_are_removed_on_regeneration_and_delete(self):
+        uploaded_file = UploadedFile(user=self.user, file_type='pdf')
+        uploaded_file.file.save('notes.pdf', ContentFile(self.make_pdf()))
+        extracted_text = ExtractedText.objects.create(
+            user=self.user, uploaded_file=uploaded_file, extracted_text="Enzymes lower activation energy."
+        )
+        embed_extracted_text(extracted_text)
+        self.assertEqual(self.search('enzymes'), [uploaded_file.pk])
+        self.assertEqual(len(os.listdir(self.embedding_root)), 1)
+
+        extracted_text.extracted_text = "Enzymes are proteins that lower activation energy."
+        extracted_text.save()
+        index = embed_extracted_text(extracted_text)
+        self.assertEqual(self.search('proteins'), [uploaded_file.pk])
+        self.assertEqual(os.listdir(self.embedding_root), [os.path.basename(vectors_path(index))])
+
+        uploaded_file.delete()
+        self.assertEqual(os.listdir(self.embedding_root), [])
+
+
+    @override_settings(CHAT_RETRIEVAL='hybrid', CHAT_CONTEXT_PASSAGES=3)
+    def test_rechunked_text_ignores_stale_vectors(self):
+        uploaded_file = UploadedFile(user=self.user, file_type='pdf')
+        uploaded_file.file.save('notes.pdf', ContentFile(self.make_pdf()))
+        text = " ".join(f"Sentence {number} is about osmosis and diffusion in cells." for number in range(40))
+        extracted_text = ExtractedText.objects.create(user=self.user, uploaded_file=uploaded_file, extracted_text=text)
+        with override_settings(RETRIEVAL_PASSAGE_TOKENS=30, RETRIEVAL_PASSAGE_OVERLAP_TOKENS=0):
+            self.assertGreater(embed_extracted_text(extracted_text).count, 3)
+
+        # Same text, fewer and longer passages: the stored rows no longer line up
+        passage_index = index_extracted_text(extracted_text)
+        self.assertEqual(semantic_search(extracted_text, 'osmosis', 3, passage_index), [])
+        passages = relevant_passages(extracted_text, 'osmosis')
+        self.assertTrue(passages)
+        self.assertTrue(set(passages) <= set(passage_index.passages))
+        self.assertEqual(self.search('osmosis'), [])
+
+        embed_extracted_text(extracted_text)
+        self.assertTrue(semantic_search(extracted_text, 'osmosis', 3, passage_index))
+        self.assertEqual(self.search('osmosis')[:1], [uploaded_file.pk])
+
+class FakeCacheGateway:
+    """Records provider cache calls in place of the Gemini gateway"""
+
+    def __init__(self, on_create=None):
+        self.created = []
+        self.deleted = []
+        self.on_create = on_create
+
+    def create_cache(self, instruction, feature, ttl):
+        if self.on_create:
+            self.on_create()
+        name = f"cachedContents/{len(self.created)}"
+        self.created.append(name)
+        return SimpleNamespace(name=name, expire_time=timezone.now() + timedelta(seconds=ttl))
+
+    def delete_cache(self, name):
+        self.deleted.append(name)
+
+
+@override_settings(CHAT_PROMPT_CACHING_ENABLED=True, CHAT_CACHE_MIN_TOKENS=0)
+class ChatCacheTests(TestCase):
+
+    def setUp(self):
+        self.gateway = FakeCacheGateway()
+        patcher = mock.patch('result.prompt_cache.get_gateway', return_value=self.gateway)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        user = User.objects.create(username='chatter')
+        self.uploaded_file = UploadedFile.objects.create(user=user, file_type='pdf', file='notes.pdf')
+
+    def test_turns_share_one_provider_cache(self):
+        caches = [get_chat_cache(self.uploaded_file, "Summary of the notes") for _ in range(3)]
+        self.assertEqual(self.gateway.created, ['cachedContents/0'])
+        self.assertEqual({cache.cache_name for cache in caches}, {'cachedContents/0'})
+
+    def test_changed_prefix_replaces_and_deletes_old_cache(self):
+        get_chat_cache(self.uploaded_file, "Summary of the notes")
+        cache = get_chat_cache(self.uploaded_file, "Regenerated summary of the notes")
+        self.assertEqual(cache.cache_name, 'cachedContents/1')
+        self.assertEqual(self.gateway.deleted, ['cachedContents/0'])
+
+    def test_provider_is_called_outside_the_row_lock(self):
+        depth = len(connection.atomic_blocks)
+        self.gateway.on_create = lambda: self.assertEqual(len(connection.atomic_blocks), depth)
+        get_chat_cache(self.uploaded_file, "Summary of the notes")
+        self.assertEqual(len(self.gateway.created), 1)
+
+    def test_turn_during_another_renewal_sends_prefix_inline(self):
+        def concurrent_turn():
+            self.assertEqual(get_chat_cache(self.uploaded_file, "Summary of the notes").cache_name, '')
+
+        self.gateway.on_create = concurrent_turn
+        cache = get_chat_cache(self.uploaded_file, "Summary of the notes")
+        self.assertEqual(cache.cache_name, 'cachedContents/0')
+        self.assertEqual(self.gateway.created, ['cachedContents/0'])
+
+    def test_renewal_that_lost_its_lease_deletes_its_cache(self):
+        def lease_taken_over():
+            ChatContextCache.objects.filter(uploaded_file=self.uploaded_file).update(
+                renewing_until=timezone.now() + timedelta(minutes=5)
+            )
+
+        self.gateway.on_create = lease_taken_over
+        cache = get_chat_cache(self.uploaded_file, "Summary of the notes")
+        self.assertEqual(cache.cache_name, '')
+        self.assertEqual(self.gateway.deleted, ['cachedContents/0'])
@@ -0,0 +1,214 @@
+import logging
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from knowbite.models import SummaryJob, TranscriptionJob
+
+from . import http_client
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_AUTH_HEADER = 'X-Webhook-Secret'
+
+
+class TranscriptionPending(Exception):
+    """Raised when an audio file's transcript is not ready yet.
+
+    The summary worker parks its job in the ``transcribing`` state, and the
+    webhook or poller puts it back in the queue once the transcript is done.
+    """
+
+    def __init__(self, job):
+        super().__init__(f"Transcript {job.transcript_id} is {job.status}")
+        self.job = job
+
+
+def _headers():
+    return {"authorization": settings.ASSEMBLYAI_API_KEY}
+
+
+def iter_storage_chunks(file_field, chunk_size=None):
+    """Yield a stored file's bytes in fixed-size chunks, never holding the whole file.
+
+    Local storage is read straight from disk. Remote backends such as
+    Cloudinary, whose ``open()`` downloads the entire file into memory,
+    are streamed from their URL instead.
+    """
+    chunk_size = chunk_size or settings.TRANSCRIPTION_UPLOAD_CHUNK_SIZE
+    storage = file_field.storage
+    try:
+        path = storage.path(file_field.name)
+    except NotImplementedError:
+        path = None
+
+    if path:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        return
+
+    with http_client.get(storage.url(file_field.name), stream=True, timeout=60) as response:
+        response.raise_for_status()
+        yield from response.iter_content(chunk_size)
+
+
+def upload_audio(file_field, chunk_size=None):
+    """Pipe a stored audio file to the AssemblyAI upload endpoint and return its upload URL.
+
+    The body is sent with chunked transfer encoding, so memory use is
+    bounded by ``chunk_size`` regardless of the file's size.
+    """
+    sent = 0
+    start = time.monotonic()
+
+    def counted_chunks():
+        nonlocal sent
+        for chunk in iter_storage_chunks(file_field, chunk_size):
+            sent += len(chunk)
+            yield chunk
+
+    # Not retried: the streamed body cannot be replayed
+    response = http_client.post(
+        f"{settings.ASSEMBLYAI_BASE_URL}/v2/upload",
+        headers=_headers(),
+        data=counted_chunks(),
+        timeout=300
+    )
+    response.raise_for_status()
+    logger.info(f"Uploaded {sent / (1024 * 1024):.1f} MB of audio in {time.monotonic() - start:.1f}s")
+    return response.json()["upload_url"]
+
+
+def start_transcription(uploaded_file):
+    """Upload an audio file, submit it for transcription and track the transcript ID"""
+    base_url = settings.ASSEMBLYAI_BASE_URL
+    payload = {"audio_url": upload_audio(uploaded_file.file)}
+    if settings.ASSEMBLYAI_WEBHOOK_URL:
+        payload["webhook_url"] = settings.ASSEMBLYAI_WEBHOOK_URL
+        payload["webhook_auth_header_name"] = WEBHOOK_AUTH_HEADER
+        payload["webhook_auth_header_value"] = settings.ASSEMBLYAI_WEBHOOK_SECRET
+
+    transcript_response = http_client.post(f"{base_url}/v2/transcript", headers=_headers(), json=payload, timeout=30)
+    transcript_response.raise_for_status()
+    data = transcript_response.json()
+
+    job = TranscriptionJob.objects.create(
+        uploaded_file=uploaded_file,
+        transcript_id=data["id"],
+        status=data.get("status", "queued")
+    )
+    logger.info(f"Submitted transcript {job.transcript_id} for file {uploaded_file.pk}")
+    return job
+
+
+def get_transcript_text(uploaded_file):
+    """Return the transcript of an audio file, starting a transcription on first use.
+
+    Raises ``TranscriptionPending`` while AssemblyAI is still working on it.
+    A transcript that failed earlier is submitted again.
+    """
+    job = uploaded_file.transcription_jobs.order_by('-created_at').first()
+    if job is None or job.status == 'error':
+        job = start_transcription(uploaded_file)
+
+    if job.status == 'completed':
+        return job.text
+    raise TranscriptionPending(job)
+
+
+def fetch_transcript(transcript_id):
+    response = http_client.get(
+        f"{settings.ASSEMBLYAI_BASE_URL}/v2/transcript/{transcript_id}",
+        headers=_headers(),
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def apply_transcript_result(job, result):
+    """Record AssemblyAI's view of a transcript and resume any summary waiting on it"""
+    status = result.get("status", job.status)
+    if not job.is_pending or status == job.status:
+        return job
+
+    job.status = status
+    update_fields = ['status', 'updated_at']
+    if status == 'completed':
+        job.text = result.get("text") or ""
+        job.completed_at = timezone.now()
+        update_fields += ['text', 'completed_at']
+    elif status == 'error':
+        job.error = result.get("error") or "Unknown error"
+        job.completed_at = timezone.now()
+        update_fields += ['error', 'completed_at']
+    job.save(update_fields=update_fields)
+
+    if not job.is_pending:
+        logger.info(f"Transcript {job.transcript_id} {job.status}")
+        resume_waiting_summary_jobs(job.uploaded_file_id)
+    return job
+
+
+def resume_waiting_summary_jobs(uploaded_file_id=None):
+    """Re-queue summary jobs whose transcript has finished, or fail them if it errored"""
+    waiting = SummaryJob.objects.filter(status='transcribing')
+    if uploaded_file_id is not None:
+        waiting = waiting.filter(uploaded_file_id=uploaded_file_id)
+
+    resumed = 0
+    for summary_job in waiting.select_related('uploaded_file'):
+        latest = summary_job.uploaded_file.transcription_jobs.order_by('-created_at').first()
+        if latest is None or latest.is_pending:
+            continue
+        if latest.status == 'completed':
+            summary_job.set_status('queued')
+            resumed += 1
+        else:
+            summary_job.set_status('failed', error=f"Transcription failed: {latest.error}")
+    return resumed
+
+
+def poll_pending_transcriptions(limit=100):
+    """Check every transcript that has not been heard from recently, in one pass.
+
+    Runs inside the summary worker loop. It is the only completion path
+    without a webhook, and otherwise catches webhooks that never arrived.
+    Requests reuse the pooled keep-alive session for the AssemblyAI host.
+    Returns the number of transcripts polled.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.TRANSCRIPTION_POLL_INTERVAL)
+    timed_out = TranscriptionJob.objects.filter(
+        status__in=TranscriptionJob.PENDING_STATUSES,
+        created_at__lt=now - timedelta(seconds=settings.TRANSCRIPTION_TIMEOUT_SECONDS)
+    )
+    for job in timed_out:
+        apply_transcript_result(job, {"status": "error", "error": "Timed out waiting for the transcript"})
+
+    due = list(
+        TranscriptionJob.objects.filter(status__in=TranscriptionJob.PENDING_STATUSES)
+        .filter(Q(last_polled_at__isnull=True) | Q(last_polled_at__lt=cutoff))
+        .order_by(F('last_polled_at').asc(nulls_first=True))[:limit]
+    )
+    if due:
+        TranscriptionJob.objects.filter(pk__in=[job.pk for job in due]).update(
+            last_polled_at=now,
+            poll_count=F('poll_count') + 1
+        )
+        for job in due:
+            try:
+                apply_transcript_result(job, fetch_transcript(job.transcript_id))
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Polling transcript {job.transcript_id} failed: {e}")
+
+    resume_waiting_summary_jobs()
+    return len(due)
@@ -1,3 +1,5 @@
+import asyncio
+import logging
 import os
 import random
 import re
@@ -17,20 +19,53 @@ from PIL import Image
 from django.contrib import messages
 from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 import json
+import hmac
+from asgiref.sync import sync_to_async
 
 from django.conf import settings
-from django.shortcuts import render, get_object_or_404, redirect
-from knowbite.models import UploadedFile, Summary, ChatMessage, ExtractedText, Quiz
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from django.urls import reverse
+from knowbite.models import (
+    UploadedFile, Summary, ChatMessage, ExtractedText, Quiz, SummaryJob, TranscriptionJob, UserSubscription,
+)
 from django.utils.safestring import mark_safe
-from google import genai
 import assemblyai as aai
 
+from . import http_client
+from .extraction import extract_pdf_text
+from .cache import (
+    get_cached_summary, get_cached_text, get_content_hash, hash_text,
+    store_extracted_text, store_summary,
+)
+from .jobs import enqueue_summary_job, get_active_job
+from .transcription import (
+    WEBHOOK_AUTH_HEADER, TranscriptionPending, apply_transcript_result, fetch_transcript, get_transcript_text,
+)
+from .summarizer import reduce_to_budget, is_error as is_summary_error
+from .chunking import count_tokens
+from .summary_tree import SummaryTree
+from .retrieval import relevant_passages
+from .embeddings import index_for_search
+from .llm import BACKGROUND, GEMINI_MODEL, INTERACTIVE, get_gateway
+from .prompt_cache import aforget_missing_cache, chat_config
+from .digest import DIGEST_VERSION, make_digest, summary_digest
+from .quiz_bank import (
+    agenerate_mcqs, create_attempt, grade_attempt, request_refill, reset_bank, sample_questions,
+    store_questions, unserved_count
+)
+
 aai.settings.api_key = settings.ASSEMBLYAI_API_KEY
-# Set up Gemini API client  
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
 
+logger = logging.getLogger(__name__)
+
+# Bump when the summary prompt changes so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "blog-v1"
+# Same for the notes prompt, so stale summary tree nodes are not reused
+NOTES_PROMPT_VERSION = "notes-v1"
 
 # Generation configuration for Gemini
 generation_config = {
@@ -42,52 +77,19 @@ generation_config = {
 
 
 SYSTEM_BASE = """You are a helpful teacher assisting students. Follow these rules:
-1. Answer using document summary and chat history as context but also add necessary related information if needed.
+1. Answer using the document summary, the relevant passages and chat history as context, grounding answers in the passages, but also add necessary related information if needed.
 2. Format math with LaTeX: $inline$ and $$display$$
 3. Explain concepts in easy to understand terms and use relevant extra knowledge when helpful
 4. Keep some answers under 150 words unless necessary then up to 500 words.
 5. Be friendly and use occasional emojis
 6. If question is unrelated, politely decline
-Current Document Summary: {summary}"""
+Document Summary:
+{summary}"""
 
 
 def extract_text_from_pdf(pdf_path):
-    """Extract text from a PDF using PyMuPDF (fitz)."""
-    text = ""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ""
-            for page in pdf.pages:
-                page_text = page.extract_text() or ""
-                text += page_text
-            
-            if len(text.strip()) > 100:
-                return text
-    except Exception:
-        pass
-    
-    # For PyMuPDF
-    try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-            
-        if len(text.strip()) > 100:
-            return text
-    except Exception:
-        pass
-    
-    # For OCR
-    try:
-        images = convert_from_path(pdf_path)
-        text = ""
-        for image in images:
-            text += pytesseract.image_to_string(image, config='--psm 6') + "\n"
-            
-        return text
-    except Exception as e:
-        raise Exception(f"Failed to extract text from PDF: {str(e)}")
+    """Extract text from a PDF page by page, using OCR only for pages without a text layer."""
+    return extract_pdf_text(pdf_path)
 
 
 def extract_text_from_txt(txt_path):
@@ -97,10 +99,9 @@ def extract_text_from_txt(txt_path):
     
 
 
-def generate_summary_with_gemini(text):
-    """Send extracted text to Gemini API and get structured summary based on plan type."""
-
-    prompt = f"""
+def build_summary_prompt(text):
+    """Blog-style summary prompt shared by the blocking and streaming calls."""
+    return f"""
 You are an expert educational blogger and content designer. Your job is to turn the following text into a beautifully formatted, engaging blog post summary that will be rendered within a <div> container on a modern website.
 
 IMPORTANT FORMATTING RULES:
@@ -136,15 +137,59 @@ IMPORTANT FORMATTING RULES:
 Text: {text}
 """
 
+
+def build_notes_prompt(text):
+    """Prompt that condenses one part of a long document ahead of the final summary."""
+    return f"""
+You are condensing one part of a longer document so the whole document can be summarized later.
+Write dense, well-structured Markdown notes of this part:
+- Keep the document's own headings and section order, using Markdown headings
+- Keep every definition, key fact, number, formula and worked example
+- Use $...$ for inline math and formulas (LaTeX style)
+- Use bullet points and tables instead of prose where they are clearer
+- Do not add an introduction, a conclusion or commentary about the text
+Text: {text}
+"""
+
+
+def generate_notes_with_gemini(text):
+    """Condense one chunk of a long document into notes for the reduce stage."""
+    try:
+        response = get_gateway().generate(build_notes_prompt(text), feature='summary_notes', priority=BACKGROUND)
+        if not response or not response.text:
+            print("Error: Empty response text from Gemini API")
+            return "Error: Failed to condense chunk - empty response"
+        return response.text
+    except Exception as e:
+        print(f"Error in generate_notes_with_gemini: {str(e)}")
+        return f"Error: Failed to condense chunk - {str(e)}"
+
+
+def generate_summary_with_gemini(text, on_output=None):
+    """Send extracted text to Gemini API and get structured summary based on plan type.
+
+    With ``on_output`` the call is streamed and the summary written so far
+    is passed to it as it grows, which is how the worker feeds the page's
+    summary stream.
+    """
+
+    prompt = build_summary_prompt(text)
+
     try:
         
         if not text or len(text.strip()) == 0:
             print("Error: Empty input text")
             return "Error: No text content available to summarize"
+
+        if on_output:
+            summary = stream_summary_with_gemini(prompt, on_output)
+            if not summary:
+                print("Error: Empty response text from Gemini API")
+                return "Error: Failed to generate summary - empty response"
+            logger.info(f"Streamed a summary of {len(summary)} characters")
+            return summary
             
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", contents=prompt
-        )
+        response = get_gateway().generate(prompt, feature='summary', priority=BACKGROUND)
         
         if not response:
             print("Error: No response from Gemini API")
@@ -162,58 +207,23 @@ Text: {text}
         return f"Error: Failed to generate summary - {str(e)}"
 
 
-def generate_with_retries(text, max_retries=4, initial_delay=2):
-    """Call generate_summary_with_gemini with retries on rate-limit (429) or transient errors.
-
-    Returns the summary string, or an error string starting with 'Error:' on non-retryable failures.
-    """
-    delay = initial_delay
-    for attempt in range(1, max_retries + 1):
-        result = generate_summary_with_gemini(text)
-
-        # If successful (not an error string), return it
-        if not (isinstance(result, str) and result.startswith('Error')):
-            return result
-
-        # Inspect the error message to decide whether to retry
-        err = result.lower()
-        retryable = False
-
-        # Common indicators of rate limit / transient errors
-        if '429' in err or 'rate' in err or 'rate limit' in err or 'too many requests' in err or 'quota' in err or 'temporar' in err:
-            retryable = True
-
-        if not retryable:
-            # Non-retryable error — return immediately
-            return result
-
-        # If we still have attempts left, sleep and retry
-        if attempt < max_retries:
-            print(f"Rate limit detected from Gemini, attempt {attempt}/{max_retries}. Backing off {delay}s...")
-            time.sleep(delay)
-            delay *= 2
-            continue
-        else:
-            print(f"Exceeded retries ({max_retries}) for Gemini rate limit.")
-            return result
-
-
-# If needed, support long text by summarizing in chunks.
-def split_text(text, max_chars=3000):
-    return [text[i:i+max_chars] for i in range(0, len(text), max_chars)]
-
+def stream_summary_with_gemini(prompt, on_output):
+    """Stream the summary call, passing the text so far to ``on_output`` every SUMMARY_STREAM_FLUSH_SECONDS"""
+    pieces = []
+    flushed_at = time.monotonic()
+    for piece in get_gateway().stream(prompt, feature='summary_stream', priority=BACKGROUND):
+        pieces.append(piece)
+        if time.monotonic() - flushed_at >= settings.SUMMARY_STREAM_FLUSH_SECONDS:
+            on_output(''.join(pieces))
+            flushed_at = time.monotonic()
+    return ''.join(pieces)
 
 
 def generate_long_summary(text):
-    chunks = split_text(text, max_chars=3000)
-    chunk_summaries = []
-    for chunk in chunks:
-        summary_chunk = generate_summary_with_gemini(chunk)
-        chunk_summaries.append(summary_chunk)
-        time.sleep(1)  # Delay to avoid rate limits
-    combined_text = " ".join(chunk_summaries)
-    final_summary = generate_summary_with_gemini(combined_text)
-    return final_summary
+    notes = reduce_to_budget(text, generate_notes_with_gemini, summary_token_budget())
+    if is_summary_error(notes):
+        return notes
+    return generate_summary_with_gemini(notes)
 
 
 
@@ -224,99 +234,44 @@ def base(request, file_id):
     return render(request, "result/base_result.html", {"file": file})
 
 @login_required
-def summary_result(request, file_id):
+async def summary_result(request, file_id):
     """Handle document summary and chat interactions"""
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id, user=request.user)    # Handle "regenerate" requests    
+    user = await request.auser()
+    uploaded_file = await aget_object_or_404(UploadedFile, id=file_id, user=user)
+    # Handle "regenerate" requests
     if "regenerate" in request.GET:
-        # Check regeneration limits
-        print('Start regeneration check')
-        try:
-            user_subscription = request.user.usersubscription
-            print(f"User Plan: {user_subscription.plan.name}")
-            print(f"Plan regenerations allowed: {user_subscription.plan.summary_regenerations_per_file}")
-            
-            # Get all summaries for this file
-            summaries = Summary.objects.filter(
-                user=request.user,
-                uploaded_file_id=file_id
-            ).order_by('created_at')
-            print(f"Total summaries for this file: {summaries.count()}")
-            
-            if summaries.exists():
-                initial_summary = summaries.first()
-                regenerations = summaries.filter(created_at__gt=initial_summary.created_at).count()
-                print(f"Number of regenerations: {regenerations}")
-            
-            can_regenerate, message = user_subscription.can_regenerate_summary(file_id)
-            print(f"Can regenerate: {can_regenerate}")
-            print(f"Message: {message}")
-            
-            if not can_regenerate:
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return JsonResponse({'error': message}, status=403)
-                messages.error(request, message)
-                return redirect('summary', file_id=file_id)
-        except Exception as e:
-            messages.error(request, "Error checking subscription limits")
-            return redirect('summary', file_id=file_id)
+        return await sync_to_async(regenerate_summary)(request, uploaded_file)
 
-        try:     
-            print('start')       
-            summary = generate_or_retrieve_summary(request, uploaded_file)
-            print('done')
-            
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                if isinstance(summary, str) and summary.startswith('Error'):
-                    # If we got an error string back
-                    print(f"Error during summary generation: {summary}")
-                    return JsonResponse({'error': summary}, status=500)
-                    
-                return JsonResponse({
-                    'summary': summary,
-                    'success': True,
-                    'timestamp': time.time()
-                })
-                
-            return render(request, 'result/summary.html', {
-                'summary': summary,
-                'file': uploaded_file,
-                'chat_history': []  # Reset chat history for regenerated summary
-            })
-            
-        except Exception as e:
-            print(f"Error during summary regeneration: {str(e)}")
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                return JsonResponse({
-                    'error': f"Failed to regenerate summary: {str(e)}"
-                }, status=500)
-            messages.error(request, f"Failed to regenerate summary: {str(e)}")
-            return redirect('summary', file_id=file_id)
+    # Handle chat message via AJAX
+    if request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return await handle_chat_request(request, uploaded_file)
 
-    # Handle normal page load
-    summary_instance = Summary.objects.filter(user=request.user, uploaded_file=uploaded_file).first()
+    # Handle normal page load; a missing summary is generated by the worker,
+    # and streamed to the page as it is written unless streaming is turned off
+    job = await sync_to_async(get_active_job)(uploaded_file)
+    stream_summary = False
+    summary_instance = await Summary.objects.filter(user=user, uploaded_file=uploaded_file).afirst()
     if summary_instance:
-        summary = summary_instance.summary_text
+        formatted_summary = markdown.markdown(summary_instance.summary_text)
     else:
-        try:
-            summary = generate_or_retrieve_summary(request, uploaded_file)
-        except Exception as e:
-            summary = f"Error generating summary: {str(e)}"
-
-    formatted_summary = markdown.markdown(summary) if summary else "No summary available"
-
-    # Handle chat message via AJAX
-    if request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return handle_chat_request(request, uploaded_file)
+        if job is None:
+            job = await sync_to_async(enqueue_summary_job)(user, uploaded_file)
+        stream_summary = settings.SUMMARY_STREAMING_ENABLED and job.status != 'transcribing'
+        formatted_summary = ""
 
     # Chat history display
-    chat_history = ChatMessage.objects.filter(
-        user=request.user,
-        file=uploaded_file
-    ).order_by('-timestamp')[:10][::-1]
-
-    return render(request, "result/summary.html", {
+    chat_history = [
+        msg async for msg in ChatMessage.objects.filter(
+            user=user,
+            file=uploaded_file
+        ).order_by('-timestamp')[:10]
+    ][::-1]
+
+    return await sync_to_async(render)(request, "result/summary.html", {
         "file": uploaded_file,
         "summary": formatted_summary,
+        "job": job,
+        "stream_summary": stream_summary,
         "chat_history": [
             {
                 **msg.__dict__,
@@ -327,179 +282,465 @@ def summary_result(request, file_id):
     })
 
 
+def regenerate_summary(request, uploaded_file):
+    """Check regeneration limits and queue a fresh summary job"""
+    file_id = uploaded_file.id
+    # Check regeneration limits
+    print('Start regeneration check')
+    try:
+        user_subscription = request.user.usersubscription
+        print(f"User Plan: {user_subscription.plan.name}")
+        print(f"Plan regenerations allowed: {user_subscription.plan.summary_regenerations_per_file}")
+        
+        # Get all summaries for this file
+        summaries = Summary.objects.filter(
+            user=request.user,
+            uploaded_file_id=file_id
+        ).order_by('created_at')
+        print(f"Total summaries for this file: {summaries.count()}")
+        
+        if summaries.exists():
+            initial_summary = summaries.first()
+            regenerations = summaries.filter(created_at__gt=initial_summary.created_at).count()
+            print(f"Number of regenerations: {regenerations}")
+        
+        can_regenerate, message = user_subscription.can_regenerate_summary(file_id)
+        print(f"Can regenerate: {can_regenerate}")
+        print(f"Message: {message}")
+        
+        if not can_regenerate:
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({'error': message}, status=403)
+            messages.error(request, message)
+            return redirect('summary', file_id=file_id)
+    except Exception as e:
+        messages.error(request, "Error checking subscription limits")
+        return redirect('summary', file_id=file_id)
+
+    job = enqueue_summary_job(request.user, uploaded_file, regenerate=True)
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': reverse('summary_status', args=[file_id])
+        }, status=202)
+    messages.info(request, "Your summary is being regenerated")
+    return redirect('summary', file_id=file_id)
+
+
+@login_required
+def summary_status(request, file_id):
+    """Report the state of the latest summary job so the page can poll it"""
+    uploaded_file = get_object_or_404(UploadedFile, id=file_id, user=request.user)
+    job = SummaryJob.objects.filter(uploaded_file=uploaded_file).order_by('-created_at').first()
+    if job is None:
+        return JsonResponse({'error': 'No summary job found'}, status=404)
+
+    data = {
+        'job_id': job.id,
+        'status': job.status,
+        'updated_at': job.updated_at.isoformat(),
+    }
+    if job.status == 'failed':
+        data['error'] = job.error
+    elif job.status == 'done':
+        summary_text = Summary.objects.filter(
+            user=request.user,
+            uploaded_file=uploaded_file
+        ).values_list('summary_text', flat=True).first()
+        data['summary'] = markdown.markdown(summary_text) if summary_text else ""
+    return JsonResponse(data)
+
+
+@csrf_exempt
+@require_POST
+def assemblyai_webhook(request):
+    """Completion callback from AssemblyAI, authenticated by a shared secret header"""
+    secret = settings.ASSEMBLYAI_WEBHOOK_SECRET
+    if not secret or not hmac.compare_digest(request.headers.get(WEBHOOK_AUTH_HEADER, ''), secret):
+        return JsonResponse({'error': 'Invalid webhook secret'}, status=401)
+
+    try:
+        payload = json.loads(request.body)
+        transcript_id = payload['transcript_id']
+    except (ValueError, KeyError):
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
+
+    job = TranscriptionJob.objects.filter(transcript_id=transcript_id).first()
+    if job is None:
+        return JsonResponse({'error': 'Unknown transcript'}, status=404)
+
+    # The webhook only carries the status, so fetch the transcript itself
+    try:
+        apply_transcript_result(job, fetch_transcript(transcript_id))
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching transcript {transcript_id}: {e}")
+        # The poller will pick it up later
+        return JsonResponse({'status': 'deferred'}, status=202)
+    return JsonResponse({'status': job.status})
+
+
+@staff_member_required
+def ops_metrics(request):
+    """Outbound HTTP and LLM metrics for the process that serves this request"""
+    return JsonResponse({
+        'pid': os.getpid(),
+        'http': http_client.get_metrics(),
+        'llm': get_gateway().get_metrics(),
+    })
+
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@login_required
+async def summary_stream(request, file_id):
+    """Stream a new summary to the browser as server-sent events.
+
+    The summary is written by the background worker; this view only tails
+    its ``SummaryJob``, so a refresh or a second tab follows the same job
+    instead of paying for another generation. It emits ``status`` events
+    as the job moves through its stages, ``chunk`` events with summary
+    HTML as the worker's final Gemini call streams, and a ``done`` event
+    once the summary has been saved. A failed job ends the stream with an
+    ``error`` event; one that waits on a transcript, or for longer than
+    SUMMARY_STREAM_MAX_SECONDS, is handed to the page's status polling with
+    a ``job`` event.
+    """
+    user = await request.auser()
+    uploaded_file = await aget_object_or_404(UploadedFile, id=file_id, user=user)
+    response = StreamingHttpResponse(
+        stream_summary_events(user, uploaded_file),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop proxies from buffering the stream
+    return response
+
+
+async def stream_summary_events(user, uploaded_file):
+    job = await sync_to_async(get_active_job)(uploaded_file)
+    if job is None:
+        summary_instance = await Summary.objects.filter(user=user, uploaded_file=uploaded_file).afirst()
+        if summary_instance:
+            yield sse_event('done', {'summary': markdown.markdown(summary_instance.summary_text)})
+            return
+        job = await sync_to_async(enqueue_summary_job)(user, uploaded_file)
+
+    deadline = time.monotonic() + settings.SUMMARY_STREAM_MAX_SECONDS
+    status = None
+    sent = ''
+    while True:
+        if job.status != status:
+            status = job.status
+            yield sse_event('status', {'status': status})
+
+        if job.output and job.output != sent:
+            if job.output.startswith(sent):
+                yield sse_event('chunk', {'text': job.output[len(sent):]})
+            else:
+                # The final call was retried from the start
+                yield sse_event('chunk', {'text': job.output, 'replace': True})
+            sent = job.output
+
+        if job.status == 'done':
+            summary_text = await Summary.objects.filter(
+                user=user,
+                uploaded_file=uploaded_file
+            ).values_list('summary_text', flat=True).afirst()
+            yield sse_event('done', {'summary': markdown.markdown(summary_text or '')})
+            return
+        if job.status == 'failed':
+            yield sse_event('error', {'error': job.error or "Error: Failed to generate summary"})
+            return
+        if job.status == 'transcribing' or time.monotonic() > deadline:
+            # Transcripts take minutes; let the page poll instead of holding the connection
+            yield sse_event('job', {
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': reverse('summary_status', args=[uploaded_file.id])
+            })
+            return
+
+        await asyncio.sleep(settings.SUMMARY_STREAM_POLL_INTERVAL)
+        job = await SummaryJob.objects.aget(pk=job.pk)
+
+
+def generate_or_retrieve_summary(user, uploaded_file, on_stage=None, use_cache=True, on_output=None):
+    """Generate or retrieve document summary.
+
+    ``on_stage`` is called with the pipeline stage name when summarization
+    starts, which lets the background worker report job progress.
+    ``use_cache=False`` skips the shared summary cache (used for regeneration).
+    ``on_output`` receives the summary so far while the final call streams.
+    """
+    extracted_text, error = get_or_extract_text(user, uploaded_file)
+    if error:
+        return error
+
+    # Summary generation step
+    if on_stage:
+        on_stage('summarizing')
+
+    # Identical source text already summarized for another user is reused without an LLM call
+    source_hash = hash_text(extracted_text)
+    summary = get_cached_summary(source_hash, **summary_cache_key()) if use_cache else None
+    if summary is None:
+        summary = build_summary(user, uploaded_file, extracted_text, on_output=on_output)
+        if is_summary_error(summary):
+            print(f"Summary generation failed: {summary}")
+            return summary
+        store_summary(source_hash, summary_text=summary, **summary_cache_key())
 
-def generate_or_retrieve_summary(request, uploaded_file):
-    """Generate or retrieve document summary"""
-    user = request.user  # Force evaluation of lazy object
+    return save_summary(user, uploaded_file, summary)
+
+
+def get_or_extract_text(user, uploaded_file):
+    """Return ``(extracted_text, error)`` for a file, extracting it on first use.
+
+    Raises ``TranscriptionPending`` for audio whose transcript is not ready yet.
+    """
     is_youtube = uploaded_file.file_type == 'youtube'
-    summary_instance = Summary.objects.filter(user=user, uploaded_file=uploaded_file).first()
     extracted_text_instance = ExtractedText.objects.filter(user=user, uploaded_file=uploaded_file).first()
     extracted_text = ""
 
     if extracted_text_instance is not None:
-        extracted_text = extracted_text_instance.extracted_text
-    else:
-        try:
-            # Text extraction step
-            if is_youtube:
-                print("Extracting YouTube transcript")
-            else:
-                file_path = uploaded_file.file.path
+        # Text stored at upload time is indexed here, off the request path
+        index_for_search(extracted_text_instance)
+        return extracted_text_instance.extracted_text, None
+
+    try:
+        # Text extraction step
+        if is_youtube:
+            print("Extracting YouTube transcript")
+        else:
+            # Identical files (e.g. the same course handout) reuse earlier extractions
+            try:
+                content_hash = get_content_hash(uploaded_file)
+            except Exception as e:
+                print(f"Content hash error: {e}")
+                content_hash = None
+            extracted_text = get_cached_text(content_hash)
+
+            if extracted_text is None:
+                file_name = uploaded_file.file.name
                 try:
-                    if file_path.lower().endswith(".pdf"):
-                        extracted_text = extract_text_from_pdf(file_path)
-                    elif file_path.lower().endswith(".txt"):
-                        extracted_text = extract_text_from_txt(file_path)
-                    elif file_path.lower().endswith((".wav", ".mp3", ".ogg", ".m4a")):
-                        extracted_text = transcribe_audio_assemblyai(file_path)
+                    if file_name.lower().endswith(".pdf"):
+                        extracted_text = extract_text_from_pdf(uploaded_file.file.path)
+                    elif file_name.lower().endswith(".txt"):
+                        extracted_text = extract_text_from_txt(uploaded_file.file.path)
+                    elif file_name.lower().endswith((".wav", ".mp3", ".ogg", ".m4a")):
+                        # Streamed from the storage backend, so no local path is needed
+                        extracted_text = get_transcript_text(uploaded_file)
+                except TranscriptionPending:
+                    raise
                 except Exception as e:
                     print(f"Text extraction error: {e}")
-                    return f"Error in text extraction: {str(e)}"
-                    
-            # Create extracted text record
-            try:
-                ExtractedText.objects.create(user=user, uploaded_file=uploaded_file, extracted_text=extracted_text)
-            except Exception as e:
-                print(f"ExtractedText creation error: {e}")
-                return f"Error creating extracted text record: {str(e)}"
-                
-        except Exception as e:
-            print(f"General extraction error: {e}")
-            return f"Error during processing: {str(e)}"    # Summary generation step
-    try:
-        # Get user's plan type
+                    return None, f"Error in text extraction: {str(e)}"
+
+                if not extracted_text.startswith(("Transcription failed", "Transcription error")):
+                    store_extracted_text(content_hash, extracted_text)
+
+        # Create extracted text record
         try:
-            user_subscription = user.usersubscription
-            plan_type = user_subscription.plan.name
-            print(f"User plan type: {plan_type}")
+            extracted_text_instance = ExtractedText.objects.create(
+                user=user, uploaded_file=uploaded_file, extracted_text=extracted_text
+            )
         except Exception as e:
-            print(f"Error getting plan type: {e}")          # Define chunk size based on plan type
-       
-        chunk_size = 10000
-        if len(extracted_text) > chunk_size:
-            print(f"Text length {len(extracted_text)} exceeds {chunk_size} chars, splitting into chunks")
-            chunks = split_text(extracted_text, max_chars=chunk_size)
-            chunk_summaries = []
-            
-            # Calculate word limit per chunk based on total chunks
-            word_limits = {
-                'free': 500,
-                'basic': 700,
-                'pro': 1000
-            }
-            total_word_limit = word_limits.get(plan_type.lower(), 300)
-            chunk_word_limit = total_word_limit // len(chunks)
-            
-            for i, chunk in enumerate(chunks, 1):
-                print(f"Processing chunk {i} of {len(chunks)}")
-                summary_chunk = generate_summary_with_gemini(chunk)
+            print(f"ExtractedText creation error: {e}")
+            return None, f"Error creating extracted text record: {str(e)}"
 
-                if isinstance(summary_chunk, str) and summary_chunk.startswith('Error:'):
-                    print(f"Error in chunk {i}: {summary_chunk}")
-                    return summary_chunk
+        # Index the text for chat retrieval and search once, at extraction time
+        index_for_search(extracted_text_instance)
 
-                chunk_summaries.append(summary_chunk)
-                time.sleep(1)  # Delay to avoid rate limits
-            
-            print(f"Generated {len(chunk_summaries)} chunk summaries")
-            
-            chunk_summaries = ' '.join(chunk_summaries)
-            combined_summary = generate_summary_with_gemini(chunk_summaries)
-                
-            if isinstance(combined_summary, str) and combined_summary.startswith('Error:'):
-                print(f"Error combining summaries: {combined_summary}")
-                return combined_summary
-                
-            summary = combined_summary
-        else:
-            summary = generate_summary_with_gemini(extracted_text)
+    except TranscriptionPending:
+        raise
     except Exception as e:
-        print(f"Summary generation error: {e}")
-        return f"Error generating summary: {str(e)}"
-        
-    # Save summary
+        print(f"General extraction error: {e}")
+        return None, f"Error during processing: {str(e)}"
+
+    return extracted_text, None
+
+
+def save_summary(user, uploaded_file, summary):
+    """Create or update the user's Summary row; returns the summary or an error string"""
     try:
+        summary_instance = Summary.objects.filter(user=user, uploaded_file=uploaded_file).first()
+        # The prompt digest is derived once here rather than on every chat or quiz request
+        digest = make_digest(summary)
         if summary_instance:
             summary_instance.summary_text = summary
+            summary_instance.digest_text = digest
+            summary_instance.digest_version = DIGEST_VERSION
             summary_instance.save()
         else:
-            Summary.objects.create(user=user, uploaded_file=uploaded_file, summary_text=summary)
+            summary_instance = Summary.objects.create(
+                user=user,
+                uploaded_file=uploaded_file,
+                summary_text=summary,
+                digest_text=digest,
+                digest_version=DIGEST_VERSION
+            )
+        # Questions about the old text no longer fit; the worker builds the new bank
+        reset_bank(summary_instance)
     except Exception as e:
         print(f"Summary saving error: {e}")
         return f"Error saving summary: {str(e)}"
-    
+
     return summary
 
 
-@login_required
-def handle_chat_request(request, uploaded_file):
-    """Process chat messages with Gemini"""    # Check chat message limits
+def summary_cache_key():
+    """Everything besides the source text that decides a summary, for the shared summary cache"""
+    return {
+        'prompt_version': SUMMARY_PROMPT_VERSION,
+        'notes_version': NOTES_PROMPT_VERSION,
+        'summary_mode': settings.SUMMARY_MODE,
+        'model_name': GEMINI_MODEL,
+    }
+
+
+def summary_token_budget():
+    """Largest input, in tokens, that goes to the final summary call as-is"""
+    if settings.SUMMARY_MODE == 'single_pass':
+        return settings.SUMMARY_SINGLE_PASS_MAX_TOKENS
+    return settings.SUMMARY_CHUNK_TOKENS
+
+
+def prepare_summary_input(user, uploaded_file, extracted_text):
+    """Return ``(text, error)`` for the final summary call.
+
+    In ``single_pass`` mode whole documents up to SUMMARY_SINGLE_PASS_MAX_TOKENS
+    go to Gemini in one call. Anything over the budget (or over
+    SUMMARY_CHUNK_TOKENS in ``map_reduce`` mode) is first condensed into
+    notes, chunk by chunk and in as many rounds as it takes to fit. The
+    notes are kept as the file's summary tree, so regenerating only
+    condenses chunks that changed and then redoes the final call.
+    """
+    budget = summary_token_budget()
+    tokens = count_tokens(extracted_text)
+    if tokens <= budget:
+        return extracted_text, None
+
+    logger.info(f"Text has {tokens} tokens, over the {budget}-token {settings.SUMMARY_MODE} budget; condensing it first")
+    extracted_text_instance = ExtractedText.objects.filter(uploaded_file=uploaded_file).first()
+    tree = SummaryTree(extracted_text_instance, NOTES_PROMPT_VERSION) if extracted_text_instance else None
+    notes = reduce_to_budget(extracted_text, generate_notes_with_gemini, budget, tree=tree)
+    if is_summary_error(notes):
+        return None, notes
+    return notes, None
+
+
+def build_summary(user, uploaded_file, extracted_text, on_output=None):
+    """Summarize extracted text with Gemini, chunking long documents"""
+    try:
+        summary_input, error = prepare_summary_input(user, uploaded_file, extracted_text)
+        if error:
+            return error
+
+        summary = generate_summary_with_gemini(summary_input, on_output=on_output)
+        if is_summary_error(summary):
+            print(f"Error combining summaries: {summary}")
+    except Exception as e:
+        print(f"Summary generation error: {e}")
+        return f"Error generating summary: {str(e)}"
+
+    return summary
+
+
+def check_chat_request(request, uploaded_file):
+    """Validate a chat POST. Returns ``(user_message, error_response)``."""
+    # Check chat message limits
     try:
         user_subscription = request.user.usersubscription
         can_chat, message = user_subscription.can_send_chat_message(uploaded_file.id)
         if not can_chat:
-            return JsonResponse({'error': message}, status=403)
+            return None, JsonResponse({'error': message}, status=403)
     except Exception as e:
-        return JsonResponse({'error': 'Error checking chat limits'}, status=500)
+        return None, JsonResponse({'error': 'Error checking chat limits'}, status=500)
 
     if request.POST.get('message') != None:
         user_message = request.POST.get('message').strip()
     else:
-        user_message = request.POST.get('message-chat').strip()
+        user_message = (request.POST.get('message-chat') or '').strip()
 
     if not user_message:
-        return JsonResponse({'error': 'Empty message'}, status=400)
+        return None, JsonResponse({'error': 'Empty message'}, status=400)
+    return user_message, None
 
-    # Get document summary once
-    summary_text = Summary.objects.filter(
-        user=request.user, 
-        uploaded_file=uploaded_file
-    ).values_list('summary_text', flat=True).first() or "No summary available"
 
-    # Create system instruction with summary
-    system_instruction = SYSTEM_BASE.format(summary=summary_text)
+def build_chat_instruction(uploaded_file):
+    """System instruction for a file's chat: the rules plus the summary, the same on every turn"""
+    summary = Summary.objects.filter(uploaded_file=uploaded_file).first()
+    overview = summary_digest(summary) if summary else "No summary available yet"
+    return SYSTEM_BASE.format(summary=overview)
+
+
+def build_chat_prompt(user, uploaded_file, user_message):
+    """Per-turn prompt (passages + recent chat history + current user message) and its generation config.
+
+    The system instruction is the stable prefix of every turn, so the
+    config takes it from Gemini's context cache rather than resending it.
+    """
+    config = chat_config(uploaded_file, build_chat_instruction(uploaded_file))
+
+    # Only the passages of the source text that match the question are sent
+    extracted_text = ExtractedText.objects.filter(uploaded_file=uploaded_file).first()
+    if extracted_text and extracted_text.extracted_text.strip():
+        passages = relevant_passages(extracted_text, user_message)
+        context = "\n\n---\n\n".join(passages)
+        logger.debug(f"Chat context for file {uploaded_file.pk}: {len(passages)} passages, {len(context)} characters")
+    else:
+        context = "No document text available"
 
     # Get last 3 exchanges (6 messages)
     history_messages = ChatMessage.objects.filter(
-        user=request.user,
+        user=user,
         file=uploaded_file
     ).order_by('-timestamp')[:6]
 
-    # Format history for Gemini
-    history = []
+    history_lines = []
     for msg in reversed(history_messages):
-        history.append({
-            "role": "user" if msg.role == "user" else "model",
-            "parts": [msg.content]
-        })
+        role = 'User' if msg.role == 'user' else 'Assistant'
+        # Keep content short for prompt, but preserve formatting
+        history_lines.append(f"{role}: {msg.content}")
 
-    try:
-        # Build a single prompt: system instruction + recent chat history + current user message
-        history_lines = []
-        for msg in reversed(history_messages):
-            role = 'User' if msg.role == 'user' else 'Assistant'
-            # Keep content short for prompt, but preserve formatting
-            history_lines.append(f"{role}: {msg.content}")
+    prompt_parts = [f"Relevant Document Passages:\n{context}"]
+    if history_lines:
+        prompt_parts.append("Conversation history:")
+        prompt_parts.extend(history_lines)
 
-        prompt_parts = [system_instruction]
-        if history_lines:
-            prompt_parts.append("Conversation history:")
-            prompt_parts.extend(history_lines)
+    prompt_parts.append(f"User: {user_message}")
+    return "\n\n".join(prompt_parts), config
 
-        prompt_parts.append(f"User: {user_message}")
-        full_prompt = "\n\n".join(prompt_parts)
+
+@login_required
+async def handle_chat_request(request, uploaded_file):
+    """Process chat messages with Gemini"""
+    user = await request.auser()
+    user_message, error_response = await sync_to_async(check_chat_request)(request, uploaded_file)
+    if error_response:
+        return error_response
+
+    try:
+        full_prompt, config = await sync_to_async(build_chat_prompt)(user, uploaded_file, user_message)
 
         # Persist the user's message to chat history
-        ChatMessage.objects.create(
-            user=request.user,
+        await ChatMessage.objects.acreate(
+            user=user,
             file=uploaded_file,
             role='user',
             content=user_message
         )
 
-        # Create a chat using the new genai client API and send the prompt
-        chat = client.chats.create(model='gemini-2.5-flash')
-        response = chat.send_message(message=full_prompt)
+        # The async client waits on Gemini without holding a thread
+        try:
+            response = await get_gateway().agenerate(full_prompt, feature='chat', priority=INTERACTIVE, config=config)
+        except Exception as e:
+            await aforget_missing_cache(uploaded_file, config, e)
+            raise
 
         # Try common response attributes
         bot_response = None
@@ -512,8 +753,8 @@ def handle_chat_request(request, uploaded_file):
             bot_response = str(response)
 
         # Store bot response
-        ChatMessage.objects.create(
-            user=request.user,
+        await ChatMessage.objects.acreate(
+            user=user,
             file=uploaded_file,
             role='bot',
             content=bot_response
@@ -526,59 +767,58 @@ def handle_chat_request(request, uploaded_file):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def generate_mcqs_with_gemini(summary_text, num_questions, difficulty):
-    """Generate multiple-choice questions dynamically based on the summary."""
-    
-    prompt = f"""
-    Generate {num_questions} multiple-choice questions based on the following summary. 
-    The questions should be {difficulty} level.
-    Use Latex formulas **where necessary**.
-    Use diagrams such as graphs, circuit diagrams etc **if necessary**.
-    You can ask questions using related images using the html image tag.
-
-    - Each question must have four answer choices (A, B, C, D).
-    - Clearly mark the correct answer.
-    - The format should be:
-      
-      Question: ...
-      A) ...
-      B) ...
-      C) ...
-      D) ...
-      Correct Answer: X
-    
-    Summary: {summary_text}
+@login_required
+@require_POST
+async def chat_stream(request, file_id):
+    """Stream a chat reply as server-sent ``chunk`` events.
+
+    The bot's ChatMessage is only stored once the whole reply has arrived,
+    and is announced with a ``done`` event carrying the full text.
     """
-    response = client.models.generate_content(
-        model="gemini-2.5-flash", contents=prompt
+    user = await request.auser()
+    uploaded_file = await aget_object_or_404(UploadedFile, id=file_id, user=user)
+    user_message, error_response = await sync_to_async(check_chat_request)(request, uploaded_file)
+    if error_response:
+        return error_response
+
+    full_prompt, config = await sync_to_async(build_chat_prompt)(user, uploaded_file, user_message)
+    await ChatMessage.objects.acreate(
+        user=user,
+        file=uploaded_file,
+        role='user',
+        content=user_message
     )
-    return response.text if response.text else "No MCQs generated."
-
-
-def parse_mcq_response(mcq_text):
-    """Extract MCQs from AI-generated response."""
-    mcqs = []
-    questions = mcq_text.split("Question: ")[1:]  # Split based on "Question: "
-
-    for q in questions:
-        lines = q.strip().split("\n")
-        if len(lines) >= 6:
-            question = lines[0]
-            option_a = lines[1][3:].strip()  # Remove "A) "
-            option_b = lines[2][3:].strip()  # Remove "B) "
-            option_c = lines[3][3:].strip()  # Remove "C) "
-            option_d = lines[4][3:].strip()  # Remove "D) "
-            correct_option = lines[5][-1].strip()  # Last character of "Correct Answer: X"
-
-            mcqs.append({
-                "question": question,
-                "option_a": option_a,
-                "option_b": option_b,
-                "option_c": option_c,
-                "option_d": option_d,
-                "correct_option": correct_option,
-            })
-    return mcqs
+
+    response = StreamingHttpResponse(
+        stream_chat_events(user, uploaded_file, full_prompt, config),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def stream_chat_events(user, uploaded_file, prompt, config):
+    pieces = []
+    try:
+        async for text in get_gateway().astream(prompt, feature='chat_stream', priority=INTERACTIVE, config=config):
+            pieces.append(text)
+            yield sse_event('chunk', {'text': text})
+    except Exception as e:
+        print(f"Chat error: {str(e)}")
+        await aforget_missing_cache(uploaded_file, config, e)
+        yield sse_event('error', {'error': str(e)})
+        return
+
+    bot_response = ''.join(pieces)
+    await ChatMessage.objects.acreate(
+        user=user,
+        file=uploaded_file,
+        role='bot',
+        content=bot_response
+    )
+    yield sse_event('done', {'response': bot_response})
+
 
 @login_required
 def quiz_options(request, file_id):
@@ -587,14 +827,15 @@ def quiz_options(request, file_id):
     return render(request, "result/quiz_options.html", {"file": uploaded_file})
 
 @login_required
-def take_quiz(request, file_id):
+async def take_quiz(request, file_id):
     """Generates and displays the quiz."""
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id, user=request.user)
+    user = await request.auser()
+    uploaded_file = await aget_object_or_404(UploadedFile, id=file_id, user=user)
     
     # Check quiz generation limits
     try:
-        user_subscription = request.user.usersubscription
-        can_generate, message = user_subscription.can_generate_quiz(file_id)
+        user_subscription = await UserSubscription.objects.select_related('plan').aget(user=user)
+        can_generate, message = await sync_to_async(user_subscription.can_generate_quiz)(file_id)
         if not can_generate:
             print('Cannot generate quiz')
             messages.error(request, message)
@@ -604,7 +845,7 @@ def take_quiz(request, file_id):
         messages.error(request, "Error checking quiz limits")
         return redirect('quiz_options', file_id=file_id)
     
-    summary_instance = get_object_or_404(Summary, uploaded_file=uploaded_file)
+    summary_instance = await aget_object_or_404(Summary, uploaded_file=uploaded_file)
 
     num_questions = int(request.GET.get("num_questions", 10))
     print(num_questions)
@@ -617,74 +858,71 @@ def take_quiz(request, file_id):
 
     print(difficulty)
 
-    # Generate MCQs on the fly
-    mcq_text = generate_mcqs_with_gemini(summary_instance.summary_text, num_questions, difficulty)
-    mcqs = parse_mcq_response(mcq_text)
-    random.shuffle(mcqs)
-
-    Quiz.objects.create(user=request.user, file=uploaded_file)
+    # Serve from the question bank, generating on the spot only what it cannot cover
+    questions = await sync_to_async(sample_questions)(summary_instance, difficulty, num_questions)
+    if len(questions) < num_questions:
+        digest = await sync_to_async(summary_digest)(summary_instance)
+        new_mcqs = await agenerate_mcqs(
+            digest, num_questions - len(questions), difficulty, avoid=[question.question for question in questions]
+        )
+        questions += await sync_to_async(store_questions)(summary_instance, difficulty, new_mcqs, served=True)
+    if await sync_to_async(unserved_count)(summary_instance, difficulty) < num_questions:
+        await sync_to_async(request_refill)(summary_instance, difficulty)
+    random.shuffle(questions)
 
-    request.session['mcqs'] = mcqs  # Store MCQs in session for later use
+    # The attempt is stored server-side and graded by its ID, keeping the session small
+    quiz = await sync_to_async(create_attempt)(user, uploaded_file, difficulty, questions)
+    if await request.session.ahas_key('mcqs'):
+        await request.session.apop('mcqs')  # Left over from when quizzes lived in the session
 
-    return render(request, "result/quiz.html", {"mcqs": mcqs, "file": uploaded_file})
+    mcqs = [question.as_mcq() for question in questions]
+    return await sync_to_async(render)(request, "result/quiz.html", {"mcqs": mcqs, "file": uploaded_file, "quiz": quiz})
 
 @login_required
-def submit_quiz(request, file_id):
-    """Handles quiz submission and calculates the score."""
+def submit_quiz(request, file_id, quiz_id):
+    """Grades a stored quiz attempt and shows the result."""
     uploaded_file = get_object_or_404(UploadedFile, id=file_id, user=request.user)
-    mcqs = request.session.get("mcqs", [])  # Retrieve MCQs from session
-
-    user_answers = request.POST
-    correct_count = 0
-    results = []
+    quiz = get_object_or_404(Quiz, id=quiz_id, file=uploaded_file, user=request.user)
+    if request.method == 'POST':
+        quiz = grade_attempt(quiz, request.POST)
 
+    items = list(quiz.items.all())
+    if quiz.submitted_at is None:
+        # Not answered yet: show the quiz again instead of an empty result
+        return render(request, "result/quiz.html", {"mcqs": items, "file": uploaded_file, "quiz": quiz})
 
-    for index, mcq in enumerate(mcqs):
-        user_choice = user_answers.get(str(index), "")
-        option_mapping = {
-            "A": mcq["option_a"],
-            "B": mcq["option_b"],
-            "C": mcq["option_c"],
-            "D": mcq["option_d"],
-        }
-        user_choice_text = option_mapping.get(user_choice, "")
-        correct_answer_text = option_mapping.get(mcq["correct_option"], "")
-        is_correct = user_choice == mcq["correct_option"]
-        if is_correct:
-            correct_count += 1
+    results = []
+    for item in items:
         results.append({
-            "question": mcq["question"],
-            "user_choice": user_choice_text,
-            "correct_choice": correct_answer_text,
-            "is_correct": is_correct,
-            "options": [mcq["option_a"], mcq["option_b"], mcq["option_c"], mcq["option_d"]],
+            "question": item.question,
+            "user_choice": item.option_text(item.user_choice),
+            "correct_choice": item.option_text(item.correct_option),
+            "is_correct": item.is_correct,
+            "options": [item.option_a, item.option_b, item.option_c, item.option_d],
         })
 
-    score = (correct_count / len(mcqs)) * 100 if mcqs else 0
-    incorrect_count = len(mcqs) - correct_count
-
-    return render(request, "result/quiz_result.html", {"mcqs":mcqs, 
-                                                        "results": results, 
-                                                        "score": score, 
+    return render(request, "result/quiz_result.html", {"mcqs": items,
+                                                        "results": results,
+                                                        "score": quiz.score,
                                                         "file": uploaded_file,
-                                                        "correct_count": correct_count,
-                                                        "incorrect_count": incorrect_count,})
+                                                        "correct_count": quiz.correct_count,
+                                                        "incorrect_count": len(items) - quiz.correct_count,})
 
 @login_required
-def chatbot(request, file_id):
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id, user=request.user)
-    summary_instance = Summary.objects.filter(user=request.user, uploaded_file=uploaded_file).first()
-
-    summary = summary_instance.summary_text
+async def chatbot(request, file_id):
+    user = await request.auser()
+    uploaded_file = await aget_object_or_404(UploadedFile, id=file_id, user=user)
 
     if request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return handle_chat_request(request, uploaded_file, summary)
+        return await handle_chat_request(request, uploaded_file)
     
     # Display page with history
-    chat_history = ChatMessage.objects.filter(
-        user=request.user, 
-        file=uploaded_file
-    ).order_by('-timestamp')[:10][::-1]
+    chat_history = [
+        message async for message in ChatMessage.objects.filter(
+            user=user, 
+            file=uploaded_file
+        ).order_by('-timestamp')[:10]
+    ][::-1]
 
     for message in chat_history:
         message.formatted_content = markdown.markdown(message.content)
@@ -693,50 +931,7 @@ def chatbot(request, file_id):
         "file": uploaded_file,
         "chat_history": chat_history
     }
-    return render(request, "result/chatbot.html", context)
-
-
-
-def transcribe_audio_assemblyai(audio_file_path):
-    """Transcribes audio from a file path using AssemblyAI."""
-    headers = {"authorization": settings.ASSEMBLYAI_API_KEY}
-
-    try:
-        # Upload audio file
-        with open(audio_file_path, "rb") as f:
-            upload_response = requests.post(
-                "https://api.assemblyai.com/v2/upload",
-                headers=headers,
-                data=f,
-                timeout=300
-            )
-        upload_response.raise_for_status()
-        audio_url = upload_response.json()["upload_url"]
-
-        # Start transcription job
-        transcript_response = requests.post(
-            "https://api.assemblyai.com/v2/transcript",
-            headers=headers,
-            json={"audio_url": audio_url}
-        )
-        transcript_response.raise_for_status()
-        transcript_id = transcript_response.json()["id"]
-
-        # Poll for result
-        polling_url = f"https://api.assemblyai.com/v2/transcript/{transcript_id}"
-        while True:
-            polling_response = requests.get(polling_url, headers=headers)
-            result = polling_response.json()
-
-            if result["status"] == "completed":
-                return result["text"]
-            elif result["status"] == "error":
-                return f"Transcription failed: {result['error']}"
-
-            time.sleep(5)
-
-    except requests.exceptions.RequestException as e:
-        return f"Transcription error: {e}"
+    return await sync_to_async(render)(request, "result/chatbot.html", context)
 
 
 
@@ -750,7 +945,7 @@ def download_and_transcribe_youtube(video_url):
     params = {'video_url': video_url, 'format': 'json'}
     
     try:
-        response = requests.get(
+        response = http_client.get(
             url, 
             params=params, 
             headers={'Authorization': 'Bearer ' + API_KEY}, 
@@ -27,6 +27,65 @@ function getCookie(name) {
     return cookieValue;
 }
 
+// POST a chat message and read the reply as server-sent events.
+// onText receives the reply so far; resolves with the full reply.
+function streamChatReply(formData, onText) {
+    return fetch(`/chat/${fileId}/stream/`, {
+        method: 'POST',
+        headers: {
+            'X-Requested-With': 'XMLHttpRequest',
+            'X-CSRFToken': getCookie('csrftoken')
+        },
+        body: formData
+    }).then(response => {
+        if (!response.ok || !response.body) {
+            return response.json()
+                .catch(() => ({}))
+                .then(data => { throw new Error(data.error || 'Network response was not ok'); });
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let reply = '';
+
+        function handleEvent(block) {
+            let event = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (!data) return null;
+            const payload = JSON.parse(data);
+            if (event === 'chunk') {
+                reply += payload.text;
+                onText(reply);
+            } else if (event === 'done') {
+                return payload.response;
+            } else if (event === 'error') {
+                throw new Error(payload.error);
+            }
+            return null;
+        }
+
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                const blocks = buffer.split('\n\n');
+                buffer = blocks.pop();
+                for (const block of blocks) {
+                    const finalReply = handleEvent(block);
+                    if (finalReply !== null) return finalReply;
+                }
+                if (done) throw new Error('The reply was cut off');
+                return read();
+            });
+        }
+        return read();
+    });
+}
+
 document.addEventListener('DOMContentLoaded', function () {
     const userMessageInput = document.getElementById('user-message');
     const sendButton = document.getElementById('send-button');
@@ -73,46 +132,32 @@ document.addEventListener('DOMContentLoaded', function () {
         // Show loading indicator
         loadingIndicator.style.display = 'block';
 
-        // Get CSRF token
-        const csrftoken = getCookie('csrftoken');
-
         // Prepare form data
         const formData = new FormData();
         formData.append('message', message);
 
-        // Send request to backend
-        fetch(`/summary/${fileId}/`, {
-            method: 'POST',
-            headers: {
-                'X-Requested-With': 'XMLHttpRequest',
-                'X-CSRFToken': csrftoken
-            },
-            body: formData
+        // Render the reply as it streams in
+        let botElement = null;
+        streamChatReply(formData, text => {
+            if (!botElement) {
+                loadingIndicator.style.display = 'none';
+                botElement = document.createElement('div');
+                botElement.className = 'message bot';
+                chatMessages.appendChild(botElement);
+            }
+            botElement.innerHTML = marked.parse(text);
+            chatMessages.scrollTop = chatMessages.scrollHeight;
         })
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error('Network response was not ok');
-                }
-                return response.json();
-            })
-            .then(data => {
-                // Hide loading indicator
+            .then(reply => {
                 loadingIndicator.style.display = 'none';
-
-                if (data.error) {
-                    console.error('Error:', data.error);
-                    // Show error message
-                    const errorElement = document.createElement('div');
-                    errorElement.className = 'message error';
-                    errorElement.textContent = 'Sorry, there was an error processing your request.';
-                    chatMessages.appendChild(errorElement);
+                if (botElement) {
+                    botElement.innerHTML = marked.parse(reply);
+                    MathJax.typesetPromise([botElement]).then(() => {
+                        chatMessages.scrollTop = chatMessages.scrollHeight;
+                    });
                 } else {
-                    // Add bot response to chat
-                    addBotMessage(data.response);
+                    addBotMessage(reply);
                 }
-
-                // Scroll to bottom of chat
-                chatMessages.scrollTop = chatMessages.scrollHeight;
             })
             .catch(error => {
                 console.error('Error:', error);
@@ -121,7 +166,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 // Show error message
                 const errorElement = document.createElement('div');
                 errorElement.className = 'message error';
-                errorElement.textContent = 'Sorry, there was an error connecting to the server.';
+                errorElement.textContent = 'Sorry, there was an error processing your request.';
                 chatMessages.appendChild(errorElement);
 
                 // Scroll to bottom of chat
@@ -176,46 +221,32 @@ document.addEventListener('DOMContentLoaded', function () {
         // Show loading indicator
         loadingIndicators.style.display = 'block';
 
-        // Get CSRF token
-        const csrftoken = getCookie('csrftoken');
-
         // Prepare form data
         const formData = new FormData();
         formData.append('message-chat', messages);
 
-        // Send request to backend
-        fetch(`/chatbot/${fileId}/`, {
-            method: 'POST',
-            headers: {
-                'X-Requested-With': 'XMLHttpRequest',
-                'X-CSRFToken': csrftoken
-            },
-            body: formData
+        // Render the reply as it streams in
+        let botElement = null;
+        streamChatReply(formData, text => {
+            if (!botElement) {
+                loadingIndicators.style.display = 'none';
+                botElement = document.createElement('div');
+                botElement.className = 'message-chat bot';
+                chatMessage.appendChild(botElement);
+            }
+            botElement.innerHTML = marked.parse(text);
+            chatMessage.scrollTop = chatMessage.scrollHeight;
         })
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error('Network response was not ok');
-                }
-                return response.json();
-            })
-            .then(data => {
-                // Hide loading indicator
+            .then(reply => {
                 loadingIndicators.style.display = 'none';
-
-                if (data.error) {
-                    console.error('Error:', data.error);
-                    // Show error message
-                    const errorElement = document.createElement('div');
-                    errorElement.className = 'message-chat error';
-                    errorElement.textContent = 'Sorry, there was an error processing your request.';
-                    chatMessage.appendChild(errorElement);
+                if (botElement) {
+                    botElement.innerHTML = marked.parse(reply);
+                    MathJax.typesetPromise([botElement]).then(() => {
+                        chatMessage.scrollTop = chatMessage.scrollHeight;
+                    });
                 } else {
-                    // Add bot response to chat
-                    addChatMessage(data.response);
+                    addChatMessage(reply);
                 }
-
-                // Scroll to bottom of chat
-                chatMessage.scrollTop = chatMessage.scrollHeight;
             })
             .catch(error => {
                 console.error('Error:', error);
@@ -224,7 +255,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 // Show error message
                 const errorElement = document.createElement('div');
                 errorElement.className = 'message-chat error';
-                errorElement.textContent = 'Sorry, there was an error connecting to the server.';
+                errorElement.textContent = 'Sorry, there was an error processing your request.';
                 chatMessage.appendChild(errorElement);
 
                 // Scroll to bottom of chat
@@ -233,6 +264,102 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 });
 
+// Poll the summary job until the worker finishes, then show the summary
+function renderSummary(html) {
+    const summaryContent = document.getElementById('summaryContent');
+    summaryContent.innerHTML = html;
+    if (typeof MathJax !== 'undefined') {
+        MathJax.typesetPromise([summaryContent]).catch(err => {
+            console.error('MathJax rendering error:', err);
+        });
+    }
+}
+
+function streamSummary() {
+    const statusLabels = {
+        queued: 'Your summary is queued...',
+        extracting: 'Extracting text from your document...',
+        summarizing: 'Writing your summary...'
+    };
+
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(summaryStreamUrl);
+        const summaryContent = document.getElementById('summaryContent');
+        let streamed = '';
+        let finished = false;
+
+        source.addEventListener('status', event => {
+            const data = JSON.parse(event.data);
+            const pendingText = document.getElementById('summaryPendingText');
+            if (statusLabels[data.status] && pendingText) pendingText.textContent = statusLabels[data.status];
+        });
+        source.addEventListener('job', () => {
+            // Audio still being transcribed, or a long wait: poll the job instead
+            finished = true;
+            source.close();
+            pollSummaryJob().then(resolve, reject);
+        });
+        source.addEventListener('chunk', event => {
+            const data = JSON.parse(event.data);
+            streamed = data.replace ? data.text : streamed + data.text;
+            summaryContent.innerHTML = streamed;
+        });
+        source.addEventListener('done', event => {
+            finished = true;
+            source.close();
+            renderSummary(JSON.parse(event.data).summary);
+            resolve();
+        });
+        source.addEventListener('error', event => {
+            // Server-sent error events carry a payload; connection drops do not
+            source.close();
+            if (finished) return;
+            finished = true;
+            if (event.data) {
+                reject(new Error(JSON.parse(event.data).error));
+            } else {
+                reject(new Error('Lost connection while generating the summary. Please refresh the page.'));
+            }
+        });
+    });
+}
+
+function pollSummaryJob(interval = 2000) {
+    const statusLabels = {
+        queued: 'Your summary is queued...',
+        extracting: 'Extracting text from your document...',
+        transcribing: 'Transcribing your audio...',
+        summarizing: 'Writing your summary...'
+    };
+
+    return new Promise((resolve, reject) => {
+        function check() {
+            fetch(summaryStatusUrl, {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' },
+                credentials: 'same-origin'
+            })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.status === 'done') {
+                        renderSummary(data.summary);
+                        resolve(data);
+                    } else if (data.status === 'failed' || data.error) {
+                        reject(new Error(data.error || 'Summary generation failed'));
+                    } else {
+                        const label = statusLabels[data.status];
+                        const pendingText = document.getElementById('summaryPendingText');
+                        const progressText = document.getElementById('regenerate-progress-text');
+                        if (label && pendingText) pendingText.textContent = label;
+                        if (label && progressText) progressText.textContent = label;
+                        setTimeout(check, interval);
+                    }
+                })
+                .catch(reject);
+        }
+        check();
+    });
+}
+
 document.addEventListener('DOMContentLoaded', function () {
     const btn = document.getElementById('regenerateBtn');
     const confirmDialog = document.getElementById('regenerateConfirm');
@@ -287,27 +414,19 @@ document.addEventListener('DOMContentLoaded', function () {
             .then(data => {
                 console.log('Regeneration response:', data);
 
-                if (data.summary) {
-                    // Convert markdown to HTML if needed
-                    const processedHtml = marked.parse(data.summary);
-                    document.getElementById('summaryContent').innerHTML = processedHtml;
-
-                    if (typeof MathJax !== 'undefined') {
-                        MathJax.typesetPromise([document.getElementById('summaryContent')]).catch(err => {
-                            console.error('MathJax rendering error:', err);
-                        });
-                    }
-
-                    // Show success message
-                    const successMsg = document.createElement('div');
-                    successMsg.className = 'regenerate-success';
-                    successMsg.textContent = 'Summary regenerated successfully!';
-                    document.body.appendChild(successMsg);
-                    setTimeout(() => successMsg.remove(), 3000);
-                } else if (data.error) {
-                    console.error('Server error:', data.error);
-                    alert('Error: ' + data.error);
+                if (data.error) {
+                    throw new Error(data.error);
                 }
+                // The summary is rebuilt by the background worker; wait for it
+                return pollSummaryJob();
+            })
+            .then(() => {
+                // Show success message
+                const successMsg = document.createElement('div');
+                successMsg.className = 'regenerate-success';
+                successMsg.textContent = 'Summary regenerated successfully!';
+                document.body.appendChild(successMsg);
+                setTimeout(() => successMsg.remove(), 3000);
             })
             .catch(error => {
                 console.error('Regeneration error:', error);
@@ -320,6 +439,24 @@ document.addEventListener('DOMContentLoaded', function () {
             });
     }
 
+    // Summaries that are streamed in as they are written
+    if (typeof summaryStreamUrl !== 'undefined' && summaryStreamUrl) {
+        streamSummary().catch(error => {
+            console.error('Summary generation error:', error);
+            document.getElementById('summaryContent').innerHTML =
+                '<p class="text-danger">' + error.message + '</p>';
+        });
+    }
+
+    // Summaries that are still queued on first load
+    if (typeof summaryJobPending !== 'undefined' && summaryJobPending) {
+        pollSummaryJob().catch(error => {
+            console.error('Summary generation error:', error);
+            document.getElementById('summaryContent').innerHTML =
+                '<p class="text-danger">' + error.message + '</p>';
+        });
+    }
+
     // Progress bar overlay for regeneration
     function showRegenerateProgressBar() {
         let overlay = document.getElementById('regenerate-progress-overlay');
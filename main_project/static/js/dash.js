@@ -238,4 +238,61 @@ document.addEventListener('visibilitychange', function () {
         try { progressSimulator.stop(); } catch (e) { /* ignore */ }
         // Do not hide the overlay here; the browser will navigate away and replace the page.
     }
-});
\ No newline at end of file
+});
+
+// Semantic search across the user's notes
+document.addEventListener('DOMContentLoaded', function () {
+    const searchForm = document.getElementById('search-form');
+    const searchInput = document.getElementById('search-input');
+    const searchResults = document.getElementById('search-results');
+    if (!searchForm || !searchInput || !searchResults) return;
+
+    searchForm.addEventListener('submit', async function (e) {
+        e.preventDefault();
+        const query = searchInput.value.trim();
+        searchResults.innerHTML = '';
+        if (!query) return;
+
+        searchResults.textContent = 'Searching...';
+        try {
+            const response = await fetch(searchForm.dataset.url + '?q=' + encodeURIComponent(query));
+            const data = await response.json();
+            renderSearchResults(searchResults, data);
+        } catch (err) {
+            searchResults.textContent = 'Search failed. Please try again.';
+        }
+    });
+});
+
+function renderSearchResults(container, data) {
+    container.innerHTML = '';
+    if (data.error) {
+        container.textContent = data.error;
+        return;
+    }
+    if (!data.results.length) {
+        container.textContent = 'No matching passages found.';
+        return;
+    }
+    data.results.forEach(result => {
+        const card = document.createElement('a');
+        card.href = result.url;
+        card.className = 'content-card';
+
+        const icon = document.createElement('i');
+        icon.className = 'bi bi-search card-icon';
+        const body = document.createElement('div');
+        const title = document.createElement('h5');
+        title.className = 'mb-1';
+        title.textContent = result.title;
+        const snippet = document.createElement('div');
+        snippet.className = 'date';
+        snippet.textContent = result.snippet;
+
+        body.appendChild(title);
+        body.appendChild(snippet);
+        card.appendChild(icon);
+        card.appendChild(body);
+        container.appendChild(card);
+    });
+}